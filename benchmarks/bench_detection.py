@@ -0,0 +1,66 @@
+"""
+Batch crossing detection vs the per-position loop the watcher used before.
+
+Both use the same semantics: detect_crossing against each position's armed side.
+
+    PYTHONPATH=src python benchmarks/bench_detection.py
+"""
+from __future__ import annotations
+
+import random
+import timeit
+from typing import Dict, List
+
+from posbot.detection import LOSS, PROFIT, UNARMED, detect_crossing, detect_crossings_batch
+from posbot.state_store import PositionState
+
+
+def make(n: int, seed: int = 7):
+    rng = random.Random(seed)
+    prev = [rng.uniform(-5, 5) for _ in range(n)]
+    cur = [rng.uniform(-5, 5) for _ in range(n)]
+    armed = [rng.choice([LOSS, UNARMED, PROFIT]) for _ in range(n)]
+    last_alert = [rng.choice([0.0, 995.0]) for _ in range(n)]
+    return prev, cur, armed, last_alert
+
+
+def legacy_loop(keys: List[str], states: Dict[str, PositionState], cur: List[float]) -> int:
+    # the old Watcher._tick body minus notify/logging
+    fired = 0
+    for key, c in zip(keys, cur, strict=True):
+        ps = states.get(key) or PositionState()
+        prev = float(ps.last_pnl)
+        now_pnl = float(c)
+        if detect_crossing(prev, now_pnl, threshold=0.5, armed=ps.armed):
+            if (1000.0 - ps.last_alert_ts) >= float(10):
+                fired += 1
+    return fired
+
+
+def main() -> None:
+    print(f"{'positions':>10} {'loop':>10} {'batch/py':>10} {'batch/np':>10}")
+    for n in (1_000, 100_000):
+        prev, cur, armed, last_alert = make(n)
+        keys = [f"S{i}USDT:LONG" for i in range(n)]
+        states = {
+            k: PositionState(last_pnl=p, last_alert_ts=t, armed=a)
+            for k, p, a, t in zip(keys, prev, armed, last_alert, strict=True)
+        }
+        number = max(1, 200_000 // n)
+
+        def run(fn, number=number):
+            return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1e3
+
+        loop = run(lambda keys=keys, states=states, cur=cur: legacy_loop(keys, states, cur))
+        args = (prev, cur, 0.5, last_alert, 1000.0, 10)
+        py = run(lambda a=args, m=armed: detect_crossings_batch(*a, armed=m, use_numpy=False))
+        try:
+            np_ms = run(lambda a=args, m=armed: detect_crossings_batch(*a, armed=m, use_numpy=True))
+            np_col = f"{np_ms:>8.2f}ms"
+        except RuntimeError:
+            np_col = f"{'n/a':>10}"
+        print(f"{n:>10} {loop:>8.2f}ms {py:>8.2f}ms {np_col}")
+
+
+if __name__ == "__main__":
+    main()
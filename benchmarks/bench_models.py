@@ -0,0 +1,121 @@
+"""
+Memory and throughput of the position models at 100k positions.
+
+    PYTHONPATH=src python benchmarks/bench_models.py [N]
+
+Compares the slotted models with cached, interned keys against the previous plain
+dataclasses (kept below as the baseline). Position sizes include their strings. One
+"poll" builds N Positions, looks each key up in the state map and updates its
+PositionState, like Watcher._tick.
+"""
+from __future__ import annotations
+
+import gc
+import sys
+import timeit
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from posbot.models import Position
+from posbot.state_store import _POSITION_TRACKED, PositionState
+
+# --- previous models, as the comparison baseline ---
+
+
+@dataclass(frozen=True)
+class LegacyPosition:
+    symbol: str
+    side: str
+    unrealized_pnl: float
+    qty: Optional[float] = None
+    entry_price: Optional[float] = None
+    mark_price: Optional[float] = None
+    account: str = ""
+
+    @property
+    def key(self) -> str:
+        if self.account:
+            return f"{self.account}:{self.symbol}:{self.side}".upper()
+        return f"{self.symbol}:{self.side}".upper()
+
+
+@dataclass
+class LegacyPositionState:
+    last_pnl: float = 0.0
+    last_alert_ts: float = 0.0
+    last_seen_ts: float = 0.0
+    dirty: bool = field(default=True, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _POSITION_TRACKED and getattr(self, name, None) != value:
+            object.__setattr__(self, "dirty", True)
+        object.__setattr__(self, name, value)
+
+
+def _build(pos_cls: type, n: int, pnl: float = 1.0) -> List[Any]:
+    return [
+        pos_cls(
+            symbol=f"S{i}USDT",
+            side="LONG" if i % 2 else "SHORT",
+            unrealized_pnl=pnl,
+            qty=0.5,
+            entry_price=100.0,
+            mark_price=101.0,
+            account=f"acc{i % 8}",
+        )
+        for i in range(n)
+    ]
+
+
+def _allocated(fn: Callable[[], Any]) -> int:
+    """Bytes still allocated while the result of fn() is alive."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    keep = fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del keep
+    return after - before
+
+
+def _poll(pos_cls: type, state_cls: type, n: int) -> Callable[[], None]:
+    states: Dict[str, Any] = {p.key: state_cls() for p in _build(pos_cls, n)}
+    flip = [1.0]
+
+    def run() -> None:
+        flip[0] = -flip[0]
+        for pos in _build(pos_cls, n, flip[0]):
+            ps = states[pos.key]
+            ps.last_seen_ts = 1.0
+            ps.last_pnl = pos.unrealized_pnl
+
+    return run
+
+
+def _best(fn: Callable[[], None], repeat: int = 5) -> float:
+    return min(timeit.repeat(fn, number=1, repeat=repeat))
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    print(f"{n} positions")
+    rows = [
+        ("legacy", LegacyPosition, LegacyPositionState),
+        ("slotted", Position, PositionState),
+    ]
+    for name, pos_cls, state_cls in rows:
+        pos_mem = _allocated(lambda c=pos_cls: _build(c, n))
+        state_mem = _allocated(lambda c=state_cls: [c() for _ in range(n)])
+        positions = _build(pos_cls, n)
+        key_s = _best(lambda ps=positions: [p.key for p in ps])
+        poll_s = _best(_poll(pos_cls, state_cls, n), repeat=7)
+        print(
+            f"{name:<8} Position {pos_mem / n:4.0f} B   PositionState {state_mem / n:4.0f} B   "
+            f"repeated .key {key_s * 1e9 / n:4.0f} ns   poll {poll_s * 1e3:6.1f} ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
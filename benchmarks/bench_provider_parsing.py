@@ -0,0 +1,114 @@
+"""
+Per-poll parsing cost of SdkProvider.get_positions for Bitunix-shaped payloads.
+
+    PYTHONPATH=src python benchmarks/bench_provider_parsing.py
+
+Compares the cached call plan against the previous per-call introspection.
+"""
+from __future__ import annotations
+
+import inspect
+import timeit
+from typing import Any, List
+
+from posbot.models import Position
+from posbot.provider import SdkProvider
+
+
+class StaticClient:
+    def __init__(self, payload: dict) -> None:
+        self.payload = payload
+
+    def get_pending_positions(self, margin_coin: str) -> dict:
+        return self.payload
+
+
+def payload(n: int) -> dict:
+    return {
+        "code": 0,
+        "msg": "Success",
+        "data": [
+            {
+                "positionId": str(i),
+                "symbol": f"COIN{i}USDT",
+                "side": "LONG" if i % 2 else "SHORT",
+                "qty": "0.5",
+                "avgOpenPrice": "100.0",
+                "unrealizedPNL": f"{(i % 7) - 3}.25",
+            }
+            for i in range(n)
+        ],
+    }
+
+
+def legacy_get_positions(client: Any, positions_call: str, margin_coin: str) -> List[Position]:
+    # the pre-call-plan implementation, kept here as the comparison baseline
+    fn = getattr(client, positions_call)
+    params = list(inspect.signature(fn).parameters.values())
+    raw = fn(margin_coin) if params and params[0].name in {"margin_coin", "marginCoin"} else fn()
+    if isinstance(raw, dict):
+        for key in ("data", "result", "account"):
+            if key in raw:
+                raw = raw[key]
+                break
+        if isinstance(raw, dict):
+            if "positions" in raw:
+                raw = raw["positions"]
+            elif "positionList" in raw:
+                raw = raw["positionList"]
+            elif "list" in raw:
+                raw = raw["list"]
+            else:
+                raw = []
+    out: List[Position] = []
+    for item in raw or []:
+        pnl = float(
+            item.get("unrealizedPnl")
+            or item.get("unrealizedPNL")
+            or item.get("unrealizedProfit")
+            or 0
+        )
+        out.append(
+            Position(
+                symbol=str(item.get("symbol", "")),
+                side=str(item.get("side", "UNKNOWN")),
+                unrealized_pnl=pnl,
+            )
+        )
+    return out
+
+
+def bench(n: int) -> tuple[float, float]:
+    client = StaticClient(payload(n))
+    provider = SdkProvider(
+        module_name="unused",
+        factory_path="unused",
+        positions_call="get_pending_positions",
+        api_key="k",
+        api_secret="s",
+        base_url="http://localhost",
+        margin_coin="USDT",
+        client=client,
+    )
+    provider.get_positions()  # compile the plan
+    number = max(1, 20_000 // max(n, 1))
+    planned = min(timeit.repeat(provider.get_positions, number=number, repeat=5)) / number
+    legacy = min(
+        timeit.repeat(
+            lambda: legacy_get_positions(client, "get_pending_positions", "USDT"),
+            number=number,
+            repeat=5,
+        )
+    ) / number
+    return planned, legacy
+
+
+def main() -> None:
+    print(f"{'positions':>10} {'call plan':>12} {'legacy':>12} {'speedup':>8}")
+    for n in (1, 100, 10_000):
+        planned, legacy = bench(n)
+        print(f"{n:>10} {planned * 1e6:>10.1f}us {legacy * 1e6:>10.1f}us {legacy / planned:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+Time from process start to the first completed poll.
+
+    PYTHONPATH=src python benchmarks/bench_startup.py [N_STATE_POSITIONS] [RUNS]
+
+Each run is a fresh interpreter that does what `posbot` does before its first alert can go
+out: import the modules, open a JSON state file holding N positions, wrap a provider like
+main.build_account_provider and run one watcher tick whose crossings reach notify_batch.
+Telegram is imported too when it is installed (it is the same in both modes).
+
+"lazy" is the current startup. "eager" also imports what main used to import up front
+(NumPy via detection, http.server via metrics, the exchange, streaming, local PnL and
+sharding modules) and builds every PositionState while loading, as the JSON store did.
+Reported (medians over RUNS): when the first poll's alerts were handed over, counted from
+interpreter start, split into imports, state load and the tick; and the whole run as the
+parent sees it (interpreter start-up, the first save and exit included).
+"""
+from __future__ import annotations
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+POLLED = 50  # positions returned by the provider; each one crosses the threshold
+
+CHILD = r"""
+import sys, time
+t0 = time.perf_counter()
+eager = sys.argv[2] == "eager"
+try:
+    import telegram.ext  # noqa: F401
+except ImportError:
+    pass
+if eager:
+    import importlib
+    for name in ("numpy", "http.server", "urllib.request", "multiprocessing",
+                 "posbot.bitunix", "posbot.streaming", "posbot.pnl_engine", "posbot.shards"):
+        try:
+            importlib.import_module(name)
+        except ImportError:
+            pass
+import asyncio
+from posbot import accounts, logger, notifier, snapshot  # noqa: F401  (main's imports)
+from posbot.models import Position
+from posbot.provider import CircuitBreaker, CircuitBreakerProvider, ThreadedProvider
+from posbot.state_store import open_state_store
+from posbot.watcher import Watcher
+t_import = time.perf_counter()
+
+store = open_state_store(sys.argv[1])
+state = store.load()
+if eager:
+    state.positions.load_all()
+    state.mark_clean()
+t_load = time.perf_counter()
+
+class Provider:
+    def get_positions(self):
+        return [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=5.0)
+                for i in range(%(polled)d)]
+
+fetch = CircuitBreakerProvider(ThreadedProvider(Provider()), CircuitBreaker())
+done = {}
+
+async def first_alerts(events):
+    done["t"] = time.perf_counter()
+    done["n"] = len(events)
+
+async def notify(ev):
+    pass
+
+watcher = Watcher(state_store=store, state=state, fetch_positions=fetch.get_positions,
+                  notify=notify, notify_batch=first_alerts, poll_interval_seconds=15,
+                  position_ttl=604800, max_positions=%(cap)d, reopen_after_polls=2)
+asyncio.run(watcher._tick())
+assert done.get("n") == %(polled)d, done
+print("%%.6f %%.6f %%.6f" %% (t_import - t0, t_load - t_import, done["t"] - t_load), flush=True)
+"""
+
+
+def _write_state(path: str, n: int) -> None:
+    positions = {
+        f"S{i}USDT:LONG": {"last_pnl": -5.0, "last_alert_ts": 0.0, "last_seen_ts": time.time()}
+        for i in range(n)
+    }
+    state = {
+        "watch_enabled": True,
+        "pnl_threshold": 0.5,
+        "cooldown_seconds": 600,
+        "last_poll_ts": time.time(),
+        "last_error": "",
+        "positions": positions,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+
+
+def _run(state_path: str, mode: str, n: int) -> List[float]:
+    code = CHILD % {"polled": POLLED, "cap": max(n + POLLED, 5000)}
+    with open(state_path, "rb") as f:  # every run starts from the same file
+        original = f.read()
+    start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", code, state_path, mode],
+        check=True,
+        capture_output=True,
+        text=True,
+    ).stdout
+    wall = time.perf_counter() - start
+    with open(state_path, "wb") as f:
+        f.write(original)
+    imports, load, tick = (float(x) for x in out.split())
+    return [wall, imports, load, tick]
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+    print(f"{n} positions in the state file, {POLLED} polled, median of {runs} runs")
+    with tempfile.TemporaryDirectory() as tmp:
+        state_path = os.path.join(tmp, "state.json")
+        _write_state(state_path, n)
+        results: Dict[str, List[float]] = {}
+        for mode in ("eager", "lazy"):
+            samples = [_run(state_path, mode, n) for _ in range(runs)]
+            results[mode] = [statistics.median(col) for col in zip(*samples, strict=True)]
+            wall, imports, load, tick = results[mode]
+            print(
+                f"{mode:<6} first poll {(imports + load + tick) * 1e3:6.1f} ms (imports "
+                f"{imports * 1e3:5.1f}, state load {load * 1e3:5.1f}, tick {tick * 1e3:4.1f})"
+                f"   whole run {wall * 1e3:6.1f} ms"
+            )
+    first = {mode: sum(r[1:]) for mode, r in results.items()}
+    print(f"lazy/eager first poll: {first['lazy'] / first['eager']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Dict, List, Mapping, Optional, Union
+
+from posbot.models import Position, PositionList
+from posbot.provider import (
+    AsyncExchangeProvider,
+    CircuitBreaker,
+    ExchangeProvider,
+    FetchStats,
+    fetch_async,
+)
+
+log = logging.getLogger("posbot.accounts")
+
+
+@dataclass(frozen=True)
+class AccountConfig:
+    name: str
+    api_key: str
+    api_secret: str
+    base_url: Optional[str] = None
+    margin_coin: Optional[str] = None
+
+
+def _secret(item: Mapping[str, Any], field: str, name: str) -> str:
+    # "api_key": "..." inline, or "api_key_env": "SOME_ENV_VAR" to keep secrets out of the file
+    if item.get(field):
+        return str(item[field])
+    env_name = item.get(f"{field}_env")
+    if env_name:
+        val = os.environ.get(str(env_name), "")
+        if not val:
+            raise ValueError(f"account {name!r}: env var {env_name} is not set")
+        return val
+    raise ValueError(f"account {name!r}: missing {field}")
+
+
+def parse_accounts(raw: Any) -> List[AccountConfig]:
+    items = raw.get("accounts", []) if isinstance(raw, dict) else raw
+    if not isinstance(items, list):
+        raise ValueError("accounts file must be a list or an object with an 'accounts' list")
+
+    out: List[AccountConfig] = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            raise ValueError(f"invalid account entry: {item!r}")
+        name = str(item.get("name", "")).strip()
+        if not name or ":" in name:
+            raise ValueError(f"account name must be non-empty and must not contain ':': {name!r}")
+        if name.upper() in seen:
+            raise ValueError(f"duplicate account name: {name!r}")
+        seen.add(name.upper())
+        out.append(
+            AccountConfig(
+                name=name,
+                api_key=_secret(item, "api_key", name),
+                api_secret=_secret(item, "api_secret", name),
+                base_url=item.get("base_url"),
+                margin_coin=item.get("margin_coin"),
+            )
+        )
+    return out
+
+
+def load_accounts(path: str) -> List[AccountConfig]:
+    with open(path, "r", encoding="utf-8") as f:
+        return parse_accounts(json.load(f))
+
+
+def _breaker_of(provider: Any) -> Optional[CircuitBreaker]:
+    # wrappers (streaming, local PnL) keep the breaker on the REST provider they wrap
+    for _ in range(4):
+        breaker = getattr(provider, "breaker", None)
+        if isinstance(breaker, CircuitBreaker):
+            return breaker
+        provider = getattr(provider, "rest", None) or getattr(provider, "provider", None)
+        if provider is None:
+            break
+    return None
+
+
+class MultiAccountProvider:
+    """
+    Polls every account concurrently (at most `concurrency` in flight) and returns
+    one combined list with positions tagged by account, so their keys are namespaced.
+
+    A failing account is logged and skipped for that cycle, and marked as not fetched in
+    the returned PositionList; the call only raises when every account failed.
+    """
+
+    def __init__(
+        self,
+        providers: Mapping[str, Union[ExchangeProvider, AsyncExchangeProvider]],
+        *,
+        concurrency: int = 8,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        if not providers:
+            raise ValueError("MultiAccountProvider needs at least one account")
+        self.providers = dict(providers)
+        self.concurrency = max(1, concurrency)
+        self._executor = executor
+        self.errors: Dict[str, str] = {}
+        self.last_cycle_seconds = 0.0
+
+    async def _fetch_one(self, name: str, sem: asyncio.Semaphore) -> List[Position]:
+        async with sem:
+            positions = await fetch_async(self.providers[name].get_positions)
+        return [p if p.account else replace(p, account=name) for p in positions]
+
+    async def get_positions(self) -> PositionList:
+        started = time.perf_counter()
+        sem = asyncio.Semaphore(self.concurrency)
+        names = list(self.providers)
+        results = await asyncio.gather(
+            *(self._fetch_one(name, sem) for name in names), return_exceptions=True
+        )
+        self.last_cycle_seconds = time.perf_counter() - started
+
+        out = PositionList()
+        failures: List[BaseException] = []
+        for name, res in zip(names, results, strict=True):
+            if isinstance(res, BaseException):
+                if isinstance(res, asyncio.CancelledError):
+                    raise res
+                failures.append(res)
+                self.errors[name] = f"{type(res).__name__}: {res}"
+                log.warning("Account %s fetch failed: %s", name, self.errors[name])
+                out.accounts[name] = False
+                continue
+            self.errors.pop(name, None)
+            out.accounts[name] = True
+            out.extend(res)
+
+        if failures and len(failures) == len(names):
+            raise failures[0]
+        return out
+
+    def status_lines(self) -> List[str]:
+        lines = [
+            f"accounts: {len(self.providers)} (failing: {len(self.errors)}) "
+            f"last cycle: {self.last_cycle_seconds * 1000:.0f}ms"
+        ]
+        for name, err in sorted(self.errors.items())[:10]:
+            lines.append(f"  {name}: {err[:120]}")
+        stats: List[FetchStats] = [
+            s
+            for s in (getattr(p, "stats", None) for p in self.providers.values())
+            if isinstance(s, FetchStats)
+        ]
+        if stats:
+            calls = sum(s.calls for s in stats)
+            timeouts = sum(s.timeouts for s in stats)
+            wait = sum(s.total_queue_wait for s in stats) / max(calls, 1)
+            call = sum(s.total_call_time for s in stats) / max(calls, 1)
+            lines.append(
+                f"provider: calls={calls} timeouts={timeouts} "
+                f"avg_wait={wait * 1000:.1f}ms avg_call={call * 1000:.1f}ms"
+            )
+        streams = [p for p in self.providers.values() if hasattr(p, "connected")]
+        if streams:
+            up = sum(1 for p in streams if p.connected)
+            lines.append(f"streams: connected={up}/{len(streams)}")
+        breakers: Dict[str, CircuitBreaker] = {}
+        for name, p in sorted(self.providers.items()):
+            breaker = _breaker_of(p)
+            if breaker is not None:
+                breakers[name] = breaker
+        if breakers:
+            open_names = [n for n, b in breakers.items() if b.state != CircuitBreaker.CLOSED]
+            lines.append(
+                f"circuits: open={len(open_names)} "
+                f"failures={sum(b.total_failures for b in breakers.values())} "
+                f"rate_limited={sum(b.rate_limited for b in breakers.values())}"
+            )
+            for name in open_names[:10]:
+                lines.append(f"  {name}: circuit {breakers[name].state}")
+        return lines
+
+    def shutdown(self) -> None:
+        for p in self.providers.values():
+            if hasattr(p, "shutdown"):
+                p.shutdown()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
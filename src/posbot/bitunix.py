@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import http.client
+import json
+import logging
+import secrets
+import ssl
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+from posbot import metrics
+from posbot.models import Position
+from posbot.provider import ProviderError, RateLimitedError, check_error_code
+
+log = logging.getLogger("posbot.bitunix")
+
+POSITIONS_PATH = "/api/v1/futures/position/get_pending_positions"
+
+# errors from a kept-alive connection the server closed while it sat in the pool
+_STALE_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+_Connection = http.client.HTTPConnection
+
+
+class BitunixError(ProviderError):
+    def __init__(self, msg: str, status: int = 0) -> None:
+        super().__init__(msg)
+        self.status = status
+
+
+class Signer:
+    """
+    Bitunix open-API request signing:
+        digest = sha256(nonce + timestamp + api_key + sorted query "k1v1k2v2" + body)
+        sign   = sha256(digest + secret)
+    The key and secret are encoded once; the query part of a fixed call is built once.
+    """
+
+    def __init__(self, api_key: str, api_secret: str) -> None:
+        self.api_key = api_key
+        self._key = api_key.encode()
+        self._secret = api_secret.encode()
+
+    @staticmethod
+    def query_part(params: Mapping[str, Any]) -> bytes:
+        return "".join(f"{k}{params[k]}" for k in sorted(params)).encode()
+
+    def sign(self, nonce: str, timestamp: str, query: bytes, body: bytes = b"") -> str:
+        digest = hashlib.sha256(
+            nonce.encode() + timestamp.encode() + self._key + query + body
+        ).hexdigest()
+        return hashlib.sha256(digest.encode() + self._secret).hexdigest()
+
+    def headers(self, query: bytes, body: bytes = b"") -> Dict[str, str]:
+        nonce = secrets.token_hex(16)
+        timestamp = str(int(time.time() * 1000))
+        return {
+            "api-key": self.api_key,
+            "nonce": nonce,
+            "timestamp": timestamp,
+            "sign": self.sign(nonce, timestamp, query, body),
+        }
+
+
+class BitunixClient:
+    """
+    Blocking Bitunix futures REST client over a pool of keep-alive connections.
+
+    Idle connections are reused newest first (at most `pool_size` are kept), so a
+    steady poll always goes out on a warm connection with no TCP/TLS handshake. A GET
+    that fails because the server dropped an idle connection is retried once on a
+    fresh one. Thread-safe: each request holds its own connection.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        api_key: str,
+        api_secret: str,
+        *,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 10.0,
+        pool_size: int = 2,
+        ssl_context: Optional[ssl.SSLContext] = None,
+    ) -> None:
+        url = urlsplit(base_url)
+        if url.scheme not in ("http", "https") or not url.hostname:
+            raise ValueError(f"bad Bitunix base URL: {base_url!r}")
+        self.host = url.hostname
+        self.port = url.port
+        self.https = url.scheme == "https"
+        self.prefix = url.path.rstrip("/")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.pool_size = max(1, pool_size)
+        self.signer = Signer(api_key, api_secret)
+        self._ssl = ssl_context  # the default context (loading the CA store) is built lazily
+        self._idle: List[_Connection] = []
+        # (path, params) -> (request target, query part of the signature); polls repeat
+        self._targets: Dict[Tuple[str, Tuple[Tuple[str, Any], ...]], Tuple[str, bytes]] = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+        self.connections_opened = 0
+        self.requests = 0
+        self.retries = 0
+
+    def _connect(self) -> _Connection:
+        conn: _Connection
+        if self.https:
+            if self._ssl is None:
+                self._ssl = ssl.create_default_context()
+            conn = http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.connect_timeout, context=self._ssl
+            )
+        else:
+            conn = http.client.HTTPConnection(self.host, self.port, timeout=self.connect_timeout)
+        conn.connect()
+        assert conn.sock is not None
+        conn.sock.settimeout(self.read_timeout)
+        self.connections_opened += 1
+        return conn
+
+    def _checkout(self) -> Tuple[_Connection, bool]:
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._connect(), False
+
+    def _checkin(self, conn: _Connection) -> None:
+        with self._lock:
+            if not self._closed and len(self._idle) < self.pool_size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def _send(
+        self, conn: _Connection, method: str, target: str, headers: Dict[str, str], body: bytes
+    ) -> Tuple[int, Dict[str, str], bytes, bool]:
+        conn.request(method, target, body=body or None, headers=headers)
+        resp = conn.getresponse()
+        data = resp.read()
+        return resp.status, {k.lower(): v for k, v in resp.getheaders()}, data, resp.will_close
+
+    def request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Mapping[str, Any]] = None,
+        body: Any = None,
+        *,
+        signed: bool = True,
+    ) -> Any:
+        cache_key = (path, tuple(sorted(params.items())) if params else ())
+        cached = self._targets.get(cache_key)
+        if cached is None:
+            params = params or {}
+            target = self.prefix + path + (f"?{urlencode(params)}" if params else "")
+            cached = self._targets[cache_key] = (target, Signer.query_part(params))
+        target, query = cached
+        payload = b"" if body is None else json.dumps(body, separators=(",", ":")).encode()
+        headers = {"Accept-Encoding": "gzip", "Connection": "keep-alive"}
+        if payload:
+            headers["Content-Type"] = "application/json"
+        if signed:
+            headers.update(self.signer.headers(query, payload))
+
+        conn, reused = self._checkout()
+        try:
+            try:
+                status, resp_headers, data, will_close = self._send(
+                    conn, method, target, headers, payload
+                )
+            except _STALE_ERRORS:
+                conn.close()
+                if not (reused and method == "GET"):
+                    raise
+                log.debug("Pooled connection was closed by the server; reconnecting")
+                self.retries += 1
+                conn = self._connect()
+                status, resp_headers, data, will_close = self._send(
+                    conn, method, target, headers, payload
+                )
+        except BaseException:
+            conn.close()
+            raise
+        self.requests += 1
+        if will_close:
+            conn.close()
+        else:
+            self._checkin(conn)
+
+        encoding = resp_headers.get("content-encoding", "")
+        if encoding == "gzip":
+            data = gzip.decompress(data)
+        elif encoding == "deflate":
+            data = zlib.decompress(data)
+        if status == 429:
+            try:
+                retry_after = float(resp_headers.get("retry-after", 0))
+            except ValueError:
+                retry_after = 0.0
+            raise RateLimitedError(f"HTTP 429 from {path}", retry_after)
+        if status >= 400:
+            raise BitunixError(f"HTTP {status} from {path}: {data[:200]!r}", status)
+        return json.loads(data)
+
+    def get_pending_positions(self, margin_coin: str = "") -> Any:
+        return self.request(
+            "GET", POSITIONS_PATH, {"marginCoin": margin_coin} if margin_coin else None
+        )
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+def _num(val: Any) -> Optional[float]:
+    return None if val in (None, "") else float(val)
+
+
+def decode_positions(raw: Any) -> List[Position]:
+    """get_pending_positions response -> Positions (Bitunix field names, no probing)."""
+    check_error_code(raw)
+    items = raw.get("data") if isinstance(raw, dict) else None
+    if isinstance(items, dict):  # some gateways wrap the list once more
+        items = items.get("positionList") or items.get("list")
+    return [
+        Position(
+            symbol=str(item.get("symbol", "")),
+            side=str(item.get("side", "UNKNOWN")),
+            unrealized_pnl=float(item.get("unrealizedPNL") or 0),
+            qty=_num(item.get("qty")),
+            entry_price=_num(item.get("avgOpenPrice")),
+            mark_price=_num(item.get("markPrice")),
+        )
+        for item in items or []
+    ]
+
+
+class BitunixProvider:
+    """Built-in provider: BitunixClient + decode_positions, no external SDK."""
+
+    def __init__(self, client: BitunixClient, margin_coin: str = "USDT") -> None:
+        self.client = client
+        self.margin_coin = margin_coin
+
+    def get_positions(self) -> List[Position]:
+        try:
+            with metrics.PROVIDER_REQUEST_SECONDS.time():
+                raw = self.client.get_pending_positions(self.margin_coin)
+        except Exception:
+            metrics.PROVIDER_ERRORS.inc()
+            raise
+        return decode_positions(raw)
+
+    def status_lines(self) -> List[str]:
+        c = self.client
+        return [
+            f"bitunix: requests={c.requests} connections={c.connections_opened} "
+            f"retries={c.retries}"
+        ]
+
+    def shutdown(self) -> None:
+        self.client.close()
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import importlib.util
+import logging
+import os
+import re
+from typing import TYPE_CHECKING, List
+
+from posbot.accounts import load_accounts
+
+if TYPE_CHECKING:
+    from posbot.config import Settings
+
+PROVIDER_MODES = ("sdk", "bitunix", "mock")
+STATE_BACKENDS = ("auto", "json", "sqlite")
+# accepted by TimedRotatingFileHandler (W0..W6 = weekday)
+ROTATE_WHEN = {"S", "M", "H", "D", "MIDNIGHT", *(f"W{i}" for i in range(7))}
+# Telegram's rule for the webhook secret_token
+_WEBHOOK_SECRET = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+def check_config(settings: Settings) -> List[str]:
+    """
+    What `posbot --check-config` reports: settings that would stop the bot at startup or
+    on its first poll. Nothing is imported from the SDK and no connection is made.
+    """
+    problems: List[str] = []
+    if not settings.allowed_chat_ids():
+        problems.append("TELEGRAM_ALLOWED_CHAT_IDS is empty")
+    if settings.webhook_url:
+        if not settings.webhook_url.startswith("https://"):
+            problems.append("WEBHOOK_URL must be an https:// URL (Telegram only calls HTTPS)")
+        if not _WEBHOOK_SECRET.fullmatch(settings.webhook_secret):
+            problems.append("WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+        if not settings.webhook_path.startswith("/"):
+            problems.append("WEBHOOK_PATH must start with /")
+
+    mode = settings.exchange_provider_mode.lower()
+    if mode not in PROVIDER_MODES:
+        problems.append(
+            f"EXCHANGE_PROVIDER_MODE must be one of {', '.join(PROVIDER_MODES)}, not {mode!r}"
+        )
+    if mode == "sdk":
+        if not settings.sdk_factory or not settings.sdk_positions_call:
+            problems.append("EXCHANGE_PROVIDER_MODE=sdk needs SDK_FACTORY and SDK_POSITIONS_CALL")
+        try:
+            found = importlib.util.find_spec(settings.sdk_module) is not None
+        except (ImportError, ValueError):
+            found = False
+        if not found:
+            problems.append(f"SDK_MODULE {settings.sdk_module!r} is not installed")
+
+    if settings.accounts_file:
+        try:
+            accounts = load_accounts(settings.accounts_file)
+        except Exception as e:  # missing file, bad JSON, missing secrets
+            problems.append(f"ACCOUNTS_FILE {settings.accounts_file!r}: {e}")
+        else:
+            if not accounts:
+                problems.append(f"ACCOUNTS_FILE {settings.accounts_file!r} lists no accounts")
+    else:
+        if mode != "mock" and not (settings.bitunix_api_key and settings.bitunix_api_secret):
+            problems.append("BITUNIX_API_KEY and BITUNIX_API_SECRET are required")
+        if settings.workers > 0:
+            problems.append("WORKERS > 0 needs ACCOUNTS_FILE")
+
+    if settings.state_backend.lower() not in STATE_BACKENDS:
+        problems.append(
+            f"STATE_BACKEND must be one of {', '.join(STATE_BACKENDS)}, "
+            f"not {settings.state_backend!r}"
+        )
+    path = settings.state_path
+    if path.startswith("sqlite:///"):
+        path = path[len("sqlite:///"):]
+    state_dir = os.path.dirname(os.path.abspath(path))
+    if os.path.isdir(state_dir) and not os.access(state_dir, os.W_OK):
+        problems.append(f"STATE_PATH directory {state_dir!r} is not writable")
+
+    if not isinstance(logging.getLevelName(settings.log_level.upper()), int):
+        problems.append(f"LOG_LEVEL {settings.log_level!r} is not a logging level")
+    if settings.log_rotate_when and settings.log_rotate_when.upper() not in ROTATE_WHEN:
+        problems.append(f"LOG_ROTATE_WHEN {settings.log_rotate_when!r} is not supported")
+    return problems
@@ -13,28 +13,165 @@ class Settings(BaseSettings):
     telegram_bot_token: str = Field(alias="TELEGRAM_BOT_TOKEN")
     telegram_allowed_chat_ids: str = Field(alias="TELEGRAM_ALLOWED_CHAT_IDS", default="")
     telegram_admin_chat_id: str = Field(alias="TELEGRAM_ADMIN_CHAT_ID", default="")
+    # Webhook mode: Telegram pushes updates to WEBHOOK_URL (public HTTPS, behind a proxy that
+    # forwards to WEBHOOK_LISTEN:WEBHOOK_PORT + WEBHOOK_PATH); empty WEBHOOK_URL = long polling
+    webhook_url: str = Field(alias="WEBHOOK_URL", default="")
+    webhook_listen: str = Field(alias="WEBHOOK_LISTEN", default="127.0.0.1")
+    webhook_port: int = Field(alias="WEBHOOK_PORT", default=8443, ge=1, le=65535)
+    webhook_path: str = Field(alias="WEBHOOK_PATH", default="/telegram")
+    # sent back by Telegram on every request; 1-256 of A-Z a-z 0-9 _ -
+    webhook_secret: str = Field(alias="WEBHOOK_SECRET", default="")
+    webhook_max_pending: int = Field(alias="WEBHOOK_MAX_PENDING", default=64, ge=1, le=10000)
 
     # Watcher
     watch_enabled: bool = Field(alias="WATCH_ENABLED", default=True)
     poll_interval_seconds: int = Field(alias="POLL_INTERVAL_SECONDS", default=15, ge=5, le=3600)
     pnl_threshold_usdt: float = Field(alias="PNL_THRESHOLD_USDT", default=0.5, ge=0.0)
     cooldown_seconds: int = Field(alias="COOLDOWN_SECONDS", default=60, ge=0, le=86400)
+    # adaptive polling: fast while any position is within the band of the threshold zone
+    poll_adaptive: bool = Field(alias="POLL_ADAPTIVE", default=False)
+    poll_interval_min_seconds: float = Field(
+        alias="POLL_INTERVAL_MIN_SECONDS", default=5.0, ge=1.0, le=3600
+    )
+    poll_interval_max_seconds: float = Field(
+        alias="POLL_INTERVAL_MAX_SECONDS", default=60.0, ge=1.0, le=3600
+    )
+    poll_adaptive_band_usdt: float = Field(alias="POLL_ADAPTIVE_BAND_USDT", default=2.0, ge=0.0)
+    # bounded position state: forget positions unseen for the TTL, cap closed ones (LRU); 0 = off
+    position_ttl_seconds: float = Field(alias="POSITION_TTL_SECONDS", default=7 * 86400, ge=0.0)
+    max_tracked_positions: int = Field(alias="MAX_TRACKED_POSITIONS", default=5000, ge=0)
+    # a position missing from this many consecutive polls is treated as closed; if it
+    # reopens, its first PnL is a fresh baseline (0 = only the TTL applies)
+    position_reopen_after_polls: int = Field(
+        alias="POSITION_REOPEN_AFTER_POLLS", default=2, ge=0, le=100
+    )
+
+    # Alert delivery (Telegram allows ~1 msg/s per chat, ~30 msg/s overall)
+    alert_workers: int = Field(alias="ALERT_WORKERS", default=4, ge=1, le=64)
+    alert_per_chat_interval_seconds: float = Field(
+        alias="ALERT_PER_CHAT_INTERVAL_SECONDS", default=1.0, ge=0.0, le=60.0
+    )
+    alert_global_rate_per_second: float = Field(
+        alias="ALERT_GLOBAL_RATE_PER_SECOND", default=25.0, gt=0.0, le=30.0
+    )
+    alert_max_retries: int = Field(alias="ALERT_MAX_RETRIES", default=5, ge=0, le=50)
+    alert_queue_max: int = Field(alias="ALERT_QUEUE_MAX", default=10000, ge=1)
+    # merge all crossings of a tick (or of a short window) into one message
+    alert_digest: bool = Field(alias="ALERT_DIGEST", default=False)
+    alert_digest_window_seconds: float = Field(
+        alias="ALERT_DIGEST_WINDOW_SECONDS", default=0.0, ge=0.0, le=600.0
+    )
 
     # State
     state_path: str = Field(alias="STATE_PATH", default="./state.json")
+    # json | sqlite | auto (sqlite:///path or a .db path selects sqlite)
+    state_backend: str = Field(alias="STATE_BACKEND", default="auto")
+    # legacy JSON state imported into a fresh sqlite database
+    state_migrate_from: str = Field(alias="STATE_MIGRATE_FROM", default="./state.json")
+    # saves within this window are coalesced into one write (0 = write immediately)
+    state_write_delay_seconds: float = Field(
+        alias="STATE_WRITE_DELAY_SECONDS", default=1.0, ge=0.0, le=300.0
+    )
+
+    # PnL history log (empty dir = disabled)
+    pnl_log_dir: str = Field(alias="PNL_LOG_DIR", default="")
+    pnl_log_segment_mb: int = Field(alias="PNL_LOG_SEGMENT_MB", default=64, ge=1, le=4096)
+    pnl_log_segment_seconds: int = Field(
+        alias="PNL_LOG_SEGMENT_SECONDS", default=3600, ge=60, le=7 * 86400
+    )
+    # an unchanged PnL is written again after this long, so gaps mean "not open" (0 = never)
+    pnl_log_keyframe_seconds: int = Field(
+        alias="PNL_LOG_KEYFRAME_SECONDS", default=300, ge=0, le=86400
+    )
 
     # Provider wiring
+    # sdk (external package via SDK_MODULE/SDK_FACTORY) | bitunix (built-in client) | mock
     exchange_provider_mode: str = Field(alias="EXCHANGE_PROVIDER_MODE", default="sdk")
 
     sdk_module: str = Field(alias="SDK_MODULE", default="exchange_client")
-    sdk_factory: str = Field(alias="SDK_FACTORY")
-    sdk_positions_call: str = Field(alias="SDK_POSITIONS_CALL")
+    sdk_factory: str = Field(alias="SDK_FACTORY", default="")
+    sdk_positions_call: str = Field(alias="SDK_POSITIONS_CALL", default="")
+
+    provider_timeout_seconds: float = Field(
+        alias="PROVIDER_TIMEOUT_SECONDS", default=10.0, gt=0.0, le=300.0
+    )
+    provider_max_workers: int = Field(alias="PROVIDER_MAX_WORKERS", default=2, ge=1, le=64)
+
+    # Circuit breaker: stop calling the exchange after N consecutive failures, back off
+    # exponentially (with jitter) between probes; rate-limit responses open it at once
+    circuit_failure_threshold: int = Field(
+        alias="CIRCUIT_FAILURE_THRESHOLD", default=3, ge=1, le=100
+    )
+    circuit_base_backoff_seconds: float = Field(
+        alias="CIRCUIT_BASE_BACKOFF_SECONDS", default=5.0, gt=0.0, le=3600.0
+    )
+    circuit_max_backoff_seconds: float = Field(
+        alias="CIRCUIT_MAX_BACKOFF_SECONDS", default=300.0, gt=0.0, le=86400.0
+    )
+
+    # Streaming: position pushes over the private WebSocket channel wake the watcher at once;
+    # REST is still used to resync after reconnects and every STREAM_RECONCILE_SECONDS
+    stream_enabled: bool = Field(alias="STREAM_ENABLED", default=False)
+    stream_url: str = Field(alias="STREAM_URL", default="wss://fapi.bitunix.com/private/")
+    stream_reconcile_seconds: float = Field(
+        alias="STREAM_RECONCILE_SECONDS", default=60.0, ge=1.0, le=3600.0
+    )
+    stream_ping_seconds: float = Field(alias="STREAM_PING_SECONDS", default=20.0, ge=1.0, le=300.0)
+
+    # Local PnL: poll the private positions endpoint only every LOCAL_PNL_POSITIONS_REFRESH_SECONDS
+    # and recompute PnL from public mark prices on every other poll
+    local_pnl_enabled: bool = Field(alias="LOCAL_PNL_ENABLED", default=False)
+    local_pnl_positions_refresh_seconds: float = Field(
+        alias="LOCAL_PNL_POSITIONS_REFRESH_SECONDS", default=60.0, ge=1.0, le=86400.0
+    )
+    ticker_timeout_seconds: float = Field(
+        alias="TICKER_TIMEOUT_SECONDS", default=5.0, gt=0.0, le=60.0
+    )
+
+    # Prometheus metrics on http://METRICS_ADDR:METRICS_PORT/metrics (0 = disabled)
+    metrics_port: int = Field(alias="METRICS_PORT", default=0, ge=0, le=65535)
+    metrics_addr: str = Field(alias="METRICS_ADDR", default="127.0.0.1")
+
+    # Logging (written from a background thread; LOG_FILE="" logs to stdout only)
+    log_level: str = Field(alias="LOG_LEVEL", default="INFO")
+    log_file: str = Field(alias="LOG_FILE", default="logs/app.log")
+    log_json: bool = Field(alias="LOG_JSON", default=False)
+    log_max_mb: int = Field(alias="LOG_MAX_MB", default=10, ge=1, le=10240)
+    log_backup_count: int = Field(alias="LOG_BACKUP_COUNT", default=5, ge=0, le=1000)
+    # time-based rotation instead of size ("midnight", "H", "D", ...); empty = by size
+    log_rotate_when: str = Field(alias="LOG_ROTATE_WHEN", default="")
+
+    # /positions serves the watcher's last snapshot while it is younger than this
+    snapshot_max_staleness_seconds: float = Field(
+        alias="SNAPSHOT_MAX_STALENESS_SECONDS", default=30.0, ge=0.0, le=3600.0
+    )
+
+    # Multi-account mode: JSON file listing accounts (empty = single account from BITUNIX_*)
+    accounts_file: str = Field(alias="ACCOUNTS_FILE", default="")
+    accounts_concurrency: int = Field(alias="ACCOUNTS_CONCURRENCY", default=8, ge=1, le=256)
+
+    # Sharded mode (needs ACCOUNTS_FILE): split accounts over N worker processes, each with
+    # its own watcher and state shard; workers silent for the timeout are restarted
+    workers: int = Field(alias="WORKERS", default=0, ge=0, le=64)
+    worker_heartbeat_seconds: float = Field(
+        alias="WORKER_HEARTBEAT_SECONDS", default=5.0, gt=0.0, le=300.0
+    )
+    worker_heartbeat_timeout_seconds: float = Field(
+        alias="WORKER_HEARTBEAT_TIMEOUT_SECONDS", default=30.0, gt=0.0, le=3600.0
+    )
 
     # Bitunix
     bitunix_api_key: str = Field(alias="BITUNIX_API_KEY")
     bitunix_api_secret: str = Field(alias="BITUNIX_API_SECRET")
     bitunix_base_url: str = Field(alias="BITUNIX_BASE_URL", default="https://fapi.bitunix.com")
     bitunix_margin_coin: str = Field(alias="BITUNIX_MARGIN_COIN", default="USDT")
+    # built-in client (EXCHANGE_PROVIDER_MODE=bitunix); keep-alive connections are reused
+    bitunix_connect_timeout_seconds: float = Field(
+        alias="BITUNIX_CONNECT_TIMEOUT_SECONDS", default=5.0, gt=0.0, le=60.0
+    )
+    bitunix_read_timeout_seconds: float = Field(
+        alias="BITUNIX_READ_TIMEOUT_SECONDS", default=10.0, gt=0.0, le=120.0
+    )
 
     def allowed_chat_ids(self) -> List[int]:
         raw = [x.strip() for x in self.telegram_allowed_chat_ids.split(",") if x.strip()]
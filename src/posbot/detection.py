@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import importlib.util
+from dataclasses import dataclass, field
+from typing import Any, List, Optional, Sequence
+
+# optional: large batches are evaluated with NumPy when it is installed. It is imported on
+# the first large batch, not at startup (it alone costs ~60 ms of import time).
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+LOSS_TO_PROFIT = "LOSS_TO_PROFIT"
+PROFIT_TO_LOSS = "PROFIT_TO_LOSS"
+
+# armed side of a position: where its PnL last was outside the (-T, +T) dead zone
+LOSS = -1
+UNARMED = 0
+PROFIT = 1
+
+# below this size the NumPy conversion costs more than the plain loop
+NUMPY_MIN_BATCH = 256
+
+
+def armed_side(pnl: float, threshold: float, armed: int = UNARMED) -> int:
+    """PROFIT at or above +T, LOSS at or below -T; inside the dead zone `armed` is kept."""
+    t = float(threshold)
+    if pnl >= t:
+        return PROFIT
+    if pnl <= -t:
+        return LOSS
+    return armed
+
+
+def detect_crossing(
+    prev_pnl: float,
+    now_pnl: float,
+    threshold: float,
+    armed: int = UNARMED,
+) -> Optional[str]:
+    """
+    Hysteresis crossing against the armed side: the side of the (-T, +T) dead zone the
+    PnL was last outside of, i.e. armed_side(prev_pnl, threshold, armed).
+      - LOSS_TO_PROFIT when armed on LOSS and now >= +T
+      - PROFIT_TO_LOSS when armed on PROFIT and now <= -T
+    Pass the position's stored side as `armed` so a PnL that walks through the dead zone
+    in steps smaller than the band still fires; without it only prev_pnl arms.
+    """
+    before = armed_side(prev_pnl, threshold, armed)
+    side = armed_side(now_pnl, threshold)
+    if side == PROFIT and before == LOSS:
+        return LOSS_TO_PROFIT
+    if side == LOSS and before == PROFIT:
+        return PROFIT_TO_LOSS
+    return None
+
+
+@dataclass
+class BatchCrossings:
+    # indices into the input arrays, ascending
+    fired: List[int] = field(default_factory=list)
+    directions: List[str] = field(default_factory=list)  # parallel to `fired`
+    suppressed: List[int] = field(default_factory=list)  # crossed, but still in cooldown
+    armed: List[int] = field(default_factory=list)  # new armed side of every input
+
+
+def _batch_python(
+    prev: Sequence[float],
+    cur: Sequence[float],
+    armed: Optional[Sequence[int]],
+    t: float,
+    last_alert_ts: Sequence[float],
+    now: float,
+    cooldown: float,
+) -> BatchCrossings:
+    out = BatchCrossings()
+    new_armed = out.armed
+    neg_t = -t
+    for i, c in enumerate(cur):
+        p = prev[i]
+        if p >= t:
+            a = PROFIT
+        elif p <= neg_t:
+            a = LOSS
+        else:
+            a = armed[i] if armed is not None else UNARMED
+        if c >= t:
+            new_armed.append(PROFIT)
+            if a != LOSS:
+                continue
+            direction = LOSS_TO_PROFIT
+        elif c <= neg_t:
+            new_armed.append(LOSS)
+            if a != PROFIT:
+                continue
+            direction = PROFIT_TO_LOSS
+        else:
+            new_armed.append(a)
+            continue
+        if (now - last_alert_ts[i]) >= cooldown:
+            out.fired.append(i)
+            out.directions.append(direction)
+        else:
+            out.suppressed.append(i)
+    return out
+
+
+def _batch_numpy(
+    prev: Any,
+    cur: Any,
+    armed: Any,
+    t: float,
+    last_alert_ts: Any,
+    now: float,
+    cooldown: float,
+) -> BatchCrossings:
+    import numpy as np
+
+    p = np.asarray(prev, dtype=np.float64)
+    c = np.asarray(cur, dtype=np.float64)
+    a = np.zeros(len(p), dtype=np.int8) if armed is None else np.asarray(armed, dtype=np.int8)
+    a = np.where(p >= t, PROFIT, np.where(p <= -t, LOSS, a))
+    up = c >= t
+    down = (c <= -t) & ~up
+    new_armed = np.where(up, PROFIT, np.where(down, LOSS, a)).tolist()
+    l2p = up & (a == LOSS)
+    crossed = l2p | (down & (a == PROFIT))
+    idx = np.flatnonzero(crossed)
+    if idx.size == 0:
+        return BatchCrossings(armed=new_armed)
+
+    elapsed = now - np.asarray(last_alert_ts, dtype=np.float64)[idx]
+    ready = elapsed >= cooldown
+    fired = idx[ready]
+    return BatchCrossings(
+        fired=fired.tolist(),
+        directions=[LOSS_TO_PROFIT if x else PROFIT_TO_LOSS for x in l2p[fired].tolist()],
+        suppressed=idx[~ready].tolist(),
+        armed=new_armed,
+    )
+
+
+def detect_crossings_batch(
+    prev: Sequence[float],
+    cur: Sequence[float],
+    threshold: float,
+    last_alert_ts: Sequence[float],
+    now: float,
+    cooldown_seconds: float,
+    *,
+    armed: Optional[Sequence[int]] = None,
+    use_numpy: Optional[bool] = None,
+) -> BatchCrossings:
+    """
+    detect_crossing() plus the cooldown check over whole arrays in one pass.
+
+    Inputs are parallel sequences (lists or NumPy arrays). Results are identical to
+    calling detect_crossing(prev, cur, threshold, armed) per element and firing when
+    now - last_alert_ts >= cooldown; `armed` of the result holds every position's new
+    armed side, which moves on a suppressed crossing too. use_numpy=None picks NumPy for
+    batches of NUMPY_MIN_BATCH or more when available.
+    """
+    n = len(prev)
+    if len(cur) != n or len(last_alert_ts) != n or (armed is not None and len(armed) != n):
+        raise ValueError("prev, cur, armed and last_alert_ts must have the same length")
+
+    t = float(threshold)
+    cooldown = float(cooldown_seconds)
+    if use_numpy is None:
+        use_numpy = HAVE_NUMPY and n >= NUMPY_MIN_BATCH
+    if use_numpy:
+        if not HAVE_NUMPY:
+            raise RuntimeError("numpy is not installed")
+        return _batch_numpy(prev, cur, armed, t, last_alert_ts, now, cooldown)
+    return _batch_python(prev, cur, armed, t, last_alert_ts, now, cooldown)
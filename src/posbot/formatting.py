@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import html
+from typing import Iterable, List, Sequence
+
+from posbot.models import CrossingEvent, Position
+
+# Telegram rejects text messages longer than this (in characters)
+TELEGRAM_MAX_MESSAGE = 4096
+
+
+def _title(direction: str) -> str:
+    return "✅ LOSS → PROFIT" if direction == "LOSS_TO_PROFIT" else "⚠️ PROFIT → LOSS"
+
+
+def _label(ev: CrossingEvent) -> str:
+    return f"{ev.account + ' | ' if ev.account else ''}{ev.symbol} {ev.side}"
+
+
+def format_event(ev: CrossingEvent) -> str:
+    return (
+        f"{_title(ev.direction)}\n"
+        f"{_label(ev)}\n"
+        f"PNL: {ev.from_pnl:.4f} → {ev.to_pnl:.4f} USDT"
+    )
+
+
+def format_positions(positions: Sequence[Position], *, as_of: str = "", limit: int = 30) -> str:
+    """
+    HTML /positions reply: at most `limit` rows plus a "+N more" line. Account, symbol and
+    side come from the exchange or the accounts file, so they are escaped.
+    """
+    title = "<b>Open positions</b>"
+    if as_of:
+        title += f" (as of {as_of})"
+    lines = [title]
+    for p in positions[:limit]:
+        acct = f"[{html.escape(p.account)}] " if p.account else ""
+        lines.append(
+            f"• {acct}<code>{html.escape(p.symbol)}</code> {html.escape(p.side)} "
+            f"| PNL: <b>{p.unrealized_pnl:.4f}</b> USDT"
+        )
+    if len(positions) > limit:
+        lines.append(f"... +{len(positions) - limit} more")
+    return "\n".join(lines)
+
+
+def split_message(lines: Iterable[str], limit: int = TELEGRAM_MAX_MESSAGE) -> List[str]:
+    """Join lines into as few messages as possible, each at most `limit` characters."""
+    out: List[str] = []
+    cur: List[str] = []
+    size = 0
+    for line in lines:
+        if len(line) > limit:
+            line = line[: limit - 1] + "…"
+        extra = len(line) + (1 if cur else 0)
+        if cur and size + extra > limit:
+            out.append("\n".join(cur))
+            cur, size = [], 0
+            extra = len(line)
+        cur.append(line)
+        size += extra
+    if cur:
+        out.append("\n".join(cur))
+    return out
+
+
+def format_digest(events: Sequence[CrossingEvent]) -> List[str]:
+    if len(events) == 1:
+        return [format_event(events[0])]
+    to_profit = sum(1 for ev in events if ev.direction == "LOSS_TO_PROFIT")
+    lines = [
+        f"📊 {len(events)} crossings "
+        f"(✅ {to_profit} to profit, ⚠️ {len(events) - to_profit} to loss)"
+    ]
+    for ev in events:
+        icon = "✅" if ev.direction == "LOSS_TO_PROFIT" else "⚠️"
+        lines.append(f"{icon} {_label(ev)}: {ev.from_pnl:.4f} → {ev.to_pnl:.4f}")
+    return split_message(lines)
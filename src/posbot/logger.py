@@ -1,15 +1,127 @@
 from __future__ import annotations
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
 import sys
+import time
+from typing import Any, Dict, List, Optional
 
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s - %(message)s"
 
-def setup_logging() -> None:
-    logging.basicConfig(
-        level=logging.INFO,
-        format="%(asctime)s %(levelname)s %(name)s - %(message)s",
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler("logs/app.log", encoding="utf-8"),
-        ],
-    )
\ No newline at end of file
+# the active pipeline; setup_logging() may be called again (tests, reloads)
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.Handler] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, plus exc when present."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        out: Dict[str, Any] = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created))
+            + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the whole record on the calling thread. We only merge
+    # the args (they may be mutated after the call returns) and leave formatting,
+    # tracebacks included, to the listener thread.
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def _file_handler(
+    path: str, *, max_bytes: int, backup_count: int, rotate_when: str
+) -> logging.Handler:
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if rotate_when:
+        return logging.handlers.TimedRotatingFileHandler(
+            path, when=rotate_when, backupCount=backup_count, encoding="utf-8", utc=True
+        )
+    return logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8"
+    )
+
+
+def setup_logging(
+    level: str = "INFO",
+    *,
+    log_file: str = "logs/app.log",
+    json_format: bool = False,
+    max_bytes: int = 10 * 1024 * 1024,
+    backup_count: int = 5,
+    rotate_when: str = "",
+    stream: Any = None,
+) -> logging.handlers.QueueListener:
+    """
+    Route all logging through a queue drained by a background thread, so a log call
+    on the event loop never waits for disk or stdout.
+
+    The file (empty `log_file` disables it) rotates at `max_bytes`, or on a schedule
+    when `rotate_when` is set ("midnight", "H", ... as for TimedRotatingFileHandler).
+    Its directory is created if missing.
+    """
+    stop_logging()
+
+    formatter: logging.Formatter = JsonFormatter() if json_format else logging.Formatter(
+        TEXT_FORMAT
+    )
+    handlers: List[logging.Handler] = [logging.StreamHandler(stream or sys.stdout)]
+    if log_file:
+        handlers.append(
+            _file_handler(
+                log_file, max_bytes=max_bytes, backup_count=backup_count, rotate_when=rotate_when
+            )
+        )
+    for h in handlers:
+        h.setFormatter(formatter)
+
+    global _listener, _queue_handler
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler = _QueueHandler(q)
+    _listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    root.addHandler(_queue_handler)
+    root.setLevel(level.upper())
+    # httpx logs every Telegram long-poll request at INFO
+    logging.getLogger("httpx").setLevel(
+        logging.WARNING if root.level > logging.DEBUG else logging.DEBUG
+    )
+
+    _listener.start()
+    return _listener
+
+
+def stop_logging() -> None:
+    """Flush what is queued and close the handlers; logging falls back to stderr."""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    logging.getLogger().removeHandler(_queue_handler)  # type: ignore[arg-type]
+    _listener.stop()  # drains the queue before returning
+    for h in _listener.handlers:
+        h.close()
+    _listener = _queue_handler = None
+
+
+atexit.register(stop_logging)
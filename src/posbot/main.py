@@ -1,46 +1,508 @@
+"""
+Bot entry point.
+
+    posbot                  # run the bot
+    posbot --check-config   # validate the settings and exit (no Telegram, no exchange)
+"""
 from __future__ import annotations
 
+import argparse
+import asyncio
 import logging
-from typing import List
-
-from telegram.ext import Application
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
 
+from posbot import metrics
+from posbot.accounts import AccountConfig, MultiAccountProvider, load_accounts
+from posbot.checks import check_config
 from posbot.config import Settings
+from posbot.formatting import format_digest, format_event
 from posbot.logger import setup_logging
-from posbot.models import CrossingEvent
-from posbot.provider import MockProvider, SdkProvider
-from posbot.state_store import BotState, StateStore
-from posbot.telegram_bot import TelegramBot
+from posbot.models import CrossingEvent, Position
+from posbot.notifier import AlertDispatcher, DigestBuffer
+from posbot.pnl_log import PnlLog
+from posbot.provider import (
+    CircuitBreaker,
+    CircuitBreakerProvider,
+    ExchangeProvider,
+    MockProvider,
+    PositionsFetcher,
+    SdkProvider,
+    ThreadedProvider,
+)
+from posbot.scheduler import AdaptivePolicy
+from posbot.snapshot import SnapshotCache
+from posbot.state_store import BaseStateStore, BotState, open_state_store
+from posbot.subscriptions import alert_chats, group_by_chat
 from posbot.watcher import Watcher
 
+# Telegram, the exchange clients, streaming, local PnL and sharding are imported where they
+# are used: `posbot --check-config` and the worker processes never load Telegram, and the
+# bot only pays for the features that are configured.
+if TYPE_CHECKING:
+    from telegram.ext import Application
+
+    from posbot.pnl_engine import BitunixTickerSource, MarkPriceProvider
+    from posbot.shards import ShardRuntime
+    from posbot.streaming import StreamingProvider
+    from posbot.webhook import WebhookServer
+
 log = logging.getLogger("posbot.main")
 
 
-def build_provider(settings: Settings):
-    if settings.exchange_provider_mode.lower() == "mock":
+def build_provider(
+    settings: Settings, account: Optional[AccountConfig] = None
+) -> ExchangeProvider:
+    mode = settings.exchange_provider_mode.lower()
+    if mode == "mock":
         return MockProvider()
+    if mode == "bitunix":
+        from posbot.bitunix import BitunixClient, BitunixProvider
+
+        client = BitunixClient(
+            (account and account.base_url) or settings.bitunix_base_url,
+            account.api_key if account else settings.bitunix_api_key,
+            account.api_secret if account else settings.bitunix_api_secret,
+            connect_timeout=settings.bitunix_connect_timeout_seconds,
+            read_timeout=settings.bitunix_read_timeout_seconds,
+            pool_size=settings.provider_max_workers,
+        )
+        return BitunixProvider(
+            client, (account and account.margin_coin) or settings.bitunix_margin_coin
+        )
+    if mode != "sdk":
+        raise RuntimeError(f"Unknown EXCHANGE_PROVIDER_MODE: {settings.exchange_provider_mode}")
+    if not settings.sdk_factory or not settings.sdk_positions_call:
+        raise RuntimeError("EXCHANGE_PROVIDER_MODE=sdk needs SDK_FACTORY and SDK_POSITIONS_CALL")
 
     return SdkProvider(
         module_name=settings.sdk_module,
         factory_path=settings.sdk_factory,
         positions_call=settings.sdk_positions_call,
-        api_key=settings.bitunix_api_key,
-        api_secret=settings.bitunix_api_secret,
-        base_url=settings.bitunix_base_url,
-        margin_coin=settings.bitunix_margin_coin,
+        api_key=account.api_key if account else settings.bitunix_api_key,
+        api_secret=account.api_secret if account else settings.bitunix_api_secret,
+        base_url=(account and account.base_url) or settings.bitunix_base_url,
+        margin_coin=(account and account.margin_coin) or settings.bitunix_margin_coin,
+    )
+
+
+def build_breaker(settings: Settings) -> CircuitBreaker:
+    return CircuitBreaker(
+        failure_threshold=settings.circuit_failure_threshold,
+        base_backoff=settings.circuit_base_backoff_seconds,
+        max_backoff=settings.circuit_max_backoff_seconds,
+    )
+
+
+def build_tickers(settings: Settings) -> Optional[BitunixTickerSource]:
+    if not settings.local_pnl_enabled:
+        return None
+    from posbot.pnl_engine import BitunixTickerSource
+
+    return BitunixTickerSource(
+        settings.bitunix_base_url, timeout=settings.ticker_timeout_seconds
+    )
+
+
+def build_account_provider(
+    settings: Settings,
+    account: Optional[AccountConfig] = None,
+    executor: Optional[ThreadPoolExecutor] = None,
+    tickers: Optional[BitunixTickerSource] = None,
+) -> Union[CircuitBreakerProvider, MarkPriceProvider, StreamingProvider]:
+    rest: Union[CircuitBreakerProvider, MarkPriceProvider] = CircuitBreakerProvider(
+        ThreadedProvider(
+            build_provider(settings, account),
+            max_workers=settings.provider_max_workers,
+            timeout_seconds=settings.provider_timeout_seconds,
+            executor=executor,
+        ),
+        build_breaker(settings),
+    )
+    if tickers is not None:
+        from posbot.pnl_engine import MarkPriceProvider
+
+        rest = MarkPriceProvider(
+            rest,
+            tickers,
+            refresh_interval=settings.local_pnl_positions_refresh_seconds,
+            ticker_timeout=settings.ticker_timeout_seconds,
+        )
+    if not settings.stream_enabled:
+        return rest
+    from posbot.streaming import StreamingProvider
+
+    return StreamingProvider(
+        settings.stream_url,
+        rest=rest,
+        api_key=account.api_key if account else settings.bitunix_api_key,
+        api_secret=account.api_secret if account else settings.bitunix_api_secret,
+        reconcile_interval=settings.stream_reconcile_seconds,
+        ping_interval=settings.stream_ping_seconds,
+    )
+
+
+def build_fetcher(
+    settings: Settings, accounts: Optional[List[AccountConfig]] = None
+) -> Union[CircuitBreakerProvider, MarkPriceProvider, StreamingProvider, MultiAccountProvider]:
+    tickers = build_tickers(settings)
+    if accounts is None:
+        if not settings.accounts_file:
+            return build_account_provider(settings, tickers=tickers)
+        accounts = load_accounts(settings.accounts_file)
+
+    # one pool sized to the concurrency limit, shared by every account
+    executor = ThreadPoolExecutor(
+        max_workers=settings.accounts_concurrency, thread_name_prefix="provider"
+    )
+    # one breaker (and stream) per account: a rate-limited sub-account must not stall the others
+    providers = {
+        acc.name: build_account_provider(settings, acc, executor, tickers) for acc in accounts
+    }
+    log.info("Multi-account mode: %d accounts", len(providers))
+    return MultiAccountProvider(
+        providers, concurrency=settings.accounts_concurrency, executor=executor
+    )
+
+
+def configure_logging(settings: Settings, log_file: Optional[str] = None) -> None:
+    setup_logging(
+        settings.log_level,
+        log_file=settings.log_file if log_file is None else log_file,
+        json_format=settings.log_json,
+        max_bytes=settings.log_max_mb * 1024 * 1024,
+        backup_count=settings.log_backup_count,
+        rotate_when=settings.log_rotate_when,
+    )
+
+
+def build_pnl_log(settings: Settings, directory: Optional[str] = None) -> Optional[PnlLog]:
+    if not settings.pnl_log_dir:
+        return None
+    return PnlLog(
+        directory or settings.pnl_log_dir,
+        segment_max_bytes=settings.pnl_log_segment_mb * 1024 * 1024,
+        segment_max_seconds=settings.pnl_log_segment_seconds,
+        keyframe_seconds=settings.pnl_log_keyframe_seconds,
     )
 
 
-def main() -> None:
-    setup_logging()
+def build_watcher(
+    settings: Settings,
+    *,
+    state_store: BaseStateStore,
+    state: BotState,
+    fetch_positions: PositionsFetcher,
+    notify: Callable[[CrossingEvent], Awaitable[None]],
+    notify_batch: Optional[Callable[[List[CrossingEvent]], Awaitable[None]]] = None,
+    pnl_log: Optional[PnlLog] = None,
+) -> Watcher:
+    return Watcher(
+        state_store=state_store,
+        state=state,
+        fetch_positions=fetch_positions,
+        notify=notify,
+        poll_interval_seconds=settings.poll_interval_seconds,
+        pnl_log=pnl_log,
+        notify_batch=notify_batch,
+        adaptive=(
+            AdaptivePolicy(
+                min_interval=settings.poll_interval_min_seconds,
+                max_interval=max(
+                    settings.poll_interval_max_seconds, settings.poll_interval_min_seconds
+                ),
+                band=settings.poll_adaptive_band_usdt,
+            )
+            if settings.poll_adaptive
+            else None
+        ),
+        position_ttl=settings.position_ttl_seconds,
+        max_positions=settings.max_tracked_positions,
+        reopen_after_polls=settings.position_reopen_after_polls,
+    )
+
+
+def _streams_of(settings: Settings, provider: Any) -> List[StreamingProvider]:
+    if not settings.stream_enabled or provider is None:
+        return []
+    from posbot.streaming import StreamingProvider
+
+    members = (
+        list(provider.providers.values())
+        if isinstance(provider, MultiAccountProvider)
+        else [provider]
+    )
+    return [p for p in members if isinstance(p, StreamingProvider)]
+
+
+def shard_runtime(
+    shard: int, shards: int, publish: Callable[[List[CrossingEvent]], Awaitable[None]]
+) -> ShardRuntime:
+    """Worker side of WORKERS > 0: this shard's accounts, state shard and Watcher."""
+    from posbot.shards import ShardRuntime, assign_shards, shard_path
+
     settings = Settings()
+    configure_logging(settings, shard_path(settings.log_file, shard))
+
+    accounts = load_accounts(settings.accounts_file)
+    mine = assign_shards(accounts, shards, key=lambda acc: acc.name)[shard]
+    log.info("Shard %d/%d: accounts %s", shard, shards, ", ".join(a.name for a in mine))
+
+    state_store = open_state_store(
+        shard_path(settings.state_path, shard),
+        backend=settings.state_backend,
+        write_delay=settings.state_write_delay_seconds,
+    )
+    state = state_store.load()
+    provider = build_fetcher(settings, mine) if mine else None
+    if provider is None:
+        log.warning("Shard %d has no accounts; add workers or accounts to balance", shard)
+
+    async def no_positions() -> List[Position]:
+        return []
+
+    snapshots = SnapshotCache(
+        provider.get_positions if provider is not None else no_positions,
+        max_staleness=settings.snapshot_max_staleness_seconds,
+    )
+
+    async def notify(ev: CrossingEvent) -> None:
+        await publish([ev])
+
+    pnl_log = build_pnl_log(settings, shard_path(settings.pnl_log_dir, shard))
+    watcher = build_watcher(
+        settings,
+        state_store=state_store,
+        state=state,
+        fetch_positions=snapshots.refresh,
+        notify=notify,
+        notify_batch=publish,
+        pnl_log=pnl_log,
+    )
+    streams = _streams_of(settings, provider)
+    for stream in streams:
+        stream.add_listener(watcher.wake)
+
+    async def get_positions() -> List[Position]:
+        return (await snapshots.get()).positions
+
+    async def on_start() -> None:
+        for stream in streams:
+            stream.start()
+
+    async def on_stop() -> None:
+        for stream in streams:
+            await stream.stop()
+        if provider is not None:
+            provider.shutdown()
+        state_store.flush(state)
+        state_store.close()
+        if pnl_log is not None:
+            pnl_log.close()
+
+    return ShardRuntime(
+        watcher=watcher,
+        get_positions=get_positions,
+        status_lines=provider.status_lines if provider is not None else (lambda: []),
+        on_start=on_start,
+        on_stop=on_stop,
+    )
+
+
+class _LocalEngine:
+    """Polling and detection in this process (the default, WORKERS=0)."""
+
+    def __init__(
+        self,
+        settings: Settings,
+        state_store: BaseStateStore,
+        state: BotState,
+        notify: Callable[[CrossingEvent], Awaitable[None]],
+        digest: Optional[DigestBuffer],
+    ) -> None:
+        self.settings = settings
+        self.state_store = state_store
+        self.state = state
+        self.notify = notify
+        self.digest = digest
+        self.provider = build_fetcher(settings)
+        self.get_positions = self.provider.get_positions
+        self.pnl_log = build_pnl_log(settings)
+        self.streams = _streams_of(settings, self.provider)
+        self.watcher: Optional[Watcher] = None
+
+    def bind_snapshots(self, snapshots: SnapshotCache) -> None:
+        # the watcher polls through the cache so /positions can reuse its result
+        self.watcher = build_watcher(
+            self.settings,
+            state_store=self.state_store,
+            state=self.state,
+            fetch_positions=snapshots.refresh,
+            notify=self.notify,
+            notify_batch=self.digest.add if self.digest is not None else None,
+            pnl_log=self.pnl_log,
+        )
+        for stream in self.streams:
+            stream.add_listener(self.watcher.wake)
+
+    def status_lines(self) -> List[str]:
+        assert self.watcher is not None
+        return self.provider.status_lines() + self.watcher.status_lines()
+
+    def start(self) -> None:
+        assert self.watcher is not None
+        for stream in self.streams:
+            stream.start()
+        self.watcher.start()
+
+    async def stop(self) -> None:
+        assert self.watcher is not None
+        await self.watcher.stop()
+        for stream in self.streams:
+            await stream.stop()
+
+    def close(self) -> None:
+        self.provider.shutdown()
+        if self.pnl_log is not None:
+            self.pnl_log.close()
+
+
+class _ShardedEngine:
+    """
+    WORKERS > 0: accounts are split over worker processes (see shard_runtime); this
+    process only delivers their crossings and serves Telegram.
+    """
+
+    def __init__(
+        self,
+        settings: Settings,
+        state: BotState,
+        notify: Callable[[CrossingEvent], Awaitable[None]],
+        digest: Optional[DigestBuffer],
+    ) -> None:
+        from posbot.shards import ShardSupervisor
+
+        if not settings.accounts_file:
+            raise RuntimeError("WORKERS > 0 shards accounts and needs ACCOUNTS_FILE")
+        accounts = load_accounts(settings.accounts_file)
+        shards = min(settings.workers, len(accounts))
+        log.info("Sharded mode: %d accounts over %d workers", len(accounts), shards)
+
+        async def deliver(events: List[CrossingEvent]) -> None:
+            if digest is not None:
+                await digest.add(events)
+                return
+            for ev in events:
+                await notify(ev)
+
+        self.supervisor = ShardSupervisor(
+            shard_runtime,
+            shards,
+            on_events=deliver,
+            state=state,
+            heartbeat_interval=settings.worker_heartbeat_seconds,
+            heartbeat_timeout=settings.worker_heartbeat_timeout_seconds,
+            positions_timeout=settings.provider_timeout_seconds,
+        )
+        self.get_positions = self.supervisor.get_positions
+        self.status_lines = self.supervisor.status_lines
+        self.start = self.supervisor.start
+        self.stop = self.supervisor.stop
+
+    def bind_snapshots(self, snapshots: SnapshotCache) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+def build_webhook(settings: Settings, app: Application) -> WebhookServer:
+    from telegram import Update
+
+    from posbot.webhook import WebhookServer
+
+    async def handle(data: Dict[str, Any]) -> None:
+        # straight to the handlers: each update already runs in its own task
+        await app.process_update(Update.de_json(data, app.bot))
+
+    return WebhookServer(
+        handle,
+        secret_token=settings.webhook_secret,
+        host=settings.webhook_listen,
+        port=settings.webhook_port,
+        path=settings.webhook_path,
+        max_pending=settings.webhook_max_pending,
+    )
+
+
+async def serve_webhook(app: Application, webhook: WebhookServer, settings: Settings) -> None:
+    """app.run_polling() for webhook mode: the same lifecycle hooks, updates pushed to us."""
+    from telegram import Update
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await app.initialize()
+    try:
+        # post_stop runs even when startup fails half way, so post_init's work is undone
+        try:
+            if app.post_init is not None:
+                await app.post_init(app)
+            await webhook.start()
+            await app.bot.set_webhook(
+                settings.webhook_url,
+                secret_token=settings.webhook_secret,
+                allowed_updates=Update.ALL_TYPES,
+                max_connections=min(settings.webhook_max_pending, 100),
+            )
+            await app.start()
+            log.info("Webhook set to %s", settings.webhook_url)
+            await stop.wait()
+        finally:
+            # the webhook stays registered: Telegram holds updates until we are back
+            await webhook.stop()
+            if app.running:
+                await app.stop()
+            if app.post_stop is not None:
+                await app.post_stop(app)
+    finally:
+        await app.shutdown()
+        if app.post_shutdown is not None:
+            await app.post_shutdown(app)
+
+
+def run(settings: Settings) -> None:
+    from telegram.ext import Application
+
+    from posbot.telegram_bot import TelegramBot
+
+    configure_logging(settings)
 
     allowed_ids = settings.allowed_chat_ids()
     admin_id = settings.admin_chat_id()
     if not allowed_ids:
         raise RuntimeError("TELEGRAM_ALLOWED_CHAT_IDS is empty. Refusing to start (security).")
 
-    state_store = StateStore(settings.state_path)
+    state_store = open_state_store(
+        settings.state_path,
+        backend=settings.state_backend,
+        write_delay=settings.state_write_delay_seconds,
+        migrate_from=settings.state_migrate_from or None,
+    )
     state: BotState = state_store.load()
 
     # Initialize defaults from env only on fresh state
@@ -50,22 +512,66 @@ def main() -> None:
         state.cooldown_seconds = settings.cooldown_seconds
         state_store.save(state)
 
-    provider = build_provider(settings)
+    metrics_server = (
+        metrics.start_http_server(settings.metrics_port, settings.metrics_addr)
+        if settings.metrics_port
+        else None
+    )
+
     app = Application.builder().token(settings.telegram_bot_token).build()
 
-    def fetch_positions() -> List:
-        return provider.get_positions()
+    async def send(chat_id: int, text: str) -> None:
+        await app.bot.send_message(chat_id=chat_id, text=text)
+
+    dispatcher = AlertDispatcher(
+        send,
+        workers=settings.alert_workers,
+        per_chat_interval=settings.alert_per_chat_interval_seconds,
+        global_rate=settings.alert_global_rate_per_second,
+        max_retries=settings.alert_max_retries,
+        max_queue=settings.alert_queue_max,
+    )
+    metrics.ALERT_QUEUE_DEPTH.set_function(lambda: dispatcher.depth)
+
+    allowed = frozenset(allowed_ids)
 
     async def notify(ev: CrossingEvent) -> None:
-        if admin_id is None:
-            return
-        title = "✅ LOSS → PROFIT" if ev.direction == "LOSS_TO_PROFIT" else "⚠️ PROFIT → LOSS"
-        text = (
-            f"{title}\n"
-            f"{ev.symbol} {ev.side}\n"
-            f"PNL: {ev.from_pnl:.4f} → {ev.to_pnl:.4f} USDT"
+        text = format_event(ev)
+        for chat_id in alert_chats(
+            state.subscriptions, ev, admin_chat_id=admin_id, allowed=allowed
+        ):
+            await dispatcher.submit(chat_id, text)
+
+    async def notify_digest(events: List[CrossingEvent]) -> None:
+        per_chat = group_by_chat(
+            state.subscriptions, events, admin_chat_id=admin_id, allowed=allowed
         )
-        await app.bot.send_message(chat_id=admin_id, text=text)
+        for chat_id, chat_events in per_chat.items():
+            for text in format_digest(chat_events):
+                await dispatcher.submit(chat_id, text)
+
+    digest = (
+        DigestBuffer(notify_digest, window=settings.alert_digest_window_seconds)
+        if settings.alert_digest
+        else None
+    )
+
+    if settings.workers > 0:
+        engine: Union[_LocalEngine, _ShardedEngine] = _ShardedEngine(
+            settings, state, notify, digest
+        )
+    else:
+        engine = _LocalEngine(settings, state_store, state, notify, digest)
+    snapshots = SnapshotCache(
+        engine.get_positions, max_staleness=settings.snapshot_max_staleness_seconds
+    )
+    engine.bind_snapshots(snapshots)
+
+    webhook = build_webhook(settings, app) if settings.webhook_url else None
+
+    def status_lines() -> List[str]:
+        lines = engine.status_lines() + dispatcher.status_lines()
+        return lines + webhook.status_lines() if webhook is not None else lines
 
     TelegramBot(
         application=app,
@@ -73,30 +579,70 @@ def main() -> None:
         state=state,
         allowed_chat_ids=allowed_ids,
         admin_chat_id=admin_id,
-        fetch_positions=fetch_positions,
-    )
-
-    watcher = Watcher(
-        state_store=state_store,
-        state=state,
-        fetch_positions=fetch_positions,
-        notify=notify,
-        poll_interval_seconds=settings.poll_interval_seconds,
+        fetch_positions=snapshots.refresh,
+        status_extra=status_lines,
+        snapshots=snapshots,
     )
 
     async def _post_init(_: Application) -> None:
-        watcher.start()
+        dispatcher.start()
+        engine.start()
         log.info("Bot started. allowed_chat_ids=%s admin_chat_id=%s", allowed_ids, admin_id)
 
+    async def _post_stop(_: Application) -> None:
+        # the bot is still usable here, so queued alerts can drain
+        await engine.stop()
+        if digest is not None:
+            await digest.flush()
+        await dispatcher.stop()
+
     async def _post_shutdown(_: Application) -> None:
-        await watcher.stop()
+        engine.close()
+        state_store.flush(state)
+        state_store.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
 
     app.post_init = _post_init
+    app.post_stop = _post_stop
     app.post_shutdown = _post_shutdown
 
+    if webhook is not None:
+        asyncio.run(serve_webhook(app, webhook, settings))
+        return
     # ✅ run_polling باید سینک اجرا شود (نه await)
     app.run_polling()
 
 
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="posbot", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        "--check-config",
+        action="store_true",
+        help="validate the settings (.env and environment) and exit, without connecting",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.check_config:
+        run(Settings())
+        return
+
+    from pydantic import ValidationError
+
+    try:
+        settings = Settings()
+    except ValidationError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    problems = check_config(settings)
+    for msg in problems:
+        print(f"error: {msg}", file=sys.stderr)
+    if problems:
+        sys.exit(1)
+    print("config OK")
+
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import bisect
+import contextlib
+import copy
+import logging
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import (
+    TYPE_CHECKING,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Self,
+    Sequence,
+    Tuple,
+)
+
+if TYPE_CHECKING:  # http.server is only imported when the endpoint is enabled
+    from http.server import ThreadingHTTPServer
+
+log = logging.getLogger("posbot.metrics")
+
+# Prometheus text exposition (format 0.0.4), stdlib only. Metrics are declared at import
+# time and cost one attribute check per call until enable() is called.
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BYTES_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+_NULL_TIMER: ContextManager[None] = contextlib.nullcontext()
+
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    if v == int(v) and abs(v) < 1e15:
+        return str(int(v))
+    return repr(float(v))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values, strict=True)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.enabled = False
+        self._metrics: List["_Metric"] = []
+
+    def register(self, metric: "_Metric") -> None:
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        out: List[str] = []
+        for m in self._metrics:
+            out.append(f"# HELP {m.name} {m.help}")
+            out.append(f"# TYPE {m.name} {m.kind}")
+            out.extend(m.samples())
+        return "\n".join(out) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY
+    ) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.registry = registry
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], Self] = {}
+        registry.register(self)
+
+    def labels(self, *values: str) -> Self:
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}")
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._new_child()
+                    self._children[values] = child
+        return child
+
+    def _new_child(self) -> Self:
+        child = copy.copy(self)
+        child._lock = threading.Lock()
+        child._children = {}
+        child._reset()
+        return child
+
+    @abstractmethod
+    def _reset(self) -> None: ...
+
+    @abstractmethod
+    def _own_samples(self, label_values: Sequence[str]) -> Iterator[str]: ...
+
+    def samples(self) -> Iterator[str]:
+        if not self.labelnames:
+            yield from self._own_samples(())
+            return
+        for values, child in sorted(self._children.items()):
+            yield from child._own_samples(values)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY
+    ) -> None:
+        super().__init__(name, help, labelnames, registry)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        if not self.registry.enabled:
+            return
+        with self._lock:
+            self.value += amount
+
+    def _own_samples(self, label_values: Sequence[str]) -> Iterator[str]:
+        yield f"{self.name}{_labels(self.labelnames, label_values)} {_fmt(self.value)}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(
+        self, name: str, help: str, labelnames: Sequence[str] = (), registry: Registry = REGISTRY
+    ) -> None:
+        super().__init__(name, help, labelnames, registry)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.value = 0.0
+        self._fn: Optional[Callable[[], float]] = None
+
+    def set(self, value: float) -> None:
+        if self.registry.enabled:
+            self.value = float(value)
+
+    def set_function(self, fn: Callable[[], float]) -> None:
+        """Read the value from `fn` at scrape time (e.g. a queue depth)."""
+        self._fn = fn
+
+    def _own_samples(self, label_values: Sequence[str]) -> Iterator[str]:
+        value = self.value
+        if self._fn is not None:
+            try:
+                value = float(self._fn())
+            except Exception:
+                value = math.nan
+        yield f"{self.name}{_labels(self.labelnames, label_values)} {_fmt(value)}"
+
+
+class _Timer:
+    __slots__ = ("hist", "start")
+
+    def __init__(self, hist: "Histogram") -> None:
+        self.hist = hist
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc: object) -> None:
+        self.hist.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labelnames: Sequence[str] = (),
+        registry: Registry = REGISTRY,
+        *,
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, help, labelnames, registry)
+        self._reset()
+
+    def _reset(self) -> None:
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        if not self.registry.enabled:
+            return
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[i] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self) -> ContextManager[None]:
+        """`with hist.time(): ...` observes the block's duration; free when disabled."""
+        if not self.registry.enabled:
+            return _NULL_TIMER
+        return _Timer(self)
+
+    def _own_samples(self, label_values: Sequence[str]) -> Iterator[str]:
+        names = self.labelnames
+        cumulative = 0
+        for bound, n in zip(self.buckets + (math.inf,), self.counts, strict=True):
+            cumulative += n
+            le = f'le="{_fmt(bound)}"'
+            yield f"{self.name}_bucket{_labels(names, label_values, le)} {cumulative}"
+        yield f"{self.name}_sum{_labels(names, label_values)} {_fmt(self.sum)}"
+        yield f"{self.name}_count{_labels(names, label_values)} {self.count}"
+
+
+# --- posbot metrics ---
+
+FETCH_SECONDS = Histogram(
+    "posbot_fetch_seconds", "Time for the watcher to get positions (provider, threads, cache)"
+)
+PROVIDER_REQUEST_SECONDS = Histogram(
+    "posbot_provider_request_seconds", "Exchange SDK positions call duration"
+)
+PROVIDER_ERRORS = Counter("posbot_provider_errors_total", "Failed exchange SDK positions calls")
+TICK_SECONDS = Histogram("posbot_tick_seconds", "Watcher tick duration")
+TICK_ERRORS = Counter("posbot_tick_errors_total", "Watcher ticks that raised")
+CROSSINGS = Counter("posbot_crossings_total", "Crossing alerts fired", ("direction",))
+SUPPRESSED = Counter("posbot_suppressed_alerts_total", "Crossings suppressed by cooldown")
+POSITIONS = Gauge("posbot_positions", "Positions seen in the last poll")
+STATE_SAVE_SECONDS = Histogram("posbot_state_save_seconds", "State store write duration")
+STATE_SAVE_BYTES = Histogram(
+    "posbot_state_save_bytes", "Bytes written per state save (JSON backend)", buckets=BYTES_BUCKETS
+)
+NOTIFY_SECONDS = Histogram(
+    "posbot_notify_seconds", "Alert latency from crossing detection to Telegram delivery"
+)
+NOTIFY_FAILURES = Counter("posbot_notify_failures_total", "Alerts given up after retries")
+ALERT_QUEUE_DEPTH = Gauge("posbot_alert_queue_depth", "Alerts waiting for delivery")
+HANDLER_SECONDS = Histogram(
+    "posbot_telegram_handler_seconds", "Telegram command handler duration", ("command",)
+)
+
+
+def enable(registry: Registry = REGISTRY) -> None:
+    registry.enabled = True
+
+
+def _handler_class(registry: Registry) -> type:
+    from http.server import BaseHTTPRequestHandler
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format: str, *args: object) -> None:
+            log.debug("metrics %s", format % args)
+
+    return MetricsHandler
+
+
+def start_http_server(
+    port: int, addr: str = "127.0.0.1", registry: Registry = REGISTRY
+) -> ThreadingHTTPServer:
+    """Enable `registry` and serve it on http://addr:port/metrics from a daemon thread."""
+    from http.server import ThreadingHTTPServer
+
+    enable(registry)
+    server = ThreadingHTTPServer((addr, port), _handler_class(registry))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    log.info("Metrics on http://%s:%d/metrics", addr, server.server_port)
+    return server
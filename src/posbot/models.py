@@ -1,10 +1,27 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Optional
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
 
+# (account, symbol, side) -> interned key. Every poll rebuilds its Positions, but the
+# keys repeat, so they are formatted once and shared with the state map's dict keys.
+_KEYS: Dict[Tuple[str, str, str], str] = {}
+_KEYS_MAX = 1 << 18
 
-@dataclass(frozen=True)
+
+def position_key(account: str, symbol: str, side: str) -> str:
+    parts = (account, symbol, side)
+    key = _KEYS.get(parts)
+    if key is None:
+        if len(_KEYS) >= _KEYS_MAX:
+            _KEYS.clear()
+        key = f"{account}:{symbol}:{side}" if account else f"{symbol}:{side}"
+        key = _KEYS[parts] = sys.intern(key.upper())
+    return key
+
+
+@dataclass(frozen=True, slots=True)
 class Position:
     symbol: str
     side: str  # "LONG"/"SHORT" or similar
@@ -12,17 +29,41 @@ class Position:
     qty: Optional[float] = None
     entry_price: Optional[float] = None
     mark_price: Optional[float] = None
+    account: str = ""  # namespace in multi-account mode, "" for the single-account setup
+    _key: str = field(default="", init=False, repr=False, compare=False)
 
     @property
     def key(self) -> str:
-        return f"{self.symbol}:{self.side}".upper()
+        key = self._key
+        if not key:
+            key = position_key(self.account, self.symbol, self.side)
+            object.__setattr__(self, "_key", key)
+        return key
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class CrossingEvent:
     position_key: str
     symbol: str
     side: str
     from_pnl: float
     to_pnl: float
-    direction: str  # "LOSS_TO_PROFIT" | "PROFIT_TO_LOSS"
\ No newline at end of file
+    direction: str  # "LOSS_TO_PROFIT" | "PROFIT_TO_LOSS"
+    account: str = ""
+
+
+class PositionList(List[Position]):
+    """
+    One poll's positions plus, in multi-account mode, whether each account was fetched:
+    the positions of an account that failed are missing, not closed.
+    """
+
+    def __init__(
+        self, positions: Iterable[Position] = (), accounts: Optional[Mapping[str, bool]] = None
+    ) -> None:
+        super().__init__(positions)
+        self.accounts: Dict[str, bool] = dict(accounts or {})
+
+    def fetched(self, account: str) -> bool:
+        """False only for an account this poll tried and failed to fetch."""
+        return self.accounts.get(account, True)
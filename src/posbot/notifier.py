@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+from posbot import metrics
+
+log = logging.getLogger("posbot.notifier")
+
+SendFn = Callable[[int, str], Awaitable[Any]]
+T = TypeVar("T")
+
+# Telegram errors that another attempt cannot fix (bot blocked or removed from the chat,
+# malformed message, revoked token); matched by class name so telegram is not imported
+PERMANENT_ERRORS = frozenset({"Forbidden", "BadRequest", "InvalidToken", "ChatMigrated"})
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Flood-wait hint from a Telegram RetryAfter (int seconds or timedelta), if any."""
+    val = getattr(exc, "retry_after", None)
+    if val is None:
+        return None
+    if hasattr(val, "total_seconds"):
+        return float(val.total_seconds())
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def is_permanent_error(exc: BaseException) -> bool:
+    return any(cls.__name__ in PERMANENT_ERRORS for cls in type(exc).__mro__)
+
+
+class SlotLimiter:
+    """
+    Hands out send slots at least `interval` seconds apart. Callers reserve a slot
+    and sleep until it, so concurrent workers never exceed the rate.
+    """
+
+    def __init__(self, interval: float) -> None:
+        self.interval = interval
+        self._next_free = 0.0
+
+    def reserve(self, now: float) -> float:
+        slot = max(now, self._next_free)
+        self._next_free = slot + self.interval
+        return slot - now
+
+    def pause_until(self, ts: float) -> None:
+        self._next_free = max(self._next_free, ts)
+
+
+@dataclass
+class _Outgoing:
+    chat_id: int
+    text: str
+    enqueued_at: float
+    attempts: int = 0
+
+
+@dataclass
+class DispatchStats:
+    sent: int = 0
+    failed: int = 0
+    dropped: int = 0
+    retries: int = 0
+    flood_waits: int = 0
+    last_latency: float = 0.0
+    total_latency: float = 0.0
+    max_latency: float = 0.0
+
+
+class AlertDispatcher:
+    """
+    Queue + worker pool between the watcher and Telegram.
+
+    submit() only enqueues, so detection never waits on delivery. Workers respect a
+    per-chat and a global rate limit, retry flood-waits after the server-provided
+    retry_after (holding back every send meanwhile: the flood limit is the bot's), drop
+    messages that failed for a permanent reason at once, and retry other errors with
+    exponential backoff up to max_retries.
+    """
+
+    def __init__(
+        self,
+        send: SendFn,
+        *,
+        workers: int = 4,
+        per_chat_interval: float = 1.0,
+        global_rate: float = 25.0,
+        max_retries: int = 5,
+        max_queue: int = 10_000,
+    ) -> None:
+        self.send = send
+        self.workers = max(1, workers)
+        self.per_chat_interval = per_chat_interval
+        self.max_retries = max_retries
+        self.stats = DispatchStats()
+
+        self._queue: asyncio.Queue[_Outgoing] = asyncio.Queue(maxsize=max_queue)
+        self._global = SlotLimiter(1.0 / global_rate if global_rate > 0 else 0.0)
+        self._chats: Dict[int, SlotLimiter] = {}
+        self._tasks: List[asyncio.Task[None]] = []
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"alert-worker-{i}")
+            for i in range(self.workers)
+        ]
+
+    async def stop(self, drain_timeout: float = 5.0) -> None:
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            log.warning("Alert queue not drained on stop; %d messages dropped", self.depth)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, chat_id: int, text: str) -> None:
+        try:
+            self._queue.put_nowait(_Outgoing(chat_id, text, time.monotonic()))
+        except asyncio.QueueFull:
+            self.stats.dropped += 1
+            log.error("Alert queue full (%d); dropping message to %s", self.depth, chat_id)
+
+    def _chat_limiter(self, chat_id: int) -> SlotLimiter:
+        lim = self._chats.get(chat_id)
+        if lim is None:
+            lim = self._chats[chat_id] = SlotLimiter(self.per_chat_interval)
+        return lim
+
+    async def _wait_for_slot(self, chat_id: int) -> None:
+        now = time.monotonic()
+        delay = max(self._chat_limiter(chat_id).reserve(now), self._global.reserve(now))
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    async def _deliver(self, msg: _Outgoing) -> None:
+        while True:
+            await self._wait_for_slot(msg.chat_id)
+            msg.attempts += 1
+            try:
+                await self.send(msg.chat_id, msg.text)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if is_permanent_error(e):
+                    self.stats.failed += 1
+                    metrics.NOTIFY_FAILURES.inc()
+                    log.error("Alert to %s failed, not retrying: %s", msg.chat_id, e)
+                    return
+                if msg.attempts > self.max_retries:
+                    self.stats.failed += 1
+                    metrics.NOTIFY_FAILURES.inc()
+                    log.error(
+                        "Alert to %s failed after %d attempts: %s", msg.chat_id, msg.attempts, e
+                    )
+                    return
+                self.stats.retries += 1
+                wait = retry_after_seconds(e)
+                if wait is not None:
+                    self.stats.flood_waits += 1
+                    resume = time.monotonic() + wait
+                    self._chat_limiter(msg.chat_id).pause_until(resume)
+                    self._global.pause_until(resume)
+                    log.warning("Flood wait (chat %s): retry after %.1fs", msg.chat_id, wait)
+                else:
+                    wait = min(2.0 ** (msg.attempts - 1), 60.0)
+                    log.warning("Alert to %s failed (%s); retry in %.1fs", msg.chat_id, e, wait)
+                    await asyncio.sleep(wait)
+                continue
+
+            latency = time.monotonic() - msg.enqueued_at
+            self.stats.sent += 1
+            metrics.NOTIFY_SECONDS.observe(latency)
+            self.stats.last_latency = latency
+            self.stats.total_latency += latency
+            self.stats.max_latency = max(self.stats.max_latency, latency)
+            return
+
+    async def _worker(self) -> None:
+        while True:
+            msg = await self._queue.get()
+            try:
+                await self._deliver(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                log.exception("Alert worker crashed on a message")
+            finally:
+                self._queue.task_done()
+
+    def status_lines(self) -> List[str]:
+        s = self.stats
+        avg = s.total_latency / s.sent if s.sent else 0.0
+        return [
+            f"alerts: queued={self.depth} sent={s.sent} failed={s.failed} dropped={s.dropped} "
+            f"retries={s.retries} avg_latency={avg:.2f}s max_latency={s.max_latency:.2f}s"
+        ]
+
+
+class DigestBuffer(Generic[T]):
+    """
+    Collects items (crossing events) and hands them to `flush_fn` as one batch.
+
+    window <= 0 flushes every add() immediately (one digest per watcher tick);
+    otherwise the first add() starts a timer and everything added within `window`
+    seconds goes out together.
+    """
+
+    def __init__(
+        self, flush_fn: Callable[[List[T]], Awaitable[Any]], *, window: float = 0.0
+    ) -> None:
+        self.flush_fn = flush_fn
+        self.window = window
+        self._items: List[T] = []
+        self._timer: Optional[asyncio.Task[None]] = None
+
+    async def add(self, items: List[T]) -> None:
+        if not items:
+            return
+        self._items.extend(items)
+        if self.window <= 0:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later(), name="digest-timer")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.window)
+        self._timer = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        if self._timer is not None and self._timer is not asyncio.current_task():
+            self._timer.cancel()
+            self._timer = None
+        items, self._items = self._items, []
+        if items:
+            await self.flush_fn(items)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import threading
+import time
+import urllib.request
+from dataclasses import replace
+from typing import Any, Callable, Dict, List, Optional, Protocol
+
+from posbot.models import Position
+from posbot.provider import fetch_async
+
+log = logging.getLogger("posbot.pnl_engine")
+
+_SHORT_SIDES = {"SHORT", "SELL"}
+
+
+def local_unrealized_pnl(pos: Position, mark_price: float) -> Optional[float]:
+    """Linear-contract PnL (mark - entry) * qty, sign flipped for shorts; None if unknown."""
+    if pos.qty is None or pos.entry_price is None:
+        return None
+    direction = -1.0 if pos.side.upper() in _SHORT_SIDES else 1.0
+    return (mark_price - pos.entry_price) * abs(pos.qty) * direction
+
+
+class MarkPriceSource(Protocol):
+    def get_mark_prices(self) -> Dict[str, float]: ...
+
+
+class BitunixTickerSource:
+    """
+    Mark prices for every symbol from the public tickers endpoint (no auth, one request).
+    Results are reused for `max_age` seconds so several accounts polling in the same
+    tick share a single request.
+    """
+
+    def __init__(self, base_url: str, *, timeout: float = 5.0, max_age: float = 1.0) -> None:
+        self.url = base_url.rstrip("/") + "/api/v1/futures/market/tickers"
+        self.timeout = timeout
+        self.max_age = max_age
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._cached: Dict[str, float] = {}
+        self._cached_at = float("-inf")
+
+    def _request(self) -> Any:
+        req = urllib.request.Request(self.url, headers={"Accept": "application/json"})
+        with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+            return json.loads(resp.read())
+
+    def get_mark_prices(self) -> Dict[str, float]:
+        with self._lock:
+            if time.monotonic() - self._cached_at < self.max_age:
+                return self._cached
+            raw = self._request()
+            self.requests += 1
+            if not isinstance(raw, dict) or raw.get("code") not in (0, "0", None):
+                raise RuntimeError(f"ticker error: {raw!r:.200}")
+            prices: Dict[str, float] = {}
+            for item in raw.get("data") or []:
+                price = item.get("markPrice") or item.get("lastPrice")
+                if item.get("symbol") and price not in (None, ""):
+                    prices[str(item["symbol"])] = float(price)
+            self._cached, self._cached_at = prices, time.monotonic()
+            return prices
+
+
+class MarkPriceProvider:
+    """
+    Recomputes unrealized PnL locally from public mark prices between position polls.
+
+    The authenticated positions endpoint is called at most every `refresh_interval`
+    seconds (qty, entry price and the set of open positions come from there); every
+    other get_positions() only fetches tickers. Positions opened or closed in between
+    show up at the next refresh. Positions without qty/entry price, or whose symbol
+    has no ticker, keep the PnL the exchange last reported. If the ticker request
+    fails we fall back to a full position poll.
+    """
+
+    def __init__(
+        self,
+        provider: Any,
+        tickers: MarkPriceSource,
+        *,
+        refresh_interval: float = 60.0,
+        ticker_timeout: float = 5.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.provider = provider
+        self.tickers = tickers
+        self.refresh_interval = refresh_interval
+        self.ticker_timeout = ticker_timeout
+        self.clock = clock
+
+        self.position_polls = 0
+        self.ticker_polls = 0
+        self.ticker_failures = 0
+        self._positions: Optional[List[Position]] = None
+        self._polled_at = 0.0
+
+    @property
+    def stats(self) -> Any:
+        return getattr(self.provider, "stats", None)
+
+    async def _poll_positions(self) -> List[Position]:
+        positions = await fetch_async(self.provider.get_positions)
+        self.position_polls += 1
+        self._positions = positions
+        self._polled_at = self.clock()
+        return positions
+
+    async def get_positions(self) -> List[Position]:
+        cached = self._positions
+        if cached is None or self.clock() - self._polled_at >= self.refresh_interval:
+            return await self._poll_positions()
+        if not cached:
+            return cached
+
+        try:
+            marks = await asyncio.wait_for(
+                asyncio.to_thread(self.tickers.get_mark_prices), timeout=self.ticker_timeout
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.ticker_failures += 1
+            log.warning("Mark price fetch failed (%s); polling positions instead", e)
+            return await self._poll_positions()
+        self.ticker_polls += 1
+
+        out: List[Position] = []
+        for pos in cached:
+            mark = marks.get(pos.symbol)
+            pnl = local_unrealized_pnl(pos, mark) if mark is not None else None
+            out.append(pos if pnl is None else replace(pos, unrealized_pnl=pnl, mark_price=mark))
+        return out
+
+    def status_lines(self) -> List[str]:
+        inner = getattr(self.provider, "status_lines", None)
+        age = self.clock() - self._polled_at if self._positions is not None else None
+        return (inner() if inner else []) + [
+            f"local pnl: position polls={self.position_polls} ticker polls={self.ticker_polls} "
+            f"ticker failures={self.ticker_failures}"
+            + (f" positions age={age:.0f}s" if age is not None else "")
+        ]
+
+    def shutdown(self) -> None:
+        if hasattr(self.provider, "shutdown"):
+            self.provider.shutdown()
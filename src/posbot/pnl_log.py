@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import glob
+import logging
+import mmap
+import os
+import re
+import struct
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+log = logging.getLogger("posbot.pnl_log")
+
+# Segment layout: 8-byte magic, then fixed-width little-endian records
+#   float64 timestamp | uint32 key id | float64 unrealized pnl   (20 bytes, no padding)
+# Key ids index into keys.txt (one key per line, append-only, shared by all segments).
+MAGIC = b"PNLSEG01"
+RECORD = struct.Struct("<dId")
+KEYS_FILE = "keys.txt"
+SEGMENT_GLOB = "pnl-*.seg"
+# pnl-<first sample, ms>-<seq>.seg; logs written before the sequence was fixed-width have
+# pnl-<ms>.seg and pnl-<ms>-<n>.seg, so readers order segments by the parsed numbers
+_SEGMENT_NAME = re.compile(r"pnl-(\d+)(?:-(\d+))?\.seg$")
+
+
+class PnlLog:
+    """
+    Append-only PnL sample log.
+
+    record() only buffers a sample when the PnL of that key changed since the last
+    one written, or when that was more than `keyframe_seconds` ago, so a tick costs
+    O(changed positions); flush() writes the buffer with one write() call. The
+    keyframes let a reader tell an open position with a flat PnL from a closed one: a
+    key with no sample for longer than keyframe_seconds was not being polled.
+
+    Segments rotate by size or age, and a new segment is started on every open so a
+    torn tail from a crash never gets appended to.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        *,
+        segment_max_bytes: int = 64 * 1024 * 1024,
+        segment_max_seconds: float = 3600.0,
+        keyframe_seconds: float = 300.0,
+    ) -> None:
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_seconds = segment_max_seconds
+        self.keyframe_seconds = keyframe_seconds
+        os.makedirs(directory, exist_ok=True)
+
+        self._key_ids: Dict[str, int] = {}
+        for i, key in enumerate(read_keys(directory)):
+            self._key_ids[key] = i
+        self._keys_f = open(os.path.join(directory, KEYS_FILE), "a", encoding="utf-8")
+
+        self._last: Dict[int, Tuple[float, float]] = {}  # key id -> (pnl, ts) last written
+        self._buf = bytearray()
+        self._seg: Optional[Any] = None
+        self._seg_bytes = 0
+        self._seg_opened = 0.0
+        self._buf_ts = 0.0
+        self.records_written = 0
+
+    def _key_id(self, key: str) -> int:
+        kid = self._key_ids.get(key)
+        if kid is None:
+            kid = len(self._key_ids)
+            self._key_ids[key] = kid
+            self._keys_f.write(key + "\n")
+            self._keys_f.flush()
+        return kid
+
+    def record(self, ts: float, key: str, pnl: float) -> None:
+        kid = self._key_id(key)
+        last = self._last.get(kid)
+        if (
+            last is not None
+            and last[0] == pnl
+            and (self.keyframe_seconds <= 0 or ts - last[1] < self.keyframe_seconds)
+        ):
+            return
+        self._last[kid] = (pnl, ts)
+        if not self._buf:
+            self._buf_ts = ts
+        self._buf += RECORD.pack(ts, kid, pnl)
+
+    def _open_segment(self, ts: float) -> None:
+        if self._seg is not None:
+            self._seg.close()
+        n = 0
+        path = os.path.join(self.directory, f"pnl-{int(ts * 1000):015d}-{n:04d}.seg")
+        while os.path.exists(path):
+            n += 1
+            path = os.path.join(self.directory, f"pnl-{int(ts * 1000):015d}-{n:04d}.seg")
+        self._seg = open(path, "ab")
+        self._seg.write(MAGIC)
+        self._seg_bytes = len(MAGIC)
+        self._seg_opened = time.monotonic()
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        if (
+            self._seg is None
+            or self._seg_bytes >= self.segment_max_bytes
+            or time.monotonic() - self._seg_opened >= self.segment_max_seconds
+        ):
+            # segments are named after the first sample they hold
+            self._open_segment(self._buf_ts)
+        assert self._seg is not None
+        self._seg.write(self._buf)
+        self._seg.flush()
+        self._seg_bytes += len(self._buf)
+        self.records_written += len(self._buf) // RECORD.size
+        self._buf.clear()
+
+    def close(self) -> None:
+        self.flush()
+        if self._seg is not None:
+            self._seg.close()
+            self._seg = None
+        self._keys_f.close()
+
+
+def read_keys(directory: str) -> List[str]:
+    path = os.path.join(directory, KEYS_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f if line.strip()]
+
+
+def _segment_order(path: str) -> Tuple[int, int, str]:
+    m = _SEGMENT_NAME.search(os.path.basename(path))
+    if m is None:
+        return (-1, 0, path)
+    return (int(m.group(1)), int(m.group(2) or 0), path)
+
+
+def segment_paths(directory: str) -> List[str]:
+    """Segments in write order: by first-sample time, then sequence number."""
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_GLOB)), key=_segment_order)
+
+
+def iter_segment(path: str) -> Iterator[Tuple[float, int, float]]:
+    """Yield (ts, key_id, pnl) from one segment; a torn trailing record is ignored."""
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= len(MAGIC):
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if mm[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path}: not a PnL log segment")
+            end = len(MAGIC) + (size - len(MAGIC)) // RECORD.size * RECORD.size
+            view = memoryview(mm)[len(MAGIC) : end]
+            try:
+                yield from RECORD.iter_unpack(view)
+            finally:
+                view.release()
+
+
+def scan(
+    directory: str,
+    *,
+    start: Optional[float] = None,
+    end: Optional[float] = None,
+) -> Iterator[Tuple[float, str, float]]:
+    """Yield (ts, position_key, pnl) for every sample in the log, in write order."""
+    keys = read_keys(directory)
+    for path in segment_paths(directory):
+        for ts, kid, pnl in iter_segment(path):
+            if start is not None and ts < start:
+                continue
+            if end is not None and ts > end:
+                continue
+            yield ts, keys[kid], pnl
+
+
+def load_columns(path: str) -> Any:
+    """
+    Memory-map one segment as a NumPy structured array (fields ts/key/pnl).
+    Requires numpy; use iter_segment() without it.
+    """
+    import numpy as np
+
+    dtype = np.dtype([("ts", "<f8"), ("key", "<u4"), ("pnl", "<f8")])
+    size = os.path.getsize(path)
+    count = (size - len(MAGIC)) // dtype.itemsize
+    return np.memmap(path, dtype=dtype, mode="r", offset=len(MAGIC), shape=(count,))
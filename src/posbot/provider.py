@@ -1,11 +1,17 @@
 from __future__ import annotations
-import inspect
 
-import inspect
+import asyncio
 import importlib
+import inspect
 import logging
-from typing import Any, Callable, List, Protocol
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, replace
+from typing import Any, Awaitable, Callable, List, Optional, Protocol, Tuple, Union
 
+from posbot import metrics
 from posbot.models import Position
 
 log = logging.getLogger("posbot.provider")
@@ -15,6 +21,302 @@ class ExchangeProvider(Protocol):
     def get_positions(self) -> List[Position]: ...
 
 
+class AsyncExchangeProvider(Protocol):
+    async def get_positions(self) -> List[Position]: ...
+
+
+PositionsFetcher = Callable[[], Union[List[Position], Awaitable[List[Position]]]]
+
+
+async def fetch_async(fetch: PositionsFetcher) -> List[Position]:
+    """Call a sync or async positions fetcher and return its result."""
+    result = fetch()
+    if inspect.isawaitable(result):
+        return await result
+    return result
+
+
+class ProviderTimeoutError(TimeoutError):
+    pass
+
+
+class ProviderError(Exception):
+    pass
+
+
+class RateLimitedError(ProviderError):
+    def __init__(self, msg: str, retry_after: Optional[float] = None) -> None:
+        super().__init__(msg)
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(ProviderError):
+    pass
+
+
+def retry_after_hint(exc: BaseException) -> Optional[float]:
+    """
+    Seconds the exchange asked us to wait, if the error says so: RateLimitedError,
+    anything with a retry_after attribute, or an HTTP 429 response with Retry-After.
+    Returns 0.0 for a rate limit without a hint, None when it is not a rate limit.
+    """
+    val = getattr(exc, "retry_after", None)
+    if val is not None:
+        if hasattr(val, "total_seconds"):
+            return float(val.total_seconds())
+        try:
+            return float(val)
+        except (TypeError, ValueError):
+            return 0.0
+    if isinstance(exc, RateLimitedError):
+        return 0.0
+
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None) or getattr(exc, "status", None)
+    if status == 429:
+        headers = getattr(response, "headers", None) or {}
+        try:
+            return float(headers.get("Retry-After", 0))
+        except (TypeError, ValueError):
+            return 0.0
+    return None
+
+
+@dataclass
+class FetchStats:
+    calls: int = 0
+    errors: int = 0
+    timeouts: int = 0
+    in_flight: int = 0
+    last_queue_wait: float = 0.0
+    last_call_time: float = 0.0
+    total_queue_wait: float = 0.0
+    total_call_time: float = 0.0
+
+    def summary(self) -> str:
+        n = max(self.calls, 1)
+        return (
+            f"calls={self.calls} errors={self.errors} timeouts={self.timeouts} "
+            f"in_flight={self.in_flight} "
+            f"avg_wait={self.total_queue_wait / n * 1000:.1f}ms "
+            f"avg_call={self.total_call_time / n * 1000:.1f}ms"
+        )
+
+
+class ThreadedProvider:
+    """
+    Async facade over a blocking provider.
+
+    get_positions() runs on a bounded thread pool so the event loop keeps serving
+    Telegram commands while the exchange round-trip is in progress. The timeout
+    covers queue wait + call time; on timeout (or cancellation) a call that has not
+    started yet is dropped from the queue, one already running is left to finish in
+    its thread and its result is discarded.
+    """
+
+    def __init__(
+        self,
+        provider: ExchangeProvider,
+        *,
+        max_workers: int = 2,
+        timeout_seconds: float = 10.0,
+        executor: Optional[ThreadPoolExecutor] = None,
+    ) -> None:
+        self.provider = provider
+        self.timeout_seconds = timeout_seconds
+        self.stats = FetchStats()
+        self._lock = threading.Lock()
+        # a shared executor (multi-account mode) is owned and shut down by the caller
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(
+            max_workers=max(1, max_workers), thread_name_prefix="provider"
+        )
+
+    def _call(self, submitted: float) -> List[Position]:
+        started = time.perf_counter()
+        ok = False
+        try:
+            out = self.provider.get_positions()
+            ok = True
+            return out
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.stats.calls += 1
+                if not ok:
+                    self.stats.errors += 1
+                self.stats.last_queue_wait = started - submitted
+                self.stats.last_call_time = elapsed
+                self.stats.total_queue_wait += started - submitted
+                self.stats.total_call_time += elapsed
+
+    async def get_positions(self) -> List[Position]:
+        loop = asyncio.get_running_loop()
+        fut = loop.run_in_executor(self._executor, self._call, time.perf_counter())
+        with self._lock:
+            self.stats.in_flight += 1
+        try:
+            return await asyncio.wait_for(fut, timeout=self.timeout_seconds)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.stats.timeouts += 1
+            raise ProviderTimeoutError(
+                f"get_positions exceeded {self.timeout_seconds}s"
+            ) from None
+        finally:
+            with self._lock:
+                self.stats.in_flight -= 1
+
+    def status_lines(self) -> List[str]:
+        inner = getattr(self.provider, "status_lines", None)
+        return [f"provider: {self.stats.summary()}"] + (inner() if inner else [])
+
+    def shutdown(self) -> None:
+        if self._owns_executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        if hasattr(self.provider, "shutdown"):
+            self.provider.shutdown()  # e.g. close pooled connections
+
+
+class CircuitBreaker:
+    """
+    closed -> open after `failure_threshold` consecutive failures (or at once on a
+    rate limit); open -> half_open when the backoff expires, letting one probe
+    through; the probe closes the circuit or re-opens it with a doubled backoff.
+
+    Backoff is base * 2**(opens-1), capped at max_backoff, with +-jitter, and never
+    shorter than a retry-after the exchange sent.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(
+        self,
+        *,
+        failure_threshold: int = 3,
+        base_backoff: float = 5.0,
+        max_backoff: float = 300.0,
+        jitter: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.rng = rng
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.rate_limited = 0
+        self.rejected = 0
+        self.opens = 0
+        self.open_until = 0.0
+        self._streak_opens = 0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+        if self.state == self.OPEN and self.clock() >= self.open_until:
+            self.state = self.HALF_OPEN
+            self._probing = False
+        if self.state == self.HALF_OPEN and not self._probing:
+            self._probing = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        if self.state != self.CLOSED:
+            log.info("Provider circuit closed after %d failures", self.consecutive_failures)
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._streak_opens = 0
+        self._probing = False
+
+    def release_probe(self) -> None:
+        """A call allow() let through ended without a result (e.g. it was cancelled)."""
+        self._probing = False
+
+    def record_failure(self, retry_after: Optional[float] = None) -> None:
+        self.consecutive_failures += 1
+        self.total_failures += 1
+        if retry_after is not None:
+            self.rate_limited += 1
+        if (
+            self.state == self.HALF_OPEN
+            or retry_after is not None
+            or self.consecutive_failures >= self.failure_threshold
+        ):
+            self._open(retry_after)
+
+    def _open(self, retry_after: Optional[float]) -> None:
+        self._streak_opens += 1
+        self.opens += 1
+        backoff = min(self.max_backoff, self.base_backoff * 2 ** (self._streak_opens - 1))
+        backoff *= 1.0 + self.jitter * (2.0 * self.rng() - 1.0)
+        if retry_after:
+            backoff = max(backoff, retry_after)
+        self.state = self.OPEN
+        self._probing = False
+        self.open_until = self.clock() + backoff
+        log.warning(
+            "Provider circuit open for %.1fs (consecutive failures=%d)",
+            backoff,
+            self.consecutive_failures,
+        )
+
+    def status_line(self) -> str:
+        line = (
+            f"circuit: {self.state} failures={self.consecutive_failures}/"
+            f"{self.total_failures} rate_limited={self.rate_limited} "
+            f"opens={self.opens} rejected={self.rejected}"
+        )
+        if self.state == self.OPEN:
+            line += f" retry in {max(0.0, self.open_until - self.clock()):.0f}s"
+        return line
+
+
+class CircuitBreakerProvider:
+    """Async provider wrapper that fails fast with CircuitOpenError while the circuit is open."""
+
+    def __init__(self, provider: Any, breaker: Optional[CircuitBreaker] = None) -> None:
+        self.provider = provider
+        self.breaker = breaker or CircuitBreaker()
+
+    @property
+    def stats(self) -> Optional[FetchStats]:
+        return getattr(self.provider, "stats", None)
+
+    async def get_positions(self) -> List[Position]:
+        if not self.breaker.allow():
+            # constant message: repeated rejections must not look like a new error
+            raise CircuitOpenError("exchange circuit open, backing off")
+        try:
+            out = await fetch_async(self.provider.get_positions)
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self.breaker.record_failure(retry_after_hint(e))
+            raise
+        self.breaker.record_success()
+        return out
+
+    def status_lines(self) -> List[str]:
+        inner = getattr(self.provider, "status_lines", None)
+        return (inner() if inner else []) + [self.breaker.status_line()]
+
+    def shutdown(self) -> None:
+        if hasattr(self.provider, "shutdown"):
+            self.provider.shutdown()
+
+
 def _import_from_path(path: str) -> Any:
     if ":" in path:
         mod, attr = path.split(":", 1)
@@ -23,6 +325,118 @@ def _import_from_path(path: str) -> Any:
     return importlib.import_module(path)
 
 
+_WRAPPER_KEYS = ("data", "result", "account")
+_LIST_KEYS = ("positions", "positionList", "list")
+_PNL_FIELDS = ("unrealizedPnl", "unrealizedPNL", "unrealizedProfit")
+_QTY_FIELDS = ("qty", "positionAmt", "positionQty", "size")
+_ENTRY_FIELDS = ("avgOpenPrice", "entryPrice", "openPrice", "avgPrice")
+_MARK_FIELDS = ("markPrice", "mark_price")
+_MISMATCH: Any = object()
+_RATE_LIMIT_HINTS = ("too many", "too frequent", "rate limit")
+
+
+_Fields = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+@dataclass(frozen=True)
+class _CallPlan:
+    """
+    What SdkProvider learned about the SDK: the bound method and its args, the key
+    path from the response to the positions list, and which PnL field items use.
+    path/pnl_field/fields stay None until a response reveals them.
+    """
+
+    fn: Callable[..., Any]
+    args: Tuple[Any, ...]
+    path: Optional[Tuple[str, ...]] = None
+    pnl_field: Optional[str] = None
+    fields: Optional["_Fields"] = None  # qty, entry price, mark price field names
+
+
+def _resolve_path(raw: Any) -> Optional[Tuple[str, ...]]:
+    # None means "no positions list in this response" (nothing to cache yet)
+    if not isinstance(raw, dict):
+        return ()
+    path: Tuple[str, ...] = ()
+    for key in _WRAPPER_KEYS:
+        if key in raw:
+            path = (key,)
+            raw = raw[key]
+            break
+    if not isinstance(raw, dict):
+        return path
+    for key in _LIST_KEYS:
+        if key in raw:
+            return path + (key,)
+    return None
+
+
+def _walk(raw: Any, path: Tuple[str, ...]) -> Any:
+    for key in path:
+        if not isinstance(raw, dict) or key not in raw:
+            return _MISMATCH
+        raw = raw[key]
+    if raw is not None and not isinstance(raw, list):
+        return _MISMATCH
+    return raw
+
+
+def check_error_code(raw: Any) -> None:
+    # {"code": <non-zero>, "msg": ...} is an exchange error, not "no positions"
+    if not isinstance(raw, dict) or "code" not in raw or raw["code"] in (0, "0"):
+        return
+    msg = f"exchange error code={raw['code']}: {raw.get('msg', '')}"
+    if any(h in str(raw.get("msg", "")).lower() for h in _RATE_LIMIT_HINTS):
+        raise RateLimitedError(msg)
+    raise ProviderError(msg)
+
+
+def _probe_pnl(item: Any, current: Optional[str]) -> Tuple[Optional[str], Any]:
+    for name in _PNL_FIELDS:
+        val = item.get(name)
+        if val:
+            return name, val
+    return current, 0
+
+
+def _resolve_fields(item: Any) -> _Fields:
+    def first(names: Tuple[str, ...]) -> Optional[str]:
+        return next((n for n in names if item.get(n) not in (None, "")), None)
+
+    return first(_QTY_FIELDS), first(_ENTRY_FIELDS), first(_MARK_FIELDS)
+
+
+def _num(item: Any, name: Optional[str]) -> Optional[float]:
+    if name is None:
+        return None
+    val = item.get(name)
+    return None if val in (None, "") else float(val)
+
+
+def _probe_num(
+    item: Any, names: Tuple[str, ...], current: Optional[str]
+) -> Tuple[Optional[str], Optional[float]]:
+    for name in names:
+        val = item.get(name)
+        if val not in (None, ""):
+            return name, float(val)
+    return current, None
+
+
+def position_from_item(item: Any, fields: Optional[_Fields] = None) -> Position:
+    """One exchange position object (REST list item or push payload) -> Position."""
+    _, pnl_raw = _probe_pnl(item, None)
+    qty_f, entry_f, mark_f = fields or _resolve_fields(item)
+    return Position(
+        symbol=str(item.get("symbol", "")),
+        side=str(item.get("side", "UNKNOWN")),
+        unrealized_pnl=float(pnl_raw or 0),
+        qty=_num(item, qty_f),
+        entry_price=_num(item, entry_f),
+        mark_price=_num(item, mark_f),
+    )
+
+
 class SdkProvider:
     def __init__(
         self,
@@ -33,6 +447,7 @@ class SdkProvider:
         api_secret: str,
         base_url: str,
         margin_coin: str,
+        client: Any = None,
     ) -> None:
         self.module_name = module_name
         self.factory_path = factory_path
@@ -42,7 +457,18 @@ class SdkProvider:
         self.base_url = base_url
         self.margin_coin = margin_coin
 
-        self.client = self._build_client()
+        self._client = client
+        self._client_lock = threading.Lock()
+        self._plan: Optional[_CallPlan] = None
+
+    @property
+    def client(self) -> Any:
+        # the SDK is imported and its client built on the first poll, not at startup
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_client()
+        return self._client
 
     def _construct_client(self, factory_obj: Any) -> Any:
         sig = inspect.signature(factory_obj)
@@ -65,7 +491,7 @@ class SdkProvider:
         factory_obj = _import_from_path(self.factory_path)
         return self._construct_client(factory_obj)
 
-    def get_positions(self) -> List[Position]:
+    def _compile_call(self) -> _CallPlan:
         fn: Callable[..., Any] = getattr(self.client, self.positions_call)
 
         sig = inspect.signature(fn)
@@ -73,41 +499,75 @@ class SdkProvider:
 
         # if the first positional parameter is margin_coin, pass it; otherwise call with no args
         if params and params[0].name in {"margin_coin", "marginCoin"}:
-            raw = fn(self.margin_coin)
-        else:
-            raw = fn()
-
-        if isinstance(raw, dict):
-            for key in ("data", "result", "account"):
-                if key in raw:
-                    raw = raw[key]
-                    break
-
-            if isinstance(raw, dict):
-                if "positions" in raw:
-                    raw = raw["positions"]
-                elif "positionList" in raw:
-                    raw = raw["positionList"]
-                elif "list" in raw:
-                    raw = raw["list"]
-                else:
-                    raw = []
-            # اگر raw["data"] خودش list بود، همینطور می‌ماند (دقیقاً کیس Bitunix)
+            return _CallPlan(fn=fn, args=(self.margin_coin,))
+        return _CallPlan(fn=fn, args=())
+
+    def get_positions(self) -> List[Position]:
+        plan = self._plan or self._compile_call()
+        try:
+            with metrics.PROVIDER_REQUEST_SECONDS.time():
+                raw = plan.fn(*plan.args)
+        except TypeError:
+            # the client method signature may have changed under us
+            self._plan = None
+            metrics.PROVIDER_ERRORS.inc()
+            raise
+        except Exception:
+            metrics.PROVIDER_ERRORS.inc()
+            raise
+        check_error_code(raw)
 
+        items = _walk(raw, plan.path) if plan.path is not None else _MISMATCH
+        if items is _MISMATCH:
+            path = _resolve_path(raw)
+            if path is None:
+                items = []
+            else:
+                if plan.path is not None:
+                    log.info("SDK response shape changed; new path=%s", path)
+                plan = replace(plan, path=path, fields=None)
+                items = raw
+                for key in path:
+                    items = items[key]
+        # اگر raw["data"] خودش list بود، path = ("data",) (دقیقاً کیس Bitunix)
 
         out: List[Position] = []
-        for item in raw or []:
-            symbol = str(item.get("symbol", ""))
-            pnl = float(
-                item.get("unrealizedPnl")
-                or item.get("unrealizedPNL")
-                or item.get("unrealizedProfit")
-                or 0
+        pnl_field = plan.pnl_field
+        fields = plan.fields
+        qty_f, entry_f, mark_f = fields or (None, None, None)
+        for item in items or []:
+            pnl_raw = item.get(pnl_field) if pnl_field is not None else None
+            if not pnl_raw:
+                # slow path: first item, a new PnL field name, or a falsy value which the
+                # original `a or b or c or 0` chain would skip past
+                pnl_field, pnl_raw = _probe_pnl(item, pnl_field)
+            # like the PnL probe: a name the first item lacked, or one this item spells
+            # differently, is looked up again instead of staying unresolved for good
+            qty = _num(item, qty_f)
+            if qty is None:
+                qty_f, qty = _probe_num(item, _QTY_FIELDS, qty_f)
+            entry = _num(item, entry_f)
+            if entry is None:
+                entry_f, entry = _probe_num(item, _ENTRY_FIELDS, entry_f)
+            mark = _num(item, mark_f)
+            if mark is None:
+                mark_f, mark = _probe_num(item, _MARK_FIELDS, mark_f)
+            out.append(
+                Position(
+                    symbol=str(item.get("symbol", "")),
+                    side=str(item.get("side", "UNKNOWN")),
+                    unrealized_pnl=float(pnl_raw or 0),
+                    qty=qty,
+                    entry_price=entry,
+                    mark_price=mark,
+                )
             )
 
-            side = str(item.get("side", "UNKNOWN"))
-            out.append(Position(symbol=symbol, side=side, unrealized_pnl=pnl))
-
+        if out:
+            fields = (qty_f, entry_f, mark_f)
+        if pnl_field != plan.pnl_field or fields != plan.fields:
+            plan = replace(plan, pnl_field=pnl_field, fields=fields)
+        self._plan = plan
         return out
 
 
@@ -118,4 +578,13 @@ class MockProvider:
     def get_positions(self) -> List[Position]:
         self._tick += 1
         pnl = -1.0 + 0.2 * (self._tick % 15)
-        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=pnl)]
+        return [
+            Position(
+                symbol="BTCUSDT",
+                side="LONG",
+                unrealized_pnl=pnl,
+                qty=1.0,
+                entry_price=100.0,
+                mark_price=100.0 + pnl,
+            )
+        ]
@@ -0,0 +1,296 @@
+"""
+Offline replay of recorded PnL histories through the real Watcher.
+
+    posbot-replay history.csv --threshold 0.5,1,2 --cooldown 0,300,600 --poll-interval 15
+
+Inputs: CSV or JSONL with ts, pnl and either key ("BTCUSDT:LONG", "ACC:BTCUSDT:LONG")
+or symbol/side[/account]; or a PnL log directory written by PNL_LOG_DIR. Samples with
+the same timestamp form one tick; time is virtual, so a replay runs as fast as the
+detection code allows.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from itertools import groupby
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from posbot.models import CrossingEvent, Position
+from posbot.pnl_log import scan
+from posbot.state_store import BotState, MemoryStateStore
+from posbot.watcher import Watcher
+
+Sample = Tuple[float, str, float]  # ts, position key, pnl
+Tick = Tuple[float, List[Position]]
+
+
+def _key_from_row(row: Dict[str, str]) -> str:
+    if row.get("key"):
+        return str(row["key"])
+    parts = [row.get("account") or "", str(row["symbol"]), str(row.get("side") or "UNKNOWN")]
+    return ":".join(p for p in parts if p)
+
+
+def _pnl_from_row(row: Dict[str, str]) -> float:
+    val = row.get("pnl")
+    if val in (None, ""):
+        val = row["unrealized_pnl"]
+    return float(val)
+
+
+def read_csv(path: str) -> Iterator[Sample]:
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield float(row["ts"]), _key_from_row(row), _pnl_from_row(row)
+
+
+def read_jsonl(path: str) -> Iterator[Sample]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                yield float(row["ts"]), _key_from_row(row), _pnl_from_row(row)
+
+
+def read_samples(path: str) -> Iterator[Sample]:
+    """Samples from a CSV/JSONL file or a PnL log directory, in file order."""
+    if os.path.isdir(path):
+        return scan(path)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return read_csv(path)
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return read_jsonl(path)
+    raise ValueError(f"unknown history format: {path} (expected .csv, .jsonl or a log dir)")
+
+
+def _position(key: str, pnl: float) -> Position:
+    parts = key.split(":")
+    account = parts[0] if len(parts) > 2 else ""
+    symbol, side = (parts[-2], parts[-1]) if len(parts) > 1 else (parts[0], "UNKNOWN")
+    return Position(symbol=symbol, side=side, unrealized_pnl=pnl, account=account)
+
+
+def build_ticks(samples: Iterable[Sample]) -> List[Tick]:
+    """
+    Group samples into watcher ticks by timestamp (sorted, stable for equal ts).
+    A tick only carries the positions sampled at that time; the watcher leaves the
+    others untouched, which is what it would conclude from an unchanged PnL anyway.
+    """
+    ordered = sorted(samples, key=lambda s: s[0])
+    return [
+        (ts, [_position(key, pnl) for _, key, pnl in group])
+        for ts, group in groupby(ordered, key=lambda s: s[0])
+    ]
+
+
+@dataclass
+class ReplayResult:
+    threshold: float
+    cooldown: float
+    poll_interval: float = 0.0  # 0: the watcher sees every sample timestamp
+    ticks: int = 0
+    samples: int = 0
+    alerts: int = 0
+    suppressed: int = 0
+    by_direction: Dict[str, int] = field(default_factory=dict)
+    # seconds from the recorded PnL entering the alert zone (>= +T / <= -T) to the alert
+    latency_mean: float = 0.0
+    latency_p50: float = 0.0
+    latency_p95: float = 0.0
+    latency_max: float = 0.0
+    elapsed: float = 0.0
+
+    def summary(self) -> str:
+        poll = f" poll={self.poll_interval:g}s" if self.poll_interval else ""
+        return (
+            f"threshold={self.threshold:g} cooldown={self.cooldown:g}{poll}: "
+            f"alerts={self.alerts} suppressed={self.suppressed} "
+            f"latency mean={self.latency_mean:.1f}s p95={self.latency_p95:.1f}s "
+            f"max={self.latency_max:.1f}s"
+        )
+
+
+def _percentile(values: Sequence[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+async def _replay(
+    ticks: Sequence[Tick], threshold: float, cooldown: float, poll_interval: float
+) -> ReplayResult:
+    now = 0.0
+    batch: List[Position] = []
+    fired: List[CrossingEvent] = []
+
+    async def fetch() -> List[Position]:
+        return batch
+
+    async def notify(ev: CrossingEvent) -> None:
+        fired.append(ev)
+
+    watcher = Watcher(
+        state_store=MemoryStateStore(),
+        # the bot keeps whole seconds (COOLDOWN_SECONDS is an int)
+        state=BotState(
+            watch_enabled=True, pnl_threshold=threshold, cooldown_seconds=int(cooldown)
+        ),
+        fetch_positions=fetch,
+        notify=notify,
+        poll_interval_seconds=1,
+        clock=lambda: now,
+    )
+
+    result = ReplayResult(threshold=threshold, cooldown=cooldown, poll_interval=poll_interval)
+    zone: Dict[str, int] = {}  # +1 / -1 once a key's PnL reached +T / -T
+    zone_since: Dict[str, float] = {}
+    pending: Dict[str, Position] = {}  # latest sample per key since the last poll
+    latencies: List[float] = []
+
+    async def poll(at: float) -> None:
+        nonlocal now, batch
+        now, batch = at, list(pending.values())
+        pending.clear()
+        await watcher._tick()
+        result.ticks += 1
+        for ev in fired:
+            latencies.append(at - zone_since.get(ev.position_key, at))
+            result.by_direction[ev.direction] = result.by_direction.get(ev.direction, 0) + 1
+        result.alerts += len(fired)
+        fired.clear()
+
+    started = time.perf_counter()
+    next_poll: Optional[float] = None
+    for ts, positions in ticks:
+        if poll_interval > 0:
+            if next_poll is None:
+                next_poll = ts
+            if ts > next_poll:
+                if pending:
+                    await poll(next_poll)
+                # jump over empty polls instead of ticking through them one by one
+                next_poll += poll_interval * max(1, -(-(ts - next_poll) // poll_interval))
+        for pos in positions:
+            key = pos.key
+            pnl = pos.unrealized_pnl
+            side = 1 if pnl >= threshold else -1 if pnl <= -threshold else 0
+            if side and zone.get(key) != side:
+                zone[key] = side
+                zone_since[key] = ts
+            pending[key] = pos
+        result.samples += len(positions)
+        if poll_interval <= 0:
+            await poll(ts)
+    if pending:
+        await poll(next_poll if next_poll is not None else now)
+    result.elapsed = time.perf_counter() - started
+
+    result.suppressed = watcher.suppressed
+    if latencies:
+        result.latency_mean = statistics.fmean(latencies)
+        result.latency_p50 = _percentile(latencies, 0.50)
+        result.latency_p95 = _percentile(latencies, 0.95)
+        result.latency_max = max(latencies)
+    return result
+
+
+def replay(
+    ticks: Sequence[Tick], threshold: float, cooldown: float, poll_interval: float = 0.0
+) -> ReplayResult:
+    """
+    Run one parameter set over `ticks` with a virtual clock. With poll_interval > 0 the
+    watcher polls every poll_interval seconds and only sees the latest sample of each
+    key at that moment, like the live bot; 0 polls at every sample timestamp.
+    """
+    return asyncio.run(_replay(ticks, threshold, cooldown, poll_interval))
+
+
+# per-process copy of the ticks, loaded once by the pool initializer
+_worker_ticks: List[Tick] = []
+
+
+def _init_worker(path: str) -> None:
+    global _worker_ticks
+    _worker_ticks = build_ticks(read_samples(path))
+
+
+def _replay_in_worker(params: Tuple[float, float, float]) -> ReplayResult:
+    return replay(_worker_ticks, *params)
+
+
+def sweep(
+    path: str,
+    thresholds: Sequence[float],
+    cooldowns: Sequence[float],
+    poll_intervals: Sequence[float] = (0.0,),
+    *,
+    workers: Optional[int] = None,
+) -> List[ReplayResult]:
+    """
+    Replay every threshold x cooldown x poll interval combination. Each worker process
+    parses the history once and then runs its share of the grid; workers=1 stays
+    in-process.
+    """
+    grid = [(t, c, p) for t in thresholds for c in cooldowns for p in poll_intervals]
+    workers = min(workers or os.cpu_count() or 1, len(grid))
+    if workers <= 1:
+        ticks = build_ticks(read_samples(path))
+        return [replay(ticks, *params) for params in grid]
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(path,)
+    ) as pool:
+        return list(pool.map(_replay_in_worker, grid))
+
+
+def _floats(text: str) -> List[float]:
+    return [float(x) for x in text.split(",") if x.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="posbot-replay", description="Replay PnL histories to tune threshold/cooldown."
+    )
+    parser.add_argument("history", help="CSV/JSONL file or PnL log directory")
+    parser.add_argument("--threshold", default="0.5", help="comma-separated USDT thresholds")
+    parser.add_argument("--cooldown", default="600", help="comma-separated cooldowns (s)")
+    parser.add_argument(
+        "--poll-interval", default="0", help="comma-separated poll intervals (s); 0 = every sample"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: CPUs)")
+    parser.add_argument("--json", action="store_true", help="one JSON object per result")
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    results = sweep(
+        args.history,
+        _floats(args.threshold),
+        _floats(args.cooldown),
+        _floats(args.poll_interval),
+        workers=args.workers,
+    )
+    wall = time.perf_counter() - started
+
+    for r in results:
+        print(json.dumps(asdict(r)) if args.json else r.summary())
+    if results and not args.json:
+        samples = results[0].samples * len(results)
+        print(
+            f"{len(results)} runs, {samples} samples in {wall:.2f}s "
+            f"({samples / max(wall, 1e-9) * 60 / 1e6:.1f}M samples/min)",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
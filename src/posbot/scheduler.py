@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import math
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+from posbot.detection import LOSS, PROFIT, armed_side
+
+# adaptive polling reaches max_interval once every position is this many bands away
+_FAR_BANDS = 5.0
+
+
+class FixedRateScheduler:
+    """
+    Fixed-rate slots on a monotonic clock: slot k fires at anchor + k * interval, so
+    fetch/notify time does not stretch the period. Slots that were already missed
+    when a tick finishes are skipped (and counted) rather than run back-to-back.
+    """
+
+    def __init__(self, interval: float, *, clock: Callable[[], float] = time.monotonic) -> None:
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self.interval = float(interval)
+        self.clock = clock
+        self.missed = 0
+        self._next = clock()
+
+    def set_interval(self, interval: float) -> None:
+        """Change the period; the next slot is re-anchored on the slot that just fired."""
+        if interval <= 0:
+            raise ValueError("interval must be > 0")
+        self.interval = float(interval)
+
+    def next_delay(self) -> float:
+        """Advance to the next slot and return how long to sleep until it."""
+        self._next += self.interval
+        now = self.clock()
+        if now > self._next:
+            skipped = math.ceil((now - self._next) / self.interval)
+            self.missed += skipped
+            self._next += skipped * self.interval
+        return max(0.0, self._next - now)
+
+    def remaining(self) -> float:
+        """Time left until the current slot, without advancing (after an off-schedule tick)."""
+        return max(0.0, self._next - self.clock())
+
+    def reset(self) -> None:
+        """Anchor the schedule on the current time, i.e. the slot about to fire."""
+        self._next = self.clock()
+
+
+@dataclass(frozen=True)
+class AdaptivePolicy:
+    """
+    Poll interval from how close positions are to firing.
+
+    Detection fires when the PnL leaves the dead zone opposite its armed side, so a
+    position's distance is to that edge: threshold - pnl when armed on the loss side,
+    pnl + threshold when armed on the profit side, and for an unarmed one (inside the
+    zone, never out of it) the way to either edge plus the 2 * threshold across.
+    Within `band` of the closest we poll at min_interval; beyond _FAR_BANDS * band
+    (or with no positions) at max_interval; linearly in between. Polling faster
+    never loses an alert: the armed side is kept however small the steps are.
+    """
+
+    min_interval: float
+    max_interval: float
+    band: float
+
+    def interval_for(
+        self,
+        pnls: Sequence[float],
+        threshold: float,
+        armed: Optional[Sequence[int]] = None,
+    ) -> float:
+        """`armed` parallels `pnls`; without it each position is armed from its PnL."""
+        t = float(threshold)
+        if armed is None:
+            armed = [armed_side(p, t) for p in pnls]
+        distance = min(
+            (
+                t - p if a == LOSS else p + t if a == PROFIT else 3 * t - abs(p)
+                for p, a in zip(pnls, armed, strict=True)
+            ),
+            default=None,
+        )
+        if distance is None or self.band <= 0:
+            return self.max_interval
+        if distance <= self.band:
+            return self.min_interval
+        far = self.band * _FAR_BANDS
+        if distance >= far:
+            return self.max_interval
+        frac = (distance - self.band) / (far - self.band)
+        return self.min_interval + frac * (self.max_interval - self.min_interval)
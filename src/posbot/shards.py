@@ -0,0 +1,424 @@
+"""
+Sharded deployment: N worker processes each run a Watcher over their share of the
+accounts, with their own state shard, and send crossings to the front-end process
+that owns Telegram.
+
+IPC is one multiprocessing Pipe per worker carrying pickled tuples:
+
+    front -> worker   ("settings", {...})   watch/threshold/cooldown changed
+                      ("positions", req_id) /positions
+                      ("stop",)
+    worker -> front   ("events", [CrossingEvent, ...])   one tick's crossings
+                      ("heartbeat", {last_poll_ts, last_error, positions, status})
+                      ("positions", req_id, [Position, ...] | None, error)
+
+The supervisor restarts a worker that exits or stops sending heartbeats, with
+exponential backoff per shard.
+"""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from posbot.models import CrossingEvent, Position
+from posbot.provider import PositionsFetcher, fetch_async
+from posbot.state_store import BotState
+from posbot.watcher import Watcher
+
+log = logging.getLogger("posbot.shards")
+
+T = TypeVar("T")
+
+# the front-end settings a worker mirrors into its own BotState
+SHARED_SETTINGS = ("watch_enabled", "pnl_threshold", "cooldown_seconds")
+
+EventsSink = Callable[[List[CrossingEvent]], Awaitable[None]]
+
+
+def shard_of(name: str, shards: int) -> int:
+    """Stable shard for an account name (the same across restarts and hosts)."""
+    return zlib.crc32(name.upper().encode()) % max(1, shards)
+
+
+def assign_shards(
+    names: Sequence[T], shards: int, key: Callable[[T], str] = str
+) -> List[List[T]]:
+    out: List[List[T]] = [[] for _ in range(max(1, shards))]
+    for item in names:
+        out[shard_of(key(item), shards)].append(item)
+    return out
+
+
+def shard_path(path: str, shard: int) -> str:
+    """state.json -> state.shard0.json, sqlite:///x.db -> sqlite:///x.shard0.db"""
+    if not path:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.shard{shard}{ext}"
+
+
+@dataclass
+class ShardRuntime:
+    """What a worker factory builds inside the worker process."""
+
+    watcher: Watcher
+    get_positions: PositionsFetcher
+    status_lines: Callable[[], List[str]] = field(default=lambda: [])
+    on_start: Optional[Callable[[], Awaitable[None]]] = None
+    on_stop: Optional[Callable[[], Awaitable[None]]] = None
+
+
+# factory(shard, shards, events_sink) -> ShardRuntime; must be a picklable module-level
+# function since workers are spawned
+WorkerFactory = Callable[[int, int, EventsSink], ShardRuntime]
+
+
+def _apply_settings(state: BotState, settings: Dict[str, Any]) -> None:
+    for name in SHARED_SETTINGS:
+        if name in settings:
+            setattr(state, name, settings[name])
+
+
+def _reader(
+    conn: Connection, loop: asyncio.AbstractEventLoop, handle: Callable[[Any], None]
+) -> None:
+    # Connection.recv blocks; a thread per pipe hands messages to the loop
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            msg = None
+        try:
+            loop.call_soon_threadsafe(handle, msg)
+        except RuntimeError:  # loop closed
+            return
+        if msg is None:
+            return
+
+
+async def _serve_worker(
+    shard: int,
+    shards: int,
+    factory: WorkerFactory,
+    conn: Connection,
+    settings: Dict[str, Any],
+    heartbeat_interval: float,
+) -> None:
+    loop = asyncio.get_running_loop()
+    inbox: "asyncio.Queue[Any]" = asyncio.Queue()
+    threading.Thread(
+        target=_reader, args=(conn, loop, inbox.put_nowait), name="shard-ipc", daemon=True
+    ).start()
+
+    async def publish(events: List[CrossingEvent]) -> None:
+        conn.send(("events", list(events)))
+
+    runtime = factory(shard, shards, publish)
+    watcher = runtime.watcher
+    _apply_settings(watcher.state, settings)
+    if runtime.on_start is not None:
+        await runtime.on_start()
+    watcher.start()
+
+    def heartbeat() -> None:
+        state = watcher.state
+        conn.send(
+            (
+                "heartbeat",
+                {
+                    "last_poll_ts": state.last_poll_ts,
+                    "last_error": state.last_error,
+                    "positions": len(state.positions),
+                    "status": runtime.status_lines() + watcher.status_lines(),
+                },
+            )
+        )
+
+    async def answer_positions(req_id: int) -> None:
+        try:
+            positions = await fetch_async(runtime.get_positions)
+            conn.send(("positions", req_id, positions, ""))
+        except Exception as e:
+            conn.send(("positions", req_id, None, f"{type(e).__name__}: {e}"))
+
+    async def heartbeats() -> None:
+        while True:
+            heartbeat()
+            await asyncio.sleep(heartbeat_interval)
+
+    beats = asyncio.create_task(heartbeats(), name="shard-heartbeat")
+    try:
+        while True:
+            msg = await inbox.get()
+            if msg is None or msg[0] == "stop":
+                break
+            if msg[0] == "settings":
+                _apply_settings(watcher.state, msg[1])
+                watcher.state_store.save(watcher.state)
+            elif msg[0] == "positions":
+                asyncio.create_task(answer_positions(msg[1]))
+    finally:
+        beats.cancel()
+        await watcher.stop()
+        if runtime.on_stop is not None:
+            await runtime.on_stop()
+
+
+def worker_main(
+    shard: int,
+    shards: int,
+    factory: WorkerFactory,
+    conn: Connection,
+    settings: Dict[str, Any],
+    heartbeat_interval: float,
+) -> None:
+    """Process entry point of a shard worker."""
+    try:
+        asyncio.run(_serve_worker(shard, shards, factory, conn, settings, heartbeat_interval))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        conn.close()
+
+
+@dataclass
+class _Worker:
+    shard: int
+    process: Any = None
+    conn: Optional[Connection] = None
+    started_at: float = 0.0
+    last_heartbeat: float = 0.0
+    restarts: int = 0
+    backoff_until: float = 0.0
+    info: Dict[str, Any] = field(default_factory=dict)
+
+
+class ShardSupervisor:
+    """
+    Front-end side: starts one worker per shard, forwards their crossings to
+    `on_events`, mirrors the front-end BotState settings to them, answers
+    /positions by asking every worker, and restarts dead or silent workers.
+    """
+
+    def __init__(
+        self,
+        factory: WorkerFactory,
+        shards: int,
+        *,
+        on_events: EventsSink,
+        state: BotState,
+        heartbeat_interval: float = 5.0,
+        heartbeat_timeout: float = 30.0,
+        restart_min: float = 1.0,
+        restart_max: float = 60.0,
+        positions_timeout: float = 10.0,
+        start_method: str = "spawn",
+    ) -> None:
+        self.factory = factory
+        self.shards = max(1, shards)
+        self.on_events = on_events
+        self.state = state
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.restart_min = restart_min
+        self.restart_max = restart_max
+        self.positions_timeout = positions_timeout
+        # typed Any: the stubs only give the concrete contexts a Process attribute
+        self._ctx: Any = multiprocessing.get_context(start_method)
+        self._workers = [_Worker(shard=i) for i in range(self.shards)]
+        self._requests: Dict[int, "asyncio.Future[List[Position]]"] = {}
+        self._req_ids = itertools.count(1)
+        self._sent_settings: Dict[str, Any] = {}
+        self._task: Optional["asyncio.Task[None]"] = None
+        self.events = 0
+
+    def _settings(self) -> Dict[str, Any]:
+        return {name: getattr(self.state, name) for name in SHARED_SETTINGS}
+
+    def _spawn(self, w: _Worker) -> None:
+        loop = asyncio.get_running_loop()
+        parent, child = self._ctx.Pipe()
+        w.process = self._ctx.Process(
+            target=worker_main,
+            args=(
+                w.shard,
+                self.shards,
+                self.factory,
+                child,
+                self._settings(),
+                self.heartbeat_interval,
+            ),
+            name=f"posbot-shard-{w.shard}",
+            daemon=True,
+        )
+        w.process.start()
+        child.close()
+        w.conn = parent
+        w.started_at = w.last_heartbeat = time.monotonic()
+        threading.Thread(
+            target=_reader,
+            args=(parent, loop, lambda msg, w=w, conn=parent: self._on_message(w, conn, msg)),
+            name=f"shard-{w.shard}-ipc",
+            daemon=True,
+        ).start()
+        log.info("Shard %d worker started (pid %s)", w.shard, w.process.pid)
+
+    def _on_message(self, w: _Worker, conn: Connection, msg: Any) -> None:
+        if conn is not w.conn or msg is None:
+            return  # from a replaced worker, or the pipe closed (the monitor restarts it)
+        kind = msg[0]
+        if kind == "events":
+            self.events += len(msg[1])
+            asyncio.ensure_future(self._deliver(msg[1]))
+        elif kind == "heartbeat":
+            w.last_heartbeat = time.monotonic()
+            w.info = msg[1]
+            self._mirror_status()
+        elif kind == "positions":
+            fut = self._requests.pop(msg[1], None)
+            if fut is not None and not fut.done():
+                if msg[2] is None:
+                    fut.set_exception(RuntimeError(f"shard {w.shard}: {msg[3]}"))
+                else:
+                    fut.set_result(msg[2])
+
+    async def _deliver(self, events: List[CrossingEvent]) -> None:
+        try:
+            await self.on_events(events)
+        except Exception:
+            log.exception("Delivering %d shard events failed", len(events))
+
+    def _mirror_status(self) -> None:
+        # /status on the front-end reads last poll / last error from its BotState
+        infos = [w.info for w in self._workers if w.info]
+        self.state.last_poll_ts = max((i["last_poll_ts"] for i in infos), default=0.0)
+        errors = [
+            f"shard {w.shard}: {w.info['last_error']}"
+            for w in self._workers
+            if w.info.get("last_error")
+        ]
+        self.state.last_error = "; ".join(errors)[:400]
+
+    def _send(self, w: _Worker, msg: Any) -> bool:
+        if w.conn is None:
+            return False
+        try:
+            w.conn.send(msg)
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def _stop_process(self, w: _Worker) -> None:
+        if w.conn is not None:
+            w.conn.close()
+            w.conn = None
+        if w.process is not None and w.process.is_alive():
+            w.process.kill()
+            w.process.join(1)
+
+    def _check(self, w: _Worker, now: float) -> None:
+        if w.process is None:
+            if now >= w.backoff_until:
+                self._spawn(w)
+            return
+        if not w.process.is_alive():
+            reason = f"exited with code {w.process.exitcode}"
+        elif now - w.last_heartbeat > self.heartbeat_timeout:
+            reason = f"no heartbeat for {now - w.last_heartbeat:.0f}s"
+        else:
+            # a worker that has been healthy for a while earns its backoff back
+            if w.restarts and now - w.started_at > self.restart_max:
+                w.restarts = 0
+            return
+        delay = min(self.restart_max, self.restart_min * 2 ** w.restarts)
+        log.error("Shard %d worker %s; restarting in %.0fs", w.shard, reason, delay)
+        self._stop_process(w)
+        w.process = None
+        w.info = {}
+        w.restarts += 1
+        w.backoff_until = now + delay
+
+    async def _monitor(self) -> None:
+        while True:
+            now = time.monotonic()
+            settings = self._settings()
+            changed = settings != self._sent_settings
+            for w in self._workers:
+                self._check(w, now)
+                if changed:
+                    self._send(w, ("settings", settings))
+            self._sent_settings = settings
+            await asyncio.sleep(min(1.0, self.heartbeat_interval))
+
+    def start(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        for w in self._workers:
+            self._spawn(w)
+        self._sent_settings = self._settings()
+        self._task = asyncio.create_task(self._monitor(), name="shard-supervisor")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.wait([self._task])
+        for w in self._workers:
+            self._send(w, ("stop",))
+        deadline = time.monotonic() + timeout
+        for w in self._workers:
+            if w.process is not None:
+                await asyncio.to_thread(w.process.join, max(0.0, deadline - time.monotonic()))
+            self._stop_process(w)
+            w.process = None
+
+    async def _ask_positions(self, w: _Worker) -> List[Position]:
+        req_id = next(self._req_ids)
+        fut: "asyncio.Future[List[Position]]" = asyncio.get_running_loop().create_future()
+        self._requests[req_id] = fut
+        try:
+            if not self._send(w, ("positions", req_id)):
+                raise RuntimeError(f"shard {w.shard} is not running")
+            return await asyncio.wait_for(fut, self.positions_timeout)
+        finally:
+            self._requests.pop(req_id, None)
+
+    async def get_positions(self) -> List[Position]:
+        """Every shard's positions; a failing shard is skipped unless all fail."""
+        results = await asyncio.gather(
+            *(self._ask_positions(w) for w in self._workers), return_exceptions=True
+        )
+        out: List[Position] = []
+        failures: List[BaseException] = []
+        for w, res in zip(self._workers, results, strict=True):
+            if isinstance(res, BaseException):
+                failures.append(res)
+                log.warning("Shard %d positions failed: %s", w.shard, res)
+            else:
+                out.extend(res)
+        if failures and len(failures) == len(results):
+            raise failures[0]
+        return out
+
+    def status_lines(self) -> List[str]:
+        now = time.monotonic()
+        # the front-end's own BotState tracks no positions; the shards' states do
+        tracked = sum(w.info.get("positions", 0) for w in self._workers)
+        lines = [f"shards: {self.shards}, events: {self.events}, tracked positions: {tracked}"]
+        for w in self._workers:
+            alive = w.process is not None and w.process.is_alive()
+            pid = w.process.pid if w.process is not None else "-"
+            lines.append(
+                f"shard {w.shard}: {'up' if alive else 'down'} pid={pid} "
+                f"restarts={w.restarts} heartbeat={now - w.last_heartbeat:.0f}s ago"
+            )
+            lines.extend(f"  {line}" for line in w.info.get("status", [])[:6])
+        return lines
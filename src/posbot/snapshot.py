@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from posbot.models import Position
+from posbot.provider import PositionsFetcher, fetch_async
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    positions: List[Position]
+    fetched_at: float  # wall clock, for display
+
+    def age(self, now: Optional[float] = None) -> float:
+        return max(0.0, (time.time() if now is None else now) - self.fetched_at)
+
+
+class SnapshotCache:
+    """
+    Latest positions, shared by the watcher and Telegram commands.
+
+    refresh() always goes to the provider, but concurrent refreshes collapse into a
+    single request (single-flight). get() returns the cached snapshot while it is
+    younger than max_staleness and refreshes otherwise.
+    """
+
+    def __init__(
+        self,
+        fetch: PositionsFetcher,
+        *,
+        max_staleness: float = 30.0,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.fetch = fetch
+        self.max_staleness = max_staleness
+        self.clock = clock
+        self.latest: Optional[Snapshot] = None
+        self.provider_calls = 0
+        self.shared_calls = 0
+        self._inflight: Optional[asyncio.Task[Snapshot]] = None
+
+    async def _fetch(self) -> Snapshot:
+        self.provider_calls += 1
+        started = self.clock()
+        positions = await fetch_async(self.fetch)
+        snap = Snapshot(positions=positions, fetched_at=started)
+        self.latest = snap
+        return snap
+
+    async def refresh_snapshot(self) -> Snapshot:
+        task = self._inflight
+        if task is None or task.done():
+            task = asyncio.ensure_future(self._fetch())
+            self._inflight = task
+            task.add_done_callback(self._clear_inflight)
+        else:
+            self.shared_calls += 1
+        # shield: one caller giving up (e.g. watcher.stop) must not cancel it for the rest
+        return await asyncio.shield(task)
+
+    def _clear_inflight(self, task: "asyncio.Task[Snapshot]") -> None:
+        if self._inflight is task:
+            self._inflight = None
+        if not task.cancelled():
+            task.exception()  # mark retrieved; waiters already got it
+
+    async def refresh(self) -> List[Position]:
+        return (await self.refresh_snapshot()).positions
+
+    async def get(self, max_age: Optional[float] = None) -> Snapshot:
+        limit = self.max_staleness if max_age is None else max_age
+        snap = self.latest
+        if snap is not None and snap.age(self.clock()) <= limit:
+            return snap
+        return await self.refresh_snapshot()
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from typing import Any, Iterator, List, Optional, Tuple
+
+from posbot.state_store import (
+    BaseStateStore,
+    BotState,
+    LazyPositions,
+    PositionState,
+    StateStore,
+    loaded_positions,
+)
+from posbot.subscriptions import Subscription, SubscriptionIndex
+
+log = logging.getLogger("posbot.state.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS settings (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS positions (
+    key           TEXT PRIMARY KEY,
+    last_pnl      REAL NOT NULL,
+    last_alert_ts REAL NOT NULL,
+    last_seen_ts  REAL NOT NULL,
+    armed         INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    chat_id   INTEGER NOT NULL,
+    symbol    TEXT NOT NULL,
+    side      TEXT NOT NULL,
+    account   TEXT NOT NULL,
+    direction TEXT NOT NULL
+);
+"""
+
+_SETTINGS = ("watch_enabled", "pnl_threshold", "cooldown_seconds", "last_poll_ts", "last_error")
+
+_UPSERT_SETTING = (
+    "INSERT INTO settings(key, value) VALUES (?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET value = excluded.value"
+)
+_UPSERT_POSITION = (
+    "INSERT INTO positions(key, last_pnl, last_alert_ts, last_seen_ts, armed) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT(key) DO UPDATE SET last_pnl = excluded.last_pnl, "
+    "last_alert_ts = excluded.last_alert_ts, last_seen_ts = excluded.last_seen_ts, "
+    "armed = excluded.armed"
+)
+_POSITION_COLUMNS = "last_pnl, last_alert_ts, last_seen_ts, armed"
+
+
+def _row_to_state(row: Tuple[Any, ...]) -> PositionState:
+    ps = PositionState(last_pnl=row[0], last_alert_ts=row[1], last_seen_ts=row[2], armed=row[3])
+    ps.dirty = False
+    return ps
+
+
+class SqliteStateStore(BaseStateStore):
+    """
+    SQLite (WAL) state backend.
+
+    Settings and positions live in separate tables. A save upserts the settings plus
+    only the positions that changed and deletes evicted ones, in one transaction;
+    flush() also writes the volatile last_seen_ts of every loaded position. Positions
+    are loaded lazily.
+
+    When the database is empty and `migrate_from` points at an existing JSON state
+    file, that file is imported once on open.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        write_delay: float = 0.0,
+        migrate_from: Optional[str] = None,
+    ) -> None:
+        super().__init__(write_delay=write_delay)
+        self.path = path
+        self.last_write_rows = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(positions)")}
+        if "armed" not in columns:  # databases created before the armed side was stored
+            with self._conn:
+                self._conn.execute(
+                    "ALTER TABLE positions ADD COLUMN armed INTEGER NOT NULL DEFAULT 0"
+                )
+
+        if migrate_from and self._is_empty() and os.path.exists(migrate_from):
+            self._migrate(migrate_from)
+
+    def _is_empty(self) -> bool:
+        cur = self._conn.execute(
+            "SELECT (SELECT COUNT(*) FROM settings) + (SELECT COUNT(*) FROM positions)"
+        )
+        return int(cur.fetchone()[0]) == 0
+
+    def _migrate(self, json_path: str) -> None:
+        legacy = StateStore(json_path).load()
+        legacy.positions.load_all()  # every row is written, not just loaded ones
+        legacy.mark_dirty()
+        self._write(legacy, full=True)
+        log.info(
+            "Migrated %d positions from %s into %s", len(legacy.positions), json_path, self.path
+        )
+
+    def _fetch_one(self, key: str) -> Optional[PositionState]:
+        row = self._conn.execute(
+            f"SELECT {_POSITION_COLUMNS} FROM positions WHERE key = ?", (key,)
+        ).fetchone()
+        return _row_to_state(row) if row else None
+
+    def _fetch_all(self) -> Iterator[Tuple[str, PositionState]]:
+        cur = self._conn.execute(f"SELECT key, {_POSITION_COLUMNS} FROM positions")
+        for row in cur:
+            yield row[0], _row_to_state(row[1:])
+
+    def load(self) -> BotState:
+        raw = {k: json.loads(v) for k, v in self._conn.execute("SELECT key, value FROM settings")}
+
+        state = BotState()
+        state.watch_enabled = bool(raw.get("watch_enabled", True))
+        state.pnl_threshold = float(raw.get("pnl_threshold", 0.5))
+        state.cooldown_seconds = int(raw.get("cooldown_seconds", 600))
+        state.last_poll_ts = float(raw.get("last_poll_ts", 0.0))
+        state.last_error = str(raw.get("last_error", ""))
+        state.positions = LazyPositions(self._fetch_one, self._fetch_all)
+        state.subscriptions = SubscriptionIndex(
+            [
+                Subscription(*row)
+                for row in self._conn.execute(
+                    "SELECT chat_id, symbol, side, account, direction FROM subscriptions "
+                    "ORDER BY rowid"
+                )
+            ]
+        )
+        state.mark_clean()
+        return state
+
+    def _write(self, state: BotState, *, full: bool = False) -> None:
+        settings = [(name, json.dumps(getattr(state, name))) for name in _SETTINGS]
+        rows: List[Tuple[str, float, float, float, int]] = [
+            (key, ps.last_pnl, ps.last_alert_ts, ps.last_seen_ts, ps.armed)
+            for key, ps in (
+                loaded_positions(state.positions) if full else state.positions.changed_items()
+            )
+        ]
+        removed = [(key,) for key in state.removed]
+        with self._conn:
+            self._conn.executemany(_UPSERT_SETTING, settings)
+            # deletes first: a key dropped and then seen again is upserted as a fresh row
+            if removed:
+                self._conn.executemany("DELETE FROM positions WHERE key = ?", removed)
+            if rows:
+                self._conn.executemany(_UPSERT_POSITION, rows)
+            # a handful of rows that change only on /subscribe and /unsubscribe
+            if full or state.subscriptions.dirty:
+                self._conn.execute("DELETE FROM subscriptions")
+                self._conn.executemany(
+                    "INSERT INTO subscriptions VALUES (?, ?, ?, ?, ?)",
+                    [
+                        (sub.chat_id, sub.symbol, sub.side, sub.account, sub.direction)
+                        for sub in state.subscriptions
+                    ],
+                )
+        self.writes += 1
+        self.last_write_rows = len(rows)
+        state.mark_clean()
+
+    def close(self) -> None:
+        self._conn.close()
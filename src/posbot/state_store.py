@@ -1,32 +1,315 @@
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
 import tempfile
 import time
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
-from typing import Dict, Optional
+from heapq import nsmallest
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    ItemsView,
+    Iterable,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
+from posbot import metrics
+from posbot.subscriptions import SubscriptionIndex
 
-@dataclass
+log = logging.getLogger("posbot.state")
+
+# Fields whose change makes the state worth writing. last_seen_ts / last_poll_ts move on
+# every tick, so they are persisted along with the next real change (or on flush) only.
+_POSITION_TRACKED = frozenset({"last_pnl", "last_alert_ts", "armed"})
+_BOT_TRACKED = frozenset(
+    {
+        "positions",
+        "subscriptions",
+        "watch_enabled",
+        "pnl_threshold",
+        "cooldown_seconds",
+        "last_error",
+    }
+)
+# compared by identity: == on a LazyPositions would load every row
+_BY_IDENTITY = frozenset({"positions", "subscriptions"})
+
+
+@dataclass(slots=True)
 class PositionState:
     last_pnl: float = 0.0
     last_alert_ts: float = 0.0
     last_seen_ts: float = 0.0
+    # detection.LOSS / UNARMED / PROFIT: the side the PnL last left the dead zone on
+    armed: int = 0
+    dirty: bool = field(default=True, init=False, repr=False, compare=False)
+    # set by the LazyPositions holding this state: a change adds _key to its `changed` set
+    _key: str = field(default="", init=False, repr=False, compare=False)
+    _changed: Optional[Set[str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # a dirty state is already in its map's `changed` set (and __init__ runs before
+        # `dirty` exists, hence the default)
+        if (
+            name in _POSITION_TRACKED
+            and not getattr(self, "dirty", True)
+            and getattr(self, name) != value
+        ):
+            object.__setattr__(self, "dirty", True)
+            if self._changed is not None:
+                self._changed.add(self._key)
+        object.__setattr__(self, name, value)
+
+
+class LazyPositions(MutableMapping[str, PositionState]):
+    """
+    Position map, optionally backed by a store that can fetch rows one key at a time.
+
+    Single-key reads fetch on demand; iteration and len() load everything once.
+    loaded_items() only covers what has been materialised so far. `changed` holds the
+    keys whose tracked fields changed since mark_clean(), so a save never has to scan
+    every loaded position to find them.
+    """
+
+    def __init__(
+        self,
+        fetch_one: Optional[Callable[[str], Optional[PositionState]]] = None,
+        fetch_all: Optional[Callable[[], Iterable[Tuple[str, PositionState]]]] = None,
+    ) -> None:
+        self._fetch_one = fetch_one
+        self._fetch_all = fetch_all
+        self._items: Dict[str, PositionState] = {}
+        self._absent: Set[str] = set()
+        self._complete = fetch_one is None and fetch_all is None
+        self.changed: Set[str] = set()
+
+    def _adopt(self, key: str, ps: PositionState) -> PositionState:
+        ps._key = key
+        ps._changed = self.changed
+        if ps.dirty:
+            self.changed.add(key)
+        return ps
+
+    def load_all(self) -> None:
+        if self._complete:
+            return
+        if self._fetch_all is not None:
+            for key, ps in self._fetch_all():
+                if key not in self._items:
+                    self._items[key] = self._adopt(key, ps)
+        self._absent.clear()
+        self._complete = True
+
+    def __getitem__(self, key: str) -> PositionState:
+        ps = self._items.get(key)
+        if ps is not None:
+            return ps
+        if self._complete or key in self._absent or self._fetch_one is None:
+            raise KeyError(key)
+        ps = self._fetch_one(key)
+        if ps is None:
+            self._absent.add(key)
+            raise KeyError(key)
+        self._items[key] = self._adopt(key, ps)
+        return ps
+
+    def __setitem__(self, key: str, value: PositionState) -> None:
+        old = self._items.get(key)
+        if old is not None and old is not value:
+            old._changed = None
+        self._items[key] = self._adopt(key, value)
+        self._absent.discard(key)
+
+    def __delitem__(self, key: str) -> None:
+        ps = self[key]  # make sure it is loaded (raises KeyError when unknown)
+        ps._changed = None
+        del self._items[key]
+        self.changed.discard(key)
+        self._absent.add(key)
+
+    def __iter__(self) -> Iterator[str]:
+        self.load_all()
+        return iter(self._items)
+
+    def __len__(self) -> int:
+        self.load_all()
+        return len(self._items)
+
+    def loaded_items(self) -> ItemsView[str, PositionState]:
+        return self._items.items()
+
+    def changed_items(self) -> List[Tuple[str, PositionState]]:
+        return [(key, self._items[key]) for key in self.changed]
+
+    def mark_clean(self) -> None:
+        for key in self.changed:
+            self._items[key].dirty = False
+        self.changed.clear()
+
+
+def loaded_positions(positions: LazyPositions) -> ItemsView[str, PositionState]:
+    return positions.loaded_items()
 
 
 @dataclass
 class BotState:
-    positions: Dict[str, PositionState] = field(default_factory=dict)
+    positions: LazyPositions = field(default_factory=LazyPositions)
     watch_enabled: bool = True
     pnl_threshold: float = 0.5
     cooldown_seconds: int = 600
     last_poll_ts: float = 0.0
     last_error: str = ""
+    # per-chat alert routing; changes set subscriptions.dirty
+    subscriptions: SubscriptionIndex = field(
+        default_factory=SubscriptionIndex, repr=False, compare=False
+    )
+    dirty: bool = field(default=True, init=False, repr=False, compare=False)
+    # keys dropped since the last write, for backends that store positions as rows
+    removed: Set[str] = field(default_factory=set, init=False, repr=False, compare=False)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if name in _BOT_TRACKED and (
+            getattr(self, name, None) is not value
+            if name in _BY_IDENTITY
+            else getattr(self, name, None) != value
+        ):
+            object.__setattr__(self, "dirty", True)
+        object.__setattr__(self, name, value)
+
+    def mark_dirty(self) -> None:
+        self.dirty = True
+
+    def is_dirty(self) -> bool:
+        return self.dirty or self.subscriptions.dirty or bool(self.positions.changed)
+
+    def mark_clean(self) -> None:
+        self.dirty = False
+        self.subscriptions.dirty = False
+        self.removed.clear()
+        self.positions.mark_clean()
+
+    def drop_position(self, key: str) -> None:
+        del self.positions[key]
+        self.removed.add(key)
+        self.dirty = True
+
+    def evict(self, now: float, *, ttl: float = 0.0, max_positions: int = 0) -> List[str]:
+        """
+        Drop positions not seen for `ttl` seconds, then the least recently seen ones
+        beyond `max_positions` (0 disables either limit). Positions seen at `now` are
+        open and never dropped by the cap. Returns the dropped keys.
+        """
+        dropped: List[str] = []
+        if ttl > 0:
+            cutoff = now - ttl
+            dropped = [k for k, ps in self.positions.items() if ps.last_seen_ts < cutoff]
+            for key in dropped:
+                self.drop_position(key)
+        excess = len(self.positions) - max_positions if max_positions > 0 else 0
+        if excess > 0:
+            stale = ((k, ps) for k, ps in self.positions.items() if ps.last_seen_ts < now)
+            oldest = nsmallest(excess, stale, key=lambda kv: kv[1].last_seen_ts)
+            for key, _ in oldest:
+                self.drop_position(key)
+                dropped.append(key)
+        return dropped
+
+
+class BaseStateStore(ABC):
+    """
+    Shared save/flush logic for the state backends.
+
+    save() is a no-op when nothing tracked changed. With write_delay > 0 and a running
+    event loop, saves are coalesced: the first one schedules a single write
+    `write_delay` seconds later that picks up everything changed in between. Call
+    flush() on shutdown to write any pending (or volatile-only) changes.
+    """
+
+    def __init__(self, *, write_delay: float = 0.0) -> None:
+        self.write_delay = write_delay
+        self.writes = 0
+        self.last_write_bytes = 0
+        self._pending: Optional[asyncio.TimerHandle] = None
+        self._pending_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    @abstractmethod
+    def load(self) -> BotState: ...
+
+    @abstractmethod
+    def _write(self, state: BotState, *, full: bool = False) -> None: ...
 
+    def close(self) -> None:  # noqa: B027  (optional hook; only sqlite holds a connection)
+        pass
 
-class StateStore:
-    def __init__(self, path: str) -> None:
+    def save(self, state: BotState) -> None:
+        if self._pending is not None and self._pending_loop and self._pending_loop.is_closed():
+            self._pending = None  # the loop died before the deferred write ran
+        if self._pending is not None or not state.is_dirty():
+            return
+        if self.write_delay > 0:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+            if loop is not None:
+                self._pending = loop.call_later(self.write_delay, self._write_pending, state)
+                self._pending_loop = loop
+                return
+        self._timed_write(state)
+
+    def flush(self, state: BotState) -> None:
+        if self._pending is not None:
+            self._pending.cancel()
+            self._pending = None
+        self._timed_write(state, full=True)
+
+    def _timed_write(self, state: BotState, *, full: bool = False) -> None:
+        with metrics.STATE_SAVE_SECONDS.time():
+            self._write(state, full=full)
+        if self.last_write_bytes:
+            metrics.STATE_SAVE_BYTES.observe(self.last_write_bytes)
+
+    def _write_pending(self, state: BotState) -> None:
+        self._pending = None
+        try:
+            self._timed_write(state)
+        except Exception:
+            log.exception("Deferred state write failed")
+
+    def touch_error(self, state: BotState, msg: str) -> None:
+        state.last_error = msg[:400]
+        state.last_poll_ts = time.time()
+        self.save(state)
+
+
+def _decode_position(val: Any) -> Optional[PositionState]:
+    if not isinstance(val, dict):
+        return None
+    ps = PositionState(
+        last_pnl=float(val.get("last_pnl", 0.0)),
+        last_alert_ts=float(val.get("last_alert_ts", 0.0)),
+        last_seen_ts=float(val.get("last_seen_ts", 0.0)),
+        armed=int(val.get("armed", 0)),
+    )
+    ps.dirty = False
+    return ps
+
+
+class StateStore(BaseStateStore):
+    """JSON state file, rewritten atomically as a whole."""
+
+    def __init__(self, path: str, *, write_delay: float = 0.0) -> None:
+        super().__init__(write_delay=write_delay)
         self.path = path
 
     def load(self) -> BotState:
@@ -44,51 +327,100 @@ class StateStore:
         state.cooldown_seconds = int(raw.get("cooldown_seconds", 600))
         state.last_poll_ts = float(raw.get("last_poll_ts", 0.0))
         state.last_error = str(raw.get("last_error", ""))
+        state.subscriptions = SubscriptionIndex.from_list(raw.get("subscriptions"))
 
         pos_raw = raw.get("positions", {}) if isinstance(raw.get("positions", {}), dict) else {}
-        for key, val in pos_raw.items():
-            if not isinstance(val, dict):
-                continue
-            state.positions[key] = PositionState(
-                last_pnl=float(val.get("last_pnl", 0.0)),
-                last_alert_ts=float(val.get("last_alert_ts", 0.0)),
-                last_seen_ts=float(val.get("last_seen_ts", 0.0)),
-            )
+        # the file is parsed up front, but PositionStates are only built for the keys a poll
+        # touches (or all at once on the first full pass, e.g. the next save)
+        state.positions = LazyPositions(
+            lambda key: _decode_position(pos_raw.get(key)),
+            lambda: (
+                (key, ps)
+                for key, ps in ((k, _decode_position(v)) for k, v in pos_raw.items())
+                if ps is not None
+            ),
+        )
+        state.mark_clean()
         return state
 
-    def save(self, state: BotState) -> None:
+    def _write(self, state: BotState, *, full: bool = False) -> None:
         payload = {
             "watch_enabled": state.watch_enabled,
             "pnl_threshold": state.pnl_threshold,
             "cooldown_seconds": state.cooldown_seconds,
             "last_poll_ts": state.last_poll_ts,
             "last_error": state.last_error,
+            "subscriptions": state.subscriptions.to_list(),
             "positions": {
                 k: {
                     "last_pnl": v.last_pnl,
                     "last_alert_ts": v.last_alert_ts,
                     "last_seen_ts": v.last_seen_ts,
+                    "armed": v.armed,
                 }
                 for k, v in state.positions.items()
             },
         }
         self._atomic_write_json(payload)
-
-    def touch_error(self, state: BotState, msg: str) -> None:
-        state.last_error = msg[:400]
-        state.last_poll_ts = time.time()
-        self.save(state)
+        state.mark_clean()
 
     def _atomic_write_json(self, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
         os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
         fd, tmp_path = tempfile.mkstemp(prefix="state_", suffix=".json", dir=os.path.dirname(self.path) or ".")
         try:
-            with os.fdopen(fd, "w", encoding="utf-8") as f:
-                json.dump(payload, f, ensure_ascii=False, indent=2)
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
             os.replace(tmp_path, self.path)
+            self.writes += 1
+            self.last_write_bytes = len(data)
         finally:
             if os.path.exists(tmp_path):
                 try:
                     os.remove(tmp_path)
                 except OSError:
                     pass
+
+
+class MemoryStateStore(BaseStateStore):
+    """Keeps nothing: for replays and tests that only need the save/flush protocol."""
+
+    def load(self) -> BotState:
+        return BotState()
+
+    def save(self, state: BotState) -> None:
+        pass  # skips the per-tick dirty scan; there is nothing to persist
+
+    def _write(self, state: BotState, *, full: bool = False) -> None:
+        self.writes += 1
+        state.mark_clean()
+
+
+def open_state_store(
+    path: str,
+    *,
+    backend: str = "auto",
+    write_delay: float = 0.0,
+    migrate_from: Optional[str] = None,
+) -> BaseStateStore:
+    """
+    Pick the state backend: "json", "sqlite", or "auto" (sqlite for a sqlite:/// URL or a
+    .db/.sqlite/.sqlite3 path, json otherwise). sqlite:///rel.db is relative,
+    sqlite:////abs/path.db absolute.
+    """
+    backend = backend.lower()
+    if path.startswith("sqlite:///"):
+        path = path[len("sqlite:///"):]
+        if backend == "auto":
+            backend = "sqlite"
+    if backend == "auto":
+        ext = os.path.splitext(path)[1].lower()
+        backend = "sqlite" if ext in {".db", ".sqlite", ".sqlite3"} else "json"
+
+    if backend == "sqlite":
+        from posbot.sqlite_store import SqliteStateStore
+
+        return SqliteStateStore(path, write_delay=write_delay, migrate_from=migrate_from)
+    if backend == "json":
+        return StateStore(path, write_delay=write_delay)
+    raise ValueError(f"unknown state backend: {backend!r}")
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import secrets
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from posbot import ws
+from posbot.models import Position
+from posbot.provider import fetch_async, position_from_item
+
+log = logging.getLogger("posbot.streaming")
+
+Connector = Callable[[str], Awaitable[ws.WebSocket]]
+
+# consecutive missed heartbeats before the connection is considered dead
+_IDLE_PINGS = 3
+
+
+def login_message(
+    api_key: str, api_secret: str, *, nonce: Optional[str] = None, ts: Optional[int] = None
+) -> Dict[str, Any]:
+    """Bitunix private-channel login: sign = sha256(sha256(nonce + ts + key) + secret)."""
+    nonce = nonce or secrets.token_hex(16)
+    ts = int(time.time()) if ts is None else ts
+    digest = hashlib.sha256(f"{nonce}{ts}{api_key}".encode()).hexdigest()
+    sign = hashlib.sha256(f"{digest}{api_secret}".encode()).hexdigest()
+    return {
+        "op": "login",
+        "args": [{"apiKey": api_key, "timestamp": ts, "nonce": nonce, "sign": sign}],
+    }
+
+
+class StreamingProvider:
+    """
+    Positions kept current by the exchange's private position channel.
+
+    get_positions() returns the in-memory map, so a watcher tick costs no request.
+    Every push calls the registered listeners (Watcher.wake), which is what brings
+    detection latency down from the poll interval to the push delay.
+
+    The REST provider is the source of truth: it seeds the map after every
+    (re)subscribe, runs every `reconcile_interval` to repair missed pushes, and is
+    used directly while the stream is down.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        *,
+        rest: Any,
+        api_key: str = "",
+        api_secret: str = "",
+        channel: str = "position",
+        reconcile_interval: float = 60.0,
+        ping_interval: float = 20.0,
+        reconnect_min: float = 1.0,
+        reconnect_max: float = 60.0,
+        connect: Connector = ws.connect,
+    ) -> None:
+        self.url = url
+        self.rest = rest
+        self.api_key = api_key
+        self.api_secret = api_secret
+        self.channel = channel
+        self.reconcile_interval = reconcile_interval
+        self.ping_interval = ping_interval
+        self.reconnect_min = reconnect_min
+        self.reconnect_max = reconnect_max
+        self.connect = connect
+
+        self.connected = False
+        self.messages = 0
+        self.updates = 0
+        self.reconnects = 0
+        self.reconciles = 0
+        self.drift_repairs = 0
+        self._last_message = 0.0
+
+        self._listeners: List[Callable[[], None]] = []
+        self._positions: Dict[str, Position] = {}
+        self._synced = False
+        # keys pushed while a REST reconcile is in flight; their pushed state wins
+        self._touched: Optional[Set[str]] = None
+        self._reconcile_lock = asyncio.Lock()
+        self._tasks: List[asyncio.Task[None]] = []
+
+    @property
+    def stats(self) -> Any:
+        return getattr(self.rest, "stats", None)
+
+    def add_listener(self, fn: Callable[[], None]) -> None:
+        self._listeners.append(fn)
+
+    def _notify(self) -> None:
+        for fn in self._listeners:
+            try:
+                fn()
+            except Exception:
+                log.exception("Stream listener failed")
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._tasks = [
+            asyncio.create_task(self._run(), name="stream"),
+            asyncio.create_task(self._reconcile_loop(), name="stream-reconcile"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def get_positions(self) -> List[Position]:
+        if not self._synced or not self.connected:
+            await self.reconcile()
+        return list(self._positions.values())
+
+    async def reconcile(self) -> None:
+        if self._reconcile_lock.locked():
+            # someone is already fetching; their result is as fresh as ours would be
+            async with self._reconcile_lock:
+                return
+        async with self._reconcile_lock:
+            self._touched = set()
+            try:
+                rest = await fetch_async(self.rest.get_positions)
+            finally:
+                touched, self._touched = self._touched, None
+            fresh = {p.key: p for p in rest}
+            for key in touched:
+                pushed = self._positions.get(key)
+                if pushed is None:
+                    fresh.pop(key, None)
+                else:
+                    fresh[key] = pushed
+            drifted = self._synced and self.connected and fresh != self._positions
+            self._positions = fresh
+            self._synced = True
+            self.reconciles += 1
+        if drifted:
+            self.drift_repairs += 1
+            log.info("Stream reconcile repaired missed updates")
+            self._notify()
+
+    async def _reconcile_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.reconcile_interval)
+            if not self.connected:
+                continue  # get_positions() already goes to REST
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                log.warning("Stream reconcile failed: %s", e)
+
+    async def _resync(self) -> None:
+        try:
+            await self.reconcile()
+        except Exception as e:
+            log.warning("Stream resync failed: %s", e)
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.reconnect_max, self.reconnect_min * 2.0**attempt)
+        return delay * (0.5 + random.random() / 2)
+
+    async def _run(self) -> None:
+        attempt = 0
+        while True:
+            try:
+                conn = await self.connect(self.url)
+            except Exception as e:  # the stream must outlive any one failure; REST covers
+                delay = self._backoff(attempt)
+                attempt += 1
+                log.warning("Stream connect failed (%r); retry in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+                continue
+
+            helpers: List[asyncio.Task[None]] = []
+            try:
+                await self._subscribe(conn)
+                self.connected = True
+                attempt = 0
+                log.info("Stream subscribed: %s", self.channel)
+                # pushes sent while we were away are lost: resync from REST, while already
+                # reading so that pushes racing the REST call are not applied out of order
+                helpers = [
+                    asyncio.create_task(self._heartbeat(conn), name="stream-ping"),
+                    asyncio.create_task(self._resync(), name="stream-resync"),
+                ]
+                while True:
+                    self._handle(await conn.recv())
+            except (OSError, ws.WebSocketError, ValueError) as e:
+                log.warning("Stream disconnected: %s", e)
+            except Exception:
+                log.exception("Stream reader failed; reconnecting")
+            finally:
+                self.connected = False
+                for task in helpers:
+                    task.cancel()
+                try:
+                    await conn.close()
+                except Exception as e:
+                    log.debug("Stream close failed: %s", e)
+
+            self.reconnects += 1
+            delay = self._backoff(attempt)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def _subscribe(self, conn: ws.WebSocket) -> None:
+        if self.api_key:
+            await conn.send_text(json.dumps(login_message(self.api_key, self.api_secret)))
+        await conn.send_text(json.dumps({"op": "subscribe", "args": [{"ch": self.channel}]}))
+        self._last_message = time.monotonic()
+
+    async def _heartbeat(self, conn: ws.WebSocket) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            if time.monotonic() - self._last_message > self.ping_interval * _IDLE_PINGS:
+                log.warning("Stream idle for %d heartbeats; reconnecting", _IDLE_PINGS)
+                await conn.close()  # makes recv() raise in the reader
+                return
+            try:
+                await conn.send_text(json.dumps({"op": "ping", "ping": int(time.time())}))
+            except (OSError, ws.WebSocketError):
+                return
+
+    def _handle(self, text: str) -> None:
+        self.messages += 1
+        self._last_message = time.monotonic()
+        msg = json.loads(text)
+        if not isinstance(msg, dict):
+            return
+        if msg.get("op") == "login" and isinstance(msg.get("data"), dict):
+            if msg["data"].get("result") is False:
+                raise ws.WebSocketError(f"stream login rejected: {msg['data']}")
+            return
+        if msg.get("ch") != self.channel:
+            return
+
+        data = msg.get("data")
+        items = data if isinstance(data, list) else [data]
+        changed = False
+        for item in items:
+            if not isinstance(item, dict) or not item.get("symbol"):
+                continue
+            pos = position_from_item(item)
+            if str(item.get("event", "")).upper() == "CLOSE":
+                self._positions.pop(pos.key, None)
+            else:
+                self._positions[pos.key] = pos
+            if self._touched is not None:
+                self._touched.add(pos.key)
+            changed = True
+        if changed:
+            self.updates += 1
+            self._notify()
+
+    def status_lines(self) -> List[str]:
+        inner = getattr(self.rest, "status_lines", None)
+        lines = inner() if inner else []
+        age = time.monotonic() - self._last_message if self._last_message else None
+        lines.append(
+            f"stream: {'connected' if self.connected else 'disconnected'} "
+            f"messages={self.messages} updates={self.updates} reconnects={self.reconnects} "
+            f"reconciles={self.reconciles} repaired={self.drift_repairs}"
+            + (f" last_msg={age:.0f}s ago" if age is not None else "")
+        )
+        return lines
+
+    def shutdown(self) -> None:
+        if hasattr(self.rest, "shutdown"):
+            self.rest.shutdown()
@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass
+from typing import Any, Collection, Dict, Iterator, List, Mapping, Optional, Sequence
+
+from posbot.detection import LOSS_TO_PROFIT, PROFIT_TO_LOSS
+from posbot.models import CrossingEvent
+
+MAX_PER_CHAT = 50
+
+_DIRECTIONS = {
+    "up": LOSS_TO_PROFIT,
+    "profit": LOSS_TO_PROFIT,
+    "down": PROFIT_TO_LOSS,
+    "loss": PROFIT_TO_LOSS,
+}
+_SIDES = {"long": "LONG", "short": "SHORT"}
+# exchanges spell symbols like BTCUSDT, BTC-USDT or 1000PEPE_USDT
+_SYMBOL = re.compile(r"[A-Za-z0-9_-]+")
+
+
+@dataclass(frozen=True, slots=True)
+class Subscription:
+    """Alerts a chat wants; an empty field matches anything. Values are upper case."""
+
+    chat_id: int
+    symbol: str = ""
+    side: str = ""
+    account: str = ""
+    direction: str = ""
+
+    @classmethod
+    def parse(cls, chat_id: int, args: Sequence[str]) -> Subscription:
+        """
+        /subscribe arguments, in any order: a symbol ("*" = any), long|short,
+        up|down (loss→profit | profit→loss), acc=NAME. No arguments = every alert.
+        """
+        fields: Dict[str, str] = {}
+
+        def put(name: str, value: str) -> None:
+            if name in fields:
+                raise ValueError(f"{name} given twice")
+            fields[name] = value
+
+        for arg in args:
+            low = arg.lower()
+            if low in _SIDES:
+                put("side", _SIDES[low])
+            elif low in _DIRECTIONS:
+                put("direction", _DIRECTIONS[low])
+            elif low.startswith(("acc=", "account=")):
+                put("account", arg.split("=", 1)[1].strip().upper())
+            elif arg == "*":
+                put("symbol", "")
+            elif _SYMBOL.fullmatch(arg):
+                put("symbol", arg.upper())
+            else:
+                raise ValueError(f"not a symbol, side, direction or acc=NAME: {arg!r}")
+        return cls(chat_id, **fields)
+
+    @classmethod
+    def from_dict(cls, raw: Mapping[str, Any]) -> Subscription:
+        return cls(
+            chat_id=int(raw["chat_id"]),
+            symbol=str(raw.get("symbol", "")).upper(),
+            side=str(raw.get("side", "")).upper(),
+            account=str(raw.get("account", "")).upper(),
+            direction=str(raw.get("direction", "")),
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def matches(self, ev: CrossingEvent) -> bool:
+        return (
+            (not self.symbol or self.symbol == ev.symbol.upper())
+            and (not self.side or self.side == ev.side.upper())
+            and (not self.account or self.account == ev.account.upper())
+            and (not self.direction or self.direction == ev.direction)
+        )
+
+    def describe(self) -> str:
+        parts = [self.symbol or "any symbol"]
+        if self.side:
+            parts.append(self.side)
+        if self.account:
+            parts.append(f"account {self.account}")
+        if self.direction:
+            parts.append("loss→profit" if self.direction == LOSS_TO_PROFIT else "profit→loss")
+        return ", ".join(parts)
+
+
+class SubscriptionIndex:
+    """
+    Subscriptions of all chats, indexed by symbol.
+
+    chats_for() only looks at the rules for the event's symbol plus the any-symbol
+    rules, so routing an alert costs O(rules for that symbol), not O(all rules).
+    `dirty` is set by every change and cleared by BotState.mark_clean().
+    """
+
+    def __init__(self, subs: Sequence[Subscription] = ()) -> None:
+        self._by_symbol: Dict[str, List[Subscription]] = {}
+        self._by_chat: Dict[int, List[Subscription]] = {}
+        self.dirty = False
+        for sub in subs:
+            self.add(sub)
+
+    def add(self, sub: Subscription) -> bool:
+        """False when the chat already has this rule."""
+        mine = self._by_chat.setdefault(sub.chat_id, [])
+        if sub in mine:
+            return False
+        if len(mine) >= MAX_PER_CHAT:
+            raise ValueError(f"at most {MAX_PER_CHAT} subscriptions per chat")
+        mine.append(sub)
+        self._by_symbol.setdefault(sub.symbol, []).append(sub)
+        self.dirty = True
+        return True
+
+    def remove(self, sub: Subscription) -> bool:
+        mine = self._by_chat.get(sub.chat_id, [])
+        if sub not in mine:
+            return False
+        mine.remove(sub)
+        if not mine:
+            del self._by_chat[sub.chat_id]
+        bucket = self._by_symbol[sub.symbol]
+        bucket.remove(sub)
+        if not bucket:
+            del self._by_symbol[sub.symbol]
+        self.dirty = True
+        return True
+
+    def clear_chat(self, chat_id: int) -> int:
+        subs = list(self._by_chat.get(chat_id, []))
+        for sub in subs:
+            self.remove(sub)
+        return len(subs)
+
+    def for_chat(self, chat_id: int) -> List[Subscription]:
+        return list(self._by_chat.get(chat_id, []))
+
+    def chats_for(self, ev: CrossingEvent) -> List[int]:
+        """Chats with at least one rule matching `ev`, each once, in subscription order."""
+        out: Dict[int, None] = {}
+        for bucket in (self._by_symbol.get(ev.symbol.upper()), self._by_symbol.get("")):
+            for sub in bucket or ():
+                if sub.chat_id not in out and sub.matches(ev):
+                    out[sub.chat_id] = None
+        return list(out)
+
+    @property
+    def chats(self) -> int:
+        return len(self._by_chat)
+
+    def __iter__(self) -> Iterator[Subscription]:
+        for subs in self._by_chat.values():
+            yield from subs
+
+    def __len__(self) -> int:
+        return sum(len(subs) for subs in self._by_chat.values())
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return [sub.to_dict() for sub in self]
+
+    @classmethod
+    def from_list(cls, raw: Any) -> SubscriptionIndex:
+        index = cls()
+        for item in raw or []:
+            try:
+                index.add(Subscription.from_dict(item))
+            except (KeyError, TypeError, ValueError):
+                continue  # a hand-edited or truncated entry; skip it rather than fail to start
+        index.dirty = False
+        return index
+
+
+def alert_chats(
+    index: SubscriptionIndex,
+    ev: CrossingEvent,
+    *,
+    admin_chat_id: Optional[int],
+    allowed: Collection[int],
+) -> List[int]:
+    """
+    Where an alert goes: the admin chat (every alert, as before subscriptions existed)
+    plus each subscribed chat that is still on the allowlist, once each.
+    """
+    chats = [admin_chat_id] if admin_chat_id is not None else []
+    chats.extend(c for c in index.chats_for(ev) if c != admin_chat_id and c in allowed)
+    return chats
+
+
+def group_by_chat(
+    index: SubscriptionIndex,
+    events: Sequence[CrossingEvent],
+    *,
+    admin_chat_id: Optional[int],
+    allowed: Collection[int],
+) -> Dict[int, List[CrossingEvent]]:
+    """alert_chats() for a batch: each chat's events, in order, for one digest per chat."""
+    out: Dict[int, List[CrossingEvent]] = {}
+    for ev in events:
+        for chat_id in alert_chats(index, ev, admin_chat_id=admin_chat_id, allowed=allowed):
+            out.setdefault(chat_id, []).append(ev)
+    return out
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import logging
 import time
-from typing import List, Optional
+from typing import Any, Awaitable, Callable, List, Optional
 
 from telegram import Update
 from telegram.constants import ParseMode
@@ -12,11 +12,18 @@ from telegram.ext import (
     ContextTypes,
 )
 
+from posbot import metrics
+from posbot.formatting import format_positions
 from posbot.models import Position
-from posbot.state_store import BotState, StateStore
+from posbot.provider import PositionsFetcher, fetch_async
+from posbot.snapshot import SnapshotCache
+from posbot.state_store import BaseStateStore, BotState
+from posbot.subscriptions import Subscription
 
 log = logging.getLogger("posbot.telegram")
 
+Handler = Callable[[Update, ContextTypes.DEFAULT_TYPE], Awaitable[Any]]
+
 
 def _is_allowed(chat_id: int, allowed: List[int]) -> bool:
     return chat_id in allowed
@@ -38,11 +45,13 @@ class TelegramBot:
         self,
         *,
         application: Application,
-        state_store: StateStore,
+        state_store: BaseStateStore,
         state: BotState,
         allowed_chat_ids: List[int],
         admin_chat_id: Optional[int],
-        fetch_positions,
+        fetch_positions: PositionsFetcher,
+        status_extra: Optional[Callable[[], List[str]]] = None,
+        snapshots: Optional[SnapshotCache] = None,
     ) -> None:
         self.app = application
         self.state_store = state_store
@@ -50,17 +59,31 @@ class TelegramBot:
         self.allowed_chat_ids = allowed_chat_ids
         self.admin_chat_id = admin_chat_id
         self.fetch_positions = fetch_positions
+        self.status_extra = status_extra
+        self.snapshots = snapshots
 
         self._register_handlers()
 
     def _register_handlers(self) -> None:
-        self.app.add_handler(CommandHandler("start", self.cmd_start))
-        self.app.add_handler(CommandHandler("help", self.cmd_help))
-        self.app.add_handler(CommandHandler("positions", self.cmd_positions))
-        self.app.add_handler(CommandHandler("watch", self.cmd_watch))
-        self.app.add_handler(CommandHandler("threshold", self.cmd_threshold))
-        self.app.add_handler(CommandHandler("cooldown", self.cmd_cooldown))
-        self.app.add_handler(CommandHandler("status", self.cmd_status))
+        self._add_command("start", self.cmd_start)
+        self._add_command("help", self.cmd_help)
+        self._add_command("positions", self.cmd_positions)
+        self._add_command("watch", self.cmd_watch)
+        self._add_command("threshold", self.cmd_threshold)
+        self._add_command("cooldown", self.cmd_cooldown)
+        self._add_command("status", self.cmd_status)
+        self._add_command("subscribe", self.cmd_subscribe)
+        self._add_command("unsubscribe", self.cmd_unsubscribe)
+        self._add_command("subscriptions", self.cmd_subscriptions)
+
+    def _add_command(self, name: str, fn: Handler) -> None:
+        hist = metrics.HANDLER_SECONDS.labels(name)
+
+        async def timed(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            with hist.time():
+                await fn(update, context)
+
+        self.app.add_handler(CommandHandler(name, timed))
 
     async def _guard(self, update: Update) -> bool:
         chat_id = update.effective_chat.id if update.effective_chat else 0
@@ -77,7 +100,7 @@ class TelegramBot:
         if not await self._guard(update):
             return
         await update.message.reply_text(
-            "posbot is running.\nUse /positions, /watch, /threshold, /cooldown, /status"
+            "posbot is running.\nUse /positions, /watch, /threshold, /cooldown, /status, /subscribe"
         )
 
     async def cmd_help(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -91,6 +114,10 @@ class TelegramBot:
                     "/threshold <usdt> - hysteresis threshold (e.g. 0.5)",
                     "/cooldown <seconds> - per-position alert cooldown",
                     "/status - bot status + last poll + last error",
+                    "/subscribe [SYMBOL|*] [long|short] [up|down] [acc=NAME] - get these alerts"
+                    " in this chat",
+                    "/subscriptions - list this chat's subscriptions",
+                    "/unsubscribe <n>|all - remove subscription n (or all)",
                 ]
             )
         )
@@ -99,8 +126,14 @@ class TelegramBot:
         if not await self._guard(update):
             return
 
+        fetched_at = 0.0
         try:
-            positions: List[Position] = self.fetch_positions()
+            if self.snapshots is not None:
+                snap = await self.snapshots.get()
+                positions: List[Position] = snap.positions
+                fetched_at = snap.fetched_at
+            else:
+                positions = await fetch_async(self.fetch_positions)
         except Exception as e:
             await update.message.reply_text(f"Failed to fetch positions: {type(e).__name__}: {e}")
             return
@@ -109,16 +142,8 @@ class TelegramBot:
             await update.message.reply_text("No open positions (or provider returned empty).")
             return
 
-        lines = ["<b>Open positions</b>"]
-        for p in positions[:30]:
-            pnl = p.unrealized_pnl
-            lines.append(
-                f"• <code>{p.symbol}</code> {p.side} | PNL: <b>{pnl:.4f}</b> USDT"
-            )
-        if len(positions) > 30:
-            lines.append(f"... +{len(positions)-30} more")
-
-        await update.message.reply_text("\n".join(lines), parse_mode=ParseMode.HTML)
+        text = format_positions(positions, as_of=_fmt_age(fetched_at) if fetched_at else "")
+        await update.message.reply_text(text, parse_mode=ParseMode.HTML)
 
     async def cmd_watch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         if not await self._guard(update):
@@ -189,14 +214,77 @@ class TelegramBot:
             return
 
         watch = "on" if self.state.watch_enabled else "off"
-        msg = "\n".join(
-            [
-                f"watch: {watch}",
-                f"threshold: {self.state.pnl_threshold}",
-                f"cooldown: {self.state.cooldown_seconds}s",
-                f"last poll: {_fmt_age(self.state.last_poll_ts)}",
-                f"last error: {self.state.last_error or '-'}",
-                f"tracked positions: {len(self.state.positions)}",
-            ]
-        )
-        await update.message.reply_text(msg)
+        lines = [
+            f"watch: {watch}",
+            f"threshold: {self.state.pnl_threshold}",
+            f"cooldown: {self.state.cooldown_seconds}s",
+            f"last poll: {_fmt_age(self.state.last_poll_ts)}",
+            f"last error: {self.state.last_error or '-'}",
+            f"tracked positions: {len(self.state.positions)}",
+            f"subscriptions: {len(self.state.subscriptions)} in "
+            f"{self.state.subscriptions.chats} chats",
+        ]
+        if self.status_extra is not None:
+            lines.extend(self.status_extra())
+        await update.message.reply_text("\n".join(lines))
+
+    async def cmd_subscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._guard(update):
+            return
+
+        try:
+            sub = Subscription.parse(update.effective_chat.id, context.args or [])
+            added = self.state.subscriptions.add(sub)
+        except ValueError as e:
+            await update.message.reply_text(
+                f"{e}\nExample: /subscribe BTCUSDT long down acc=sub1"
+            )
+            return
+
+        if not added:
+            await update.message.reply_text(f"Already subscribed: {sub.describe()}")
+            return
+        self.state_store.save(self.state)
+        await update.message.reply_text(f"Subscribed: {sub.describe()}")
+
+    async def cmd_subscriptions(
+        self, update: Update, context: ContextTypes.DEFAULT_TYPE
+    ) -> None:
+        if not await self._guard(update):
+            return
+
+        subs = self.state.subscriptions.for_chat(update.effective_chat.id)
+        if not subs:
+            await update.message.reply_text("No subscriptions. Use: /subscribe BTCUSDT")
+            return
+        lines = [f"{i}. {sub.describe()}" for i, sub in enumerate(subs, 1)]
+        await update.message.reply_text("\n".join(lines))
+
+    async def cmd_unsubscribe(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        if not await self._guard(update):
+            return
+
+        chat_id = update.effective_chat.id
+        if not context.args:
+            await update.message.reply_text("Use: /unsubscribe <n> (see /subscriptions) or all")
+            return
+
+        if context.args[0].lower() == "all":
+            n = self.state.subscriptions.clear_chat(chat_id)
+            if n:
+                self.state_store.save(self.state)
+            await update.message.reply_text(f"Removed {n} subscriptions")
+            return
+
+        subs = self.state.subscriptions.for_chat(chat_id)
+        try:
+            n = int(context.args[0])
+        except ValueError:
+            n = 0
+        if not 1 <= n <= len(subs):
+            await update.message.reply_text("No such subscription (see /subscriptions)")
+            return
+        sub = subs[n - 1]
+        self.state.subscriptions.remove(sub)
+        self.state_store.save(self.state)
+        await update.message.reply_text(f"Unsubscribed: {sub.describe()}")
@@ -3,50 +3,74 @@ from __future__ import annotations
 import asyncio
 import logging
 import time
-from typing import Callable, List, Optional
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
 
+from posbot import metrics
+from posbot.detection import armed_side, detect_crossing, detect_crossings_batch
 from posbot.models import CrossingEvent, Position
-from posbot.state_store import BotState, PositionState, StateStore
+from posbot.pnl_log import PnlLog
+from posbot.provider import CircuitOpenError, PositionsFetcher, fetch_async
+from posbot.scheduler import AdaptivePolicy, FixedRateScheduler
+from posbot.state_store import BaseStateStore, BotState, PositionState
 
 log = logging.getLogger("posbot.watcher")
 
-
-def detect_crossing(
-    prev_pnl: float,
-    now_pnl: float,
-    threshold: float,
-) -> Optional[str]:
-    """
-    Hysteresis crossing:
-      - LOSS_TO_PROFIT when prev <= -T and now >= +T
-      - PROFIT_TO_LOSS when prev >= +T and now <= -T
-    """
-    t = float(threshold)
-    if prev_pnl <= -t and now_pnl >= +t:
-        return "LOSS_TO_PROFIT"
-    if prev_pnl >= +t and now_pnl <= -t:
-        return "PROFIT_TO_LOSS"
-    return None
+__all__ = ["Watcher", "detect_crossing"]
 
 
 class Watcher:
     def __init__(
         self,
         *,
-        state_store: StateStore,
+        state_store: BaseStateStore,
         state: BotState,
-        fetch_positions: Callable[[], List[Position]],
-        notify: Callable[[CrossingEvent], "asyncio.Future[None]"],
+        fetch_positions: PositionsFetcher,
+        notify: Callable[[CrossingEvent], Awaitable[None]],
         poll_interval_seconds: int,
+        pnl_log: Optional[PnlLog] = None,
+        notify_batch: Optional[Callable[[List[CrossingEvent]], Awaitable[None]]] = None,
+        adaptive: Optional[AdaptivePolicy] = None,
+        clock: Optional[Callable[[], float]] = None,
+        position_ttl: float = 0.0,
+        max_positions: int = 0,
+        reopen_after_polls: int = 0,
     ) -> None:
         self.state_store = state_store
         self.state = state
         self.fetch_positions = fetch_positions
         self.notify = notify
         self.poll_interval_seconds = poll_interval_seconds
+        self.pnl_log = pnl_log
+        # when set, all events of a tick are handed over at once instead of via notify
+        self.notify_batch = notify_batch
+        self.adaptive = adaptive
+        # wall clock for timestamps and cooldowns; replay passes a virtual one
+        self.clock = clock
+        self.suppressed = 0
+        # bounded state: positions unseen for position_ttl seconds are dropped, and the
+        # least recently seen ones beyond max_positions (0 disables either)
+        self.position_ttl = position_ttl
+        self.max_positions = max_positions
+        self.evicted = 0
+        self._evicted_at = 0.0
+        self._over_cap = False
+        # a key missing from the last reopen_after_polls successful polls is a closed
+        # position; when it shows up again its first PnL is a new baseline, not a crossing.
+        # In multi-account mode the polls are counted per account, since a failed account's
+        # positions are missing, not closed
+        self._poll_times: Deque[float] = deque(maxlen=max(reopen_after_polls, 1))
+        self._account_polls: Dict[str, Deque[float]] = {}
+        self.reopen_after_polls = reopen_after_polls
+        self.reopened = 0
+        self.scheduler = FixedRateScheduler(poll_interval_seconds)
+        self._last_pnls: List[float] = []
+        self._last_armed: List[int] = []
 
         self._task: Optional[asyncio.Task[None]] = None
         self._stop = asyncio.Event()
+        self._wake = asyncio.Event()
+        self.wakeups = 0
 
     def start(self) -> None:
         if self._task and not self._task.done():
@@ -56,59 +80,209 @@ class Watcher:
 
     async def stop(self) -> None:
         self._stop.set()
-        if self._task:
+        if self._task and not self._task.done():
+            # cancels an in-flight provider call instead of waiting out its timeout
+            self._task.cancel()
             await asyncio.wait([self._task], timeout=5)
 
+    def wake(self) -> None:
+        """Run a tick now (e.g. a streaming provider got a push); bursts collapse into one."""
+        self._wake.set()
+
+    async def _sleep(self, delay: float) -> bool:
+        """Sleep until the next slot, stop() or wake(); True when woken early."""
+        if not self._wake.is_set():
+            waiters = [
+                asyncio.ensure_future(self._stop.wait()),
+                asyncio.ensure_future(self._wake.wait()),
+            ]
+            try:
+                await asyncio.wait(waiters, timeout=delay, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for fut in waiters:
+                    fut.cancel()
+        woke = self._wake.is_set()
+        self._wake.clear()
+        return woke
+
     async def run(self) -> None:
         log.info("Watcher started. poll_interval=%ss", self.poll_interval_seconds)
+        self.scheduler.reset()
+        woke = False
         while not self._stop.is_set():
             try:
-                await self._tick()
+                with metrics.TICK_SECONDS.time():
+                    await self._tick()
+            except CircuitOpenError as e:
+                # expected while backing off; the failure that opened it was already logged
+                log.info("Watcher tick skipped: %s", e)
+                self.state_store.touch_error(self.state, f"{type(e).__name__}: {e}")
             except Exception as e:
                 msg = f"{type(e).__name__}: {e}"
+                metrics.TICK_ERRORS.inc()
                 log.exception("Watcher tick failed: %s", msg)
                 self.state_store.touch_error(self.state, msg)
-            await asyncio.sleep(self.poll_interval_seconds)
+
+            if self.adaptive is not None:
+                interval = self.adaptive.interval_for(
+                    self._last_pnls, self.state.pnl_threshold, self._last_armed
+                )
+                if interval != self.scheduler.interval:
+                    log.info("Poll interval -> %.1fs", interval)
+                    self.scheduler.set_interval(interval)
+            # an early tick must not push the regular schedule back by a whole interval
+            delay = self.scheduler.remaining() if woke else self.scheduler.next_delay()
+            woke = await self._sleep(delay)
+            if woke:
+                self.wakeups += 1
+
+    def status_lines(self) -> List[str]:
+        return [
+            f"poll: every {self.scheduler.interval:.1f}s"
+            f"{' (adaptive)' if self.adaptive else ''}, missed slots: {self.scheduler.missed}",
+            f"positions: tracking {len(self.state.positions)}, evicted {self.evicted}, "
+            f"reopened {self.reopened}",
+        ]
+
+    def _gone_before(self, now: float, polls: Optional[Deque[float]]) -> float:
+        """Keys last seen before this time count as closed and reopened."""
+        cutoff = float("-inf")
+        if self.reopen_after_polls > 0 and polls is not None and len(polls) == polls.maxlen:
+            cutoff = polls[0]
+        if self.position_ttl > 0:
+            # also covers keys that went away while the bot was not running
+            cutoff = max(cutoff, now - self.position_ttl)
+        return cutoff
+
+    def _evict(self, now: float, open_positions: int) -> None:
+        if self.max_positions > 0 and (open_positions > self.max_positions) != self._over_cap:
+            self._over_cap = not self._over_cap
+            if self._over_cap:
+                log.warning(
+                    "%d positions open, more than MAX_TRACKED_POSITIONS=%d; "
+                    "only closed ones are evicted",
+                    open_positions,
+                    self.max_positions,
+                )
+        # open positions are never evicted, so only the stale ones beyond the cap count
+        over_cap = self.max_positions > 0 and len(self.state.positions) > max(
+            self.max_positions, open_positions
+        )
+        # the TTL scan walks every position, so it runs at most once a minute
+        ttl_due = self.position_ttl > 0 and now - self._evicted_at >= min(self.position_ttl, 60)
+        if not (over_cap or ttl_due):
+            return
+        self._evicted_at = now
+        dropped = self.state.evict(now, ttl=self.position_ttl, max_positions=self.max_positions)
+        if dropped:
+            self.evicted += len(dropped)
+            log.info(
+                "Evicted %d stale positions (tracking %d)", len(dropped), len(self.state.positions)
+            )
 
     async def _tick(self) -> None:
         if not self.state.watch_enabled:
             return
 
-        now = time.time()
-        positions = self.fetch_positions()
+        now = self.clock() if self.clock is not None else time.time()
+        with metrics.FETCH_SECONDS.time():
+            positions = await fetch_async(self.fetch_positions)
         self.state.last_poll_ts = now
         self.state.last_error = ""
-        seen_keys = set()
 
-        for pos in positions:
-            key = pos.key
-            seen_keys.add(key)
-
-            ps = self.state.positions.get(key) or PositionState()
-            prev = float(ps.last_pnl)
-            cur = float(pos.unrealized_pnl)
+        # one entry per key; if the provider repeats a key the last row wins
+        by_key: Dict[str, Position] = {pos.key: pos for pos in positions}
+        keys = list(by_key)
+        metrics.POSITIONS.set(len(keys))
+        states: List[PositionState] = []
+        prev: List[float] = []
+        cur: List[float] = []
+        armed: List[int] = []
+        last_alert: List[float] = []
+        threshold = self.state.pnl_threshold
+        accounts: Dict[str, bool] = getattr(positions, "accounts", None) or {}
+        gone_before = self._gone_before(now, self._poll_times)
+        account_gone_before = {
+            name: self._gone_before(now, self._account_polls.get(name)) for name in accounts
+        }
 
+        for key, pos in by_key.items():
+            pnl = float(pos.unrealized_pnl)
+            ps = self.state.positions.get(key)
+            if ps is None:
+                ps = PositionState(last_pnl=pnl, armed=armed_side(pnl, threshold))
+                self.state.positions[key] = ps
+            elif ps.last_seen_ts < account_gone_before.get(pos.account, gone_before):
+                log.info("Position reopened, taking %s as its new baseline. key=%s", pnl, key)
+                self.reopened += 1
+                ps.last_pnl = pnl
+                ps.armed = armed_side(pnl, threshold)
             ps.last_seen_ts = now
+            states.append(ps)
+            prev.append(float(ps.last_pnl))
+            cur.append(pnl)
+            armed.append(ps.armed)
+            last_alert.append(ps.last_alert_ts)
+            if self.pnl_log is not None:
+                self.pnl_log.record(now, key, cur[-1])
+
+        # state saved before the armed side was stored is armed from its last PnL (prev)
+        result = detect_crossings_batch(
+            prev,
+            cur,
+            threshold,
+            last_alert,
+            now,
+            self.state.cooldown_seconds,
+            armed=armed,
+        )
+
+        if result.suppressed:
+            log.info("Suppressed %d alerts due to cooldown", len(result.suppressed))
+            if log.isEnabledFor(logging.DEBUG):
+                for i in result.suppressed:
+                    log.debug("Suppressed alert due to cooldown. key=%s", keys[i])
+        self.suppressed += len(result.suppressed)
+        metrics.SUPPRESSED.inc(len(result.suppressed))
+
+        events: List[CrossingEvent] = []
+        for i, direction in zip(result.fired, result.directions, strict=True):
+            pos = by_key[keys[i]]
+            ev = CrossingEvent(
+                position_key=keys[i],
+                symbol=pos.symbol,
+                side=pos.side,
+                from_pnl=prev[i],
+                to_pnl=cur[i],
+                direction=direction,
+                account=pos.account,
+            )
+            metrics.CROSSINGS.labels(direction).inc()
+            if self.notify_batch is None:
+                await self.notify(ev)
+            else:
+                events.append(ev)
+            states[i].last_alert_ts = now
+
+        if events and self.notify_batch is not None:
+            await self.notify_batch(events)
+
+        for ps, pnl, side in zip(states, cur, result.armed, strict=True):
+            ps.last_pnl = pnl
+            if ps.armed != side:  # skips the tracked __setattr__ for most positions
+                ps.armed = side
+        self._last_pnls = cur
+        self._last_armed = result.armed
+        self._poll_times.append(now)
+        for name, fetched in accounts.items():
+            if fetched:
+                polls = self._account_polls.get(name)
+                if polls is None:
+                    polls = self._account_polls[name] = deque(maxlen=self._poll_times.maxlen)
+                polls.append(now)
+        self._evict(now, len(keys))
 
-            direction = detect_crossing(prev, cur, threshold=self.state.pnl_threshold)
-            if direction:
-                if (now - ps.last_alert_ts) >= float(self.state.cooldown_seconds):
-                    ev = CrossingEvent(
-                        position_key=key,
-                        symbol=pos.symbol,
-                        side=pos.side,
-                        from_pnl=prev,
-                        to_pnl=cur,
-                        direction=direction,
-                    )
-                    await self.notify(ev)
-                    ps.last_alert_ts = now
-                else:
-                    log.info("Suppressed alert due to cooldown. key=%s", key)
-
-            ps.last_pnl = cur
-            self.state.positions[key] = ps
-
-        # Optional: you can clean up stale positions here if needed (not required for MVP)
+        if self.pnl_log is not None:
+            self.pnl_log.flush()
 
         self.state_store.save(self.state)
\ No newline at end of file
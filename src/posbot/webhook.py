@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import asyncio
+import hmac
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+log = logging.getLogger("posbot.webhook")
+
+# Minimal HTTP/1.1 receiver for Telegram webhook updates on asyncio streams: POST with a
+# Content-Length body, keep-alive, no chunked bodies or TLS (put it behind a proxy that
+# terminates HTTPS, which Telegram requires anyway).
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+MAX_BODY_BYTES = 1024 * 1024
+MAX_HEADER_LINES = 100
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    411: "Length Required",
+    413: "Payload Too Large",
+    503: "Service Unavailable",
+}
+
+UpdateHandler = Callable[[Dict[str, Any]], Awaitable[None]]
+
+
+class _BadRequest(Exception):
+    def __init__(self, msg: str, status: int = 400) -> None:
+        super().__init__(msg)
+        self.status = status
+
+
+class WebhookServer:
+    """
+    Receives Telegram updates pushed to http://host:port/path.
+
+    A request is answered as soon as its secret token is verified and its body parsed;
+    the update is then handled in its own task, so a slow command never holds up the
+    next update. At most `max_pending` updates are in flight; beyond that requests get
+    503 and Telegram delivers them again later.
+    """
+
+    def __init__(
+        self,
+        handle: UpdateHandler,
+        *,
+        secret_token: str,
+        host: str = "127.0.0.1",
+        port: int = 8443,
+        path: str = "/telegram",
+        max_pending: int = 64,
+        idle_timeout: float = 60.0,
+    ) -> None:
+        if not secret_token:
+            raise ValueError("a webhook needs a secret token")
+        self.handle = handle
+        self._secret = secret_token.encode()
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_pending = max_pending
+        self.idle_timeout = idle_timeout
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._pending: Set[asyncio.Task[None]] = set()
+        self._conns: Set[asyncio.StreamWriter] = set()
+
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        # port 0 picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info("Webhook receiver on http://%s:%d%s", self.host, self.port, self.path)
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._conns):  # idle keep-alive connections
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pending:
+            await asyncio.wait(self._pending, timeout=timeout)
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._conns.add(writer)
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(
+                        self._read_request(reader), self.idle_timeout
+                    )
+                except _BadRequest as e:
+                    log.debug("Bad webhook request: %s", e)
+                    self._respond(writer, e.status, close=True)
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                status = self._accept(method, target, headers, body)
+                close = headers.get("connection", "").lower() == "close"
+                self._respond(writer, status, close=close)
+                await writer.drain()
+                if close:
+                    break
+        except (asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._conns.discard(writer)
+            writer.close()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        line = await reader.readline()
+        if not line:
+            return None  # the client closed a kept-alive connection
+        parts = line.decode("latin-1").split()
+        if len(parts) != 3 or not parts[2].startswith("HTTP/1."):
+            raise _BadRequest(f"request line {line[:80]!r}")
+        headers: Dict[str, str] = {}
+        for _ in range(MAX_HEADER_LINES):
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, sep, value = raw.decode("latin-1").partition(":")
+            if not sep:
+                raise _BadRequest(f"header line {raw[:80]!r}")
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise _BadRequest("too many header lines")
+        if "transfer-encoding" in headers:
+            raise _BadRequest("chunked bodies are not supported", 411)
+        try:
+            length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _BadRequest("bad Content-Length") from None
+        if length > MAX_BODY_BYTES:
+            raise _BadRequest(f"body of {length} bytes", 413)
+        body = await reader.readexactly(length) if length else b""
+        return parts[0], parts[1], headers, body
+
+    def _accept(self, method: str, target: str, headers: Dict[str, str], body: bytes) -> int:
+        if target.split("?", 1)[0] != self.path:
+            return 404
+        if method != "POST":
+            return 405
+        given = headers.get(SECRET_HEADER, "").encode()
+        if not hmac.compare_digest(given, self._secret):
+            self.rejected += 1
+            log.warning("Webhook request with a wrong secret token rejected")
+            return 403
+        try:
+            update = json.loads(body)
+        except ValueError:
+            return 400
+        if not isinstance(update, dict):
+            return 400
+        if len(self._pending) >= self.max_pending:
+            return 503
+        self.received += 1
+        task = asyncio.create_task(self._handle(update))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return 200
+
+    async def _handle(self, update: Dict[str, Any]) -> None:
+        try:
+            await self.handle(update)
+        except Exception:
+            self.failed += 1
+            log.exception("Webhook update %s failed", update.get("update_id"))
+
+    def _respond(self, writer: asyncio.StreamWriter, status: int, *, close: bool) -> None:
+        head = [
+            f"HTTP/1.1 {status} {_REASONS[status]}",
+            "Content-Length: 0",
+            f"Connection: {'close' if close else 'keep-alive'}",
+        ]
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+
+    def status_lines(self) -> List[str]:
+        return [
+            f"webhook: updates {self.received}, in flight {len(self._pending)}, "
+            f"rejected {self.rejected}, failed {self.failed}"
+        ]
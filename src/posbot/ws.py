@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import os
+import ssl
+import struct
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+# Minimal RFC 6455 client: text frames, ping/pong, close, fragmented messages.
+# Enough for an exchange push channel; no extensions (permessage-deflate) or subprotocols.
+
+OP_CONT = 0x0
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+MAX_MESSAGE_BYTES = 16 * 1024 * 1024
+_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+
+class WebSocketError(Exception):
+    pass
+
+
+class WebSocketClosed(WebSocketError):
+    def __init__(self, code: Optional[int] = None, reason: str = "") -> None:
+        super().__init__(f"websocket closed (code={code}) {reason}".strip())
+        self.code = code
+        self.reason = reason
+
+
+def accept_key(key: str) -> str:
+    digest = hashlib.sha1((key + _GUID).encode("ascii")).digest()
+    return base64.b64encode(digest).decode("ascii")
+
+
+def _mask(payload: bytes, key: bytes) -> bytes:
+    if not payload:
+        return payload
+    # XOR as one big int instead of a per-byte loop
+    n = len(payload)
+    repeated = (key * (n // 4 + 1))[:n]
+    x = int.from_bytes(payload, "big") ^ int.from_bytes(repeated, "big")
+    return x.to_bytes(n, "big")
+
+
+def encode_frame(opcode: int, payload: bytes, *, mask: bool, fin: bool = True) -> bytes:
+    head = bytearray([(0x80 if fin else 0) | opcode])
+    n = len(payload)
+    mask_bit = 0x80 if mask else 0
+    if n < 126:
+        head.append(mask_bit | n)
+    elif n < 1 << 16:
+        head.append(mask_bit | 126)
+        head += struct.pack("!H", n)
+    else:
+        head.append(mask_bit | 127)
+        head += struct.pack("!Q", n)
+    if mask:
+        key = os.urandom(4)
+        return bytes(head) + key + _mask(payload, key)
+    return bytes(head) + payload
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Tuple[bool, int, bytes]:
+    """Read one frame; returns (fin, opcode, unmasked payload)."""
+    b0, b1 = await reader.readexactly(2)
+    n = b1 & 0x7F
+    if n == 126:
+        (n,) = struct.unpack("!H", await reader.readexactly(2))
+    elif n == 127:
+        (n,) = struct.unpack("!Q", await reader.readexactly(8))
+    if n > MAX_MESSAGE_BYTES:
+        raise WebSocketError(f"frame too large: {n} bytes")
+    key = await reader.readexactly(4) if b1 & 0x80 else None
+    payload = await reader.readexactly(n) if n else b""
+    if key is not None:
+        payload = _mask(payload, key)
+    return bool(b0 & 0x80), b0 & 0x0F, payload
+
+
+class WebSocket:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.closed = False
+
+    async def _send(self, opcode: int, payload: bytes) -> None:
+        if self.closed:
+            raise WebSocketClosed()
+        self.writer.write(encode_frame(opcode, payload, mask=True))
+        await self.writer.drain()
+
+    async def send_text(self, text: str) -> None:
+        await self._send(OP_TEXT, text.encode("utf-8"))
+
+    async def ping(self, data: bytes = b"") -> None:
+        await self._send(OP_PING, data)
+
+    async def recv(self) -> str:
+        """Next text/binary message as str; answers pings, raises WebSocketClosed on close."""
+        parts: list[bytes] = []
+        size = 0
+        while True:
+            try:
+                fin, opcode, payload = await read_frame(self.reader)
+            except (asyncio.IncompleteReadError, ConnectionError) as e:
+                self.closed = True
+                raise WebSocketClosed(reason=str(e)) from e
+
+            if opcode == OP_PING:
+                await self._send(OP_PONG, payload)
+                continue
+            if opcode == OP_PONG:
+                continue
+            if opcode == OP_CLOSE:
+                code = struct.unpack("!H", payload[:2])[0] if len(payload) >= 2 else None
+                if not self.closed:
+                    try:
+                        await self._send(OP_CLOSE, payload[:2])
+                    except (ConnectionError, WebSocketClosed):
+                        pass
+                self.closed = True
+                raise WebSocketClosed(code, payload[2:].decode("utf-8", "replace"))
+
+            if opcode not in (OP_TEXT, OP_BINARY, OP_CONT):
+                raise WebSocketError(f"unexpected opcode {opcode:#x}")
+            size += len(payload)
+            if size > MAX_MESSAGE_BYTES:
+                raise WebSocketError("message too large")
+            parts.append(payload)
+            if fin:
+                return b"".join(parts).decode("utf-8", "replace")
+
+    async def close(self, code: int = 1000) -> None:
+        if not self.closed:
+            try:
+                await self._send(OP_CLOSE, struct.pack("!H", code))
+            except (ConnectionError, WebSocketClosed):
+                pass
+            self.closed = True
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def connect(
+    url: str,
+    *,
+    timeout: float = 10.0,
+    ssl_context: Optional[ssl.SSLContext] = None,
+) -> WebSocket:
+    parts = urlsplit(url)
+    if parts.scheme not in ("ws", "wss"):
+        raise ValueError(f"not a websocket url: {url}")
+    secure = parts.scheme == "wss"
+    host = parts.hostname or ""
+    port = parts.port or (443 if secure else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+
+    reader, writer = await asyncio.wait_for(
+        asyncio.open_connection(
+            host,
+            port,
+            ssl=(ssl_context or ssl.create_default_context()) if secure else None,
+            server_hostname=host if secure else None,
+        ),
+        timeout=timeout,
+    )
+    key = base64.b64encode(os.urandom(16)).decode("ascii")
+    host_header = host if parts.port is None else f"{host}:{port}"
+    writer.write(
+        (
+            f"GET {path} HTTP/1.1\r\n"
+            f"Host: {host_header}\r\n"
+            "Upgrade: websocket\r\n"
+            "Connection: Upgrade\r\n"
+            f"Sec-WebSocket-Key: {key}\r\n"
+            "Sec-WebSocket-Version: 13\r\n\r\n"
+        ).encode("ascii")
+    )
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=timeout)
+    except BaseException:
+        writer.close()
+        raise
+
+    lines = head.decode("latin-1").split("\r\n")
+    status = lines[0].split(" ", 2)
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    if len(status) < 2 or status[1] != "101":
+        writer.close()
+        raise WebSocketError(f"handshake failed: {lines[0]}")
+    if headers.get("sec-websocket-accept") != accept_key(key):
+        writer.close()
+        raise WebSocketError("handshake failed: bad Sec-WebSocket-Accept")
+    return WebSocket(reader, writer)
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pytest
+
+from posbot.accounts import MultiAccountProvider, parse_accounts
+from posbot.models import Position
+
+
+class DelayedProvider:
+    def __init__(self, positions: list[Position], delay: float = 0.05, fail: bool = False):
+        self.positions = positions
+        self.delay = delay
+        self.fail = fail
+
+    async def get_positions(self) -> list[Position]:
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("boom")
+        return self.positions
+
+
+def _btc(pnl: float = 1.0) -> list[Position]:
+    return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=pnl)]
+
+
+def test_parse_accounts_reads_env_secrets(monkeypatch):
+    monkeypatch.setenv("SUB1_SECRET", "s3cret")
+    accounts = parse_accounts(
+        {"accounts": [{"name": "sub1", "api_key": "k1", "api_secret_env": "SUB1_SECRET"}]}
+    )
+    assert accounts[0].name == "sub1"
+    assert accounts[0].api_secret == "s3cret"
+
+
+def test_parse_accounts_rejects_duplicates():
+    raw = [
+        {"name": "a", "api_key": "k", "api_secret": "s"},
+        {"name": "A", "api_key": "k", "api_secret": "s"},
+    ]
+    with pytest.raises(ValueError):
+        parse_accounts(raw)
+
+
+def test_multi_account_namespaces_keys_and_polls_concurrently():
+    providers = {f"acc{i}": DelayedProvider(_btc(float(i))) for i in range(10)}
+    multi = MultiAccountProvider(providers, concurrency=10)
+
+    started = time.perf_counter()
+    out = asyncio.run(multi.get_positions())
+    elapsed = time.perf_counter() - started
+
+    keys = {p.key for p in out}
+    assert len(keys) == 10
+    assert "ACC3:BTCUSDT:LONG" in keys
+    # ten 50ms round-trips in parallel, not in sequence
+    assert elapsed < 0.3
+
+
+def test_multi_account_skips_failing_account():
+    multi = MultiAccountProvider(
+        {"ok": DelayedProvider(_btc(), delay=0), "bad": DelayedProvider([], delay=0, fail=True)}
+    )
+    out = asyncio.run(multi.get_positions())
+
+    assert [p.account for p in out] == ["ok"]
+    assert "bad" in multi.errors
+    # the watcher must not read the missing positions as closed
+    assert out.accounts == {"ok": True, "bad": False}
+    assert out.fetched("ok") and not out.fetched("bad")
+
+
+def test_multi_account_raises_when_all_fail():
+    multi = MultiAccountProvider({"bad": DelayedProvider([], delay=0, fail=True)})
+    with pytest.raises(RuntimeError):
+        asyncio.run(multi.get_positions())
@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlsplit
+
+import pytest
+
+from posbot.bitunix import POSITIONS_PATH, BitunixClient, BitunixProvider, Signer
+from posbot.provider import ProviderError, RateLimitedError
+
+KEY, SECRET = "test-key", "test-secret"
+
+
+def _expected_sign(headers, query: dict, body: bytes = b"") -> str:
+    qs = "".join(f"{k}{query[k]}" for k in sorted(query))
+    digest = hashlib.sha256(
+        f"{headers['nonce']}{headers['timestamp']}{KEY}{qs}".encode() + body
+    ).hexdigest()
+    return hashlib.sha256(f"{digest}{SECRET}".encode()).hexdigest()
+
+
+class FakeBitunix:
+    """Keep-alive HTTP/1.1 stand-in that checks signatures and gzips its replies."""
+
+    def __init__(self) -> None:
+        self.ports: list[int] = []  # client port per accepted connection
+        self.reply: dict = {"code": 0, "msg": "Success", "data": []}
+        self.status = 200
+        self.extra_headers: dict = {}
+        # close the socket after replying without saying so, like an idle timeout
+        self.drop_after_reply = False
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self) -> None:
+                super().setup()
+                fake.ports.append(self.client_address[1])
+
+            def do_GET(self) -> None:
+                self.close_connection = fake.drop_after_reply
+                url = urlsplit(self.path)
+                query = dict(parse_qsl(url.query))
+                ok = url.path == POSITIONS_PATH and self.headers.get("api-key") == KEY
+                ok = ok and self.headers.get("sign") == _expected_sign(self.headers, query)
+                body = json.dumps(fake.reply if ok else {"code": 10007, "msg": "bad sign"})
+                data = body.encode()
+                gz = "gzip" in self.headers.get("Accept-Encoding", "")
+                if gz:
+                    data = gzip.compress(data)
+                self.send_response(fake.status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                if gz:
+                    self.send_header("Content-Encoding", "gzip")
+                for k, v in fake.extra_headers.items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def exchange():
+    fake = FakeBitunix()
+    yield fake
+    fake.close()
+
+
+def _client(url: str) -> BitunixClient:
+    return BitunixClient(url, KEY, SECRET, connect_timeout=2, read_timeout=2)
+
+
+def test_signature_matches_reference():
+    signer = Signer(KEY, SECRET)
+    headers = signer.headers(Signer.query_part({"symbol": "BTCUSDT", "marginCoin": "USDT"}))
+    assert headers["api-key"] == KEY and len(headers["nonce"]) == 32
+    assert headers["sign"] == _expected_sign(headers, {"symbol": "BTCUSDT", "marginCoin": "USDT"})
+
+
+def test_polls_reuse_one_connection_and_decode_gzip(exchange):
+    exchange.reply = {
+        "code": 0,
+        "data": [
+            {
+                "symbol": "BTCUSDT",
+                "side": "LONG",
+                "qty": "0.5",
+                "avgOpenPrice": "60000",
+                "unrealizedPNL": "-12.5",
+            }
+        ],
+    }
+    provider = BitunixProvider(_client(exchange.url), "USDT")
+    for _ in range(5):
+        (pos,) = provider.get_positions()
+    assert (pos.key, pos.unrealized_pnl, pos.qty, pos.entry_price) == (
+        "BTCUSDT:LONG",
+        -12.5,
+        0.5,
+        60000.0,
+    )
+    assert provider.client.connections_opened == 1 and len(exchange.ports) == 1
+    assert provider.client.requests == 5
+    provider.shutdown()
+
+
+def test_errors_map_to_provider_errors(exchange):
+    client = _client(exchange.url)
+    provider = BitunixProvider(client)
+
+    exchange.reply = {"code": 10001, "msg": "Too many requests"}
+    with pytest.raises(RateLimitedError):
+        provider.get_positions()
+
+    exchange.status, exchange.extra_headers = 429, {"Retry-After": "7"}
+    with pytest.raises(RateLimitedError) as err:
+        provider.get_positions()
+    assert err.value.retry_after == 7.0
+
+    exchange.status, exchange.extra_headers = 500, {}
+    with pytest.raises(ProviderError):
+        provider.get_positions()
+    client.close()
+
+
+def test_stale_pooled_connection_is_replaced(exchange):
+    client = _client(exchange.url)
+    exchange.drop_after_reply = True
+    client.get_pending_positions("USDT")
+    assert len(client._idle) == 1  # pooled, but the server has closed its end
+
+    exchange.drop_after_reply = False
+    assert client.get_pending_positions("USDT")["code"] == 0
+    assert client.retries == 1 and client.connections_opened == 2
+    client.close()
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+from types import SimpleNamespace
+
+from posbot.checks import check_config
+
+
+def _settings(**overrides) -> SimpleNamespace:
+    values = dict(
+        telegram_allowed_chat_ids="123",
+        webhook_url="",
+        webhook_secret="",
+        webhook_path="/telegram",
+        exchange_provider_mode="bitunix",
+        sdk_module="exchange_client",
+        sdk_factory="",
+        sdk_positions_call="",
+        accounts_file="",
+        workers=0,
+        bitunix_api_key="key",
+        bitunix_api_secret="secret",
+        state_backend="auto",
+        state_path="./state.json",
+        log_level="INFO",
+        log_rotate_when="",
+    )
+    values.update(overrides)
+    s = SimpleNamespace(**values)
+    s.allowed_chat_ids = lambda: [int(x) for x in s.telegram_allowed_chat_ids.split(",") if x]
+    return s
+
+
+def test_valid_config_has_no_problems(tmp_path):
+    assert check_config(_settings(state_path=str(tmp_path / "state.db"))) == []
+
+    accounts = tmp_path / "accounts.json"
+    accounts.write_text(json.dumps([{"name": "a", "api_key": "k", "api_secret": "s"}]))
+    s = _settings(accounts_file=str(accounts), workers=2, bitunix_api_key="", log_level="debug")
+    assert check_config(s) == []
+
+    s = _settings(webhook_url="https://bot.example.com/telegram", webhook_secret="abc_DEF-1")
+    assert check_config(s) == []
+
+
+def test_reports_every_problem(tmp_path):
+    problems = check_config(
+        _settings(
+            telegram_allowed_chat_ids="",
+            webhook_url="http://bot.example.com/telegram",
+            webhook_secret="has spaces",
+            exchange_provider_mode="sdk",
+            sdk_module="surely_not_an_installed_module",
+            accounts_file=str(tmp_path / "missing.json"),
+            state_backend="redis",
+            log_level="LOUD",
+            log_rotate_when="fortnight",
+        )
+    )
+    text = "\n".join(problems)
+    for name in (
+        "TELEGRAM_ALLOWED_CHAT_IDS",
+        "WEBHOOK_URL",
+        "WEBHOOK_SECRET",
+        "SDK_FACTORY",
+        "SDK_MODULE",
+        "ACCOUNTS_FILE",
+        "STATE_BACKEND",
+        "LOG_LEVEL",
+        "LOG_ROTATE_WHEN",
+    ):
+        assert name in text
+    assert len(problems) == 9
@@ -1,5 +1,7 @@
+from posbot.detection import LOSS, PROFIT
 from posbot.watcher import detect_crossing
 
+
 def test_loss_to_profit():
     assert detect_crossing(-10, +10, threshold=5) == "LOSS_TO_PROFIT"
 
@@ -8,3 +10,12 @@ def test_profit_to_loss():
 
 def test_no_crossing_inside_zone():
     assert detect_crossing(-3, -6, threshold=5) is None
+
+def test_armed_side_carries_through_the_zone():
+    # prev is inside the dead zone, but the position last left it on the loss side
+    assert detect_crossing(-3, +6, threshold=5, armed=LOSS) == "LOSS_TO_PROFIT"
+    assert detect_crossing(+3, -6, threshold=5, armed=PROFIT) == "PROFIT_TO_LOSS"
+    assert detect_crossing(-3, +6, threshold=5) is None
+
+def test_prev_outside_the_zone_overrides_a_stale_armed_side():
+    assert detect_crossing(-10, +10, threshold=5, armed=PROFIT) == "LOSS_TO_PROFIT"
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import math
+import random
+from itertools import pairwise
+
+import pytest
+
+from posbot.detection import (
+    LOSS,
+    PROFIT,
+    UNARMED,
+    armed_side,
+    detect_crossing,
+    detect_crossings_batch,
+)
+
+
+def _reference(prev, cur, armed, threshold, last_alert, now, cooldown):
+    fired, directions, suppressed, new_armed = [], [], [], []
+    for i, (p, c) in enumerate(zip(prev, cur, strict=True)):
+        a = armed[i] if armed is not None else UNARMED
+        new_armed.append(armed_side(c, threshold, armed_side(p, threshold, a)))
+        direction = detect_crossing(p, c, threshold, a)
+        if direction is None:
+            continue
+        if (now - last_alert[i]) >= float(cooldown):
+            fired.append(i)
+            directions.append(direction)
+        else:
+            suppressed.append(i)
+    return fired, directions, suppressed, new_armed
+
+
+def _value(rng: random.Random, t: float) -> float:
+    # bias towards the boundaries where off-by-one comparisons would show up
+    return rng.choice(
+        [
+            0.0,
+            -0.0,
+            t,
+            -t,
+            math.nextafter(t, math.inf),
+            math.nextafter(-t, -math.inf),
+            rng.uniform(-3 * t - 1, 3 * t + 1),
+            rng.uniform(-1e6, 1e6),
+            math.inf,
+            -math.inf,
+            math.nan,
+        ]
+    )
+
+
+def _cases(seed: int, count: int):
+    rng = random.Random(seed)
+    for _ in range(count):
+        t = rng.choice([0.0, 0.5, 1.0, rng.uniform(0, 100)])
+        n = rng.randint(0, 40)
+        now = rng.uniform(0, 1e9)
+        cooldown = rng.choice([0, 1, 600, rng.uniform(0, 1e4)])
+        prev = [_value(rng, t) for _ in range(n)]
+        cur = [_value(rng, t) for _ in range(n)]
+        # None: two-sample checks, as before positions kept an armed side
+        armed = rng.choice([None, [rng.choice([LOSS, UNARMED, PROFIT]) for _ in range(n)]])
+        last_alert = [rng.choice([0.0, now, now - cooldown, rng.uniform(0, now)]) for _ in range(n)]
+        yield prev, cur, armed, t, last_alert, now, cooldown
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+@pytest.mark.parametrize("seed", range(5))
+def test_batch_matches_detect_crossing(seed, use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    for prev, cur, armed, t, last_alert, now, cooldown in _cases(seed, 400):
+        res = detect_crossings_batch(
+            prev, cur, t, last_alert, now, cooldown, armed=armed, use_numpy=use_numpy
+        )
+        expected = _reference(prev, cur, armed, t, last_alert, now, cooldown)
+        assert (res.fired, res.directions, res.suppressed, res.armed) == expected
+
+
+def test_batch_rejects_mismatched_lengths():
+    with pytest.raises(ValueError):
+        detect_crossings_batch([1.0], [], 1.0, [0.0], 0.0, 0)
+    with pytest.raises(ValueError):
+        detect_crossings_batch([1.0], [1.0], 1.0, [0.0], 0.0, 0, armed=[])
+
+
+def test_fine_grained_walk_through_the_band_fires_once():
+    # each step is smaller than the 2T band, so no two consecutive samples cross it
+    pnls = [-1.0, -0.4, 0.2, 0.6, 1.0, 0.4, -0.2, -0.6]
+    armed, fired = UNARMED, []
+    for prev, pnl in pairwise(pnls):
+        direction = detect_crossing(prev, pnl, threshold=0.5, armed=armed)
+        if direction:
+            fired.append((pnl, direction))
+        armed = armed_side(pnl, 0.5, armed_side(prev, 0.5, armed))
+
+    assert fired == [(0.6, "LOSS_TO_PROFIT"), (-0.6, "PROFIT_TO_LOSS")]
+
+
+@pytest.mark.parametrize("use_numpy", [False, True])
+def test_batch_keeps_armed_side_inside_the_band(use_numpy):
+    if use_numpy:
+        pytest.importorskip("numpy")
+    res = detect_crossings_batch(
+        [0.0] * 3,
+        [0.2] * 3,
+        0.5,
+        [0.0] * 3,
+        100.0,
+        0,
+        armed=[LOSS, PROFIT, UNARMED],
+        use_numpy=use_numpy,
+    )
+    assert res.fired == [] and res.armed == [LOSS, PROFIT, UNARMED]
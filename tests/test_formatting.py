@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from posbot.formatting import (
+    TELEGRAM_MAX_MESSAGE,
+    format_digest,
+    format_event,
+    format_positions,
+    split_message,
+)
+from posbot.models import CrossingEvent, Position
+
+
+def _ev(i: int, direction: str = "PROFIT_TO_LOSS") -> CrossingEvent:
+    return CrossingEvent(
+        position_key=f"S{i}USDT:LONG",
+        symbol=f"S{i}USDT",
+        side="LONG",
+        from_pnl=1.0,
+        to_pnl=-1.0,
+        direction=direction,
+    )
+
+
+def test_single_event_digest_is_the_plain_alert():
+    assert format_digest([_ev(1)]) == [format_event(_ev(1))]
+
+
+def test_digest_lists_every_event_and_respects_limit():
+    events = [_ev(i, "LOSS_TO_PROFIT" if i % 3 == 0 else "PROFIT_TO_LOSS") for i in range(500)]
+    messages = format_digest(events)
+
+    assert len(messages) > 1
+    assert all(len(m) <= TELEGRAM_MAX_MESSAGE for m in messages)
+    body = "\n".join(messages)
+    assert all(f"S{i}USDT LONG" in body for i in range(500))
+    assert messages[0].startswith("📊 500 crossings")
+
+
+def test_split_message_packs_lines_and_truncates_oversized():
+    assert split_message(["a", "b", "c"], limit=3) == ["a\nb", "c"]
+    assert split_message(["x" * 10], limit=5) == ["xxxx…"]
+
+
+def test_format_positions_caps_rows():
+    positions = [
+        Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=i, account="a" if i == 0 else "")
+        for i in range(32)
+    ]
+
+    text = format_positions(positions, as_of="5s ago", limit=30)
+    lines = text.split("\n")
+
+    assert lines[0] == "<b>Open positions</b> (as of 5s ago)"
+    assert lines[1] == "• [a] <code>S0USDT</code> LONG | PNL: <b>0.0000</b> USDT"
+    assert len(lines) == 32 and lines[-1] == "... +2 more"
+
+
+def test_format_positions_escapes_exchange_strings():
+    pos = Position(symbol="<b>X</b>", side="L&S", unrealized_pnl=1.0, account="a<i>")
+
+    line = format_positions([pos]).split("\n")[1]
+
+    assert line == (
+        "• [a&lt;i&gt;] <code>&lt;b&gt;X&lt;/b&gt;</code> L&amp;S | PNL: <b>1.0000</b> USDT"
+    )
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+
+import pytest
+
+from posbot.logger import setup_logging, stop_logging
+
+
+@pytest.fixture(autouse=True)
+def _restore_root_logger():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield
+    stop_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+
+
+def test_json_lines_written_off_thread_to_new_dir(tmp_path):
+    path = tmp_path / "missing" / "app.log"
+    out = io.StringIO()
+    setup_logging("DEBUG", log_file=str(path), json_format=True, stream=out)
+
+    items = {"a": 1}
+    logging.getLogger("posbot.test").info("tick %s", items)
+    items["a"] = 2  # mutated after the call: the record must keep what was logged
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("posbot.test").exception("failed")
+    stop_logging()
+
+    lines = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    assert [(r["level"], r["logger"], r["msg"]) for r in lines] == [
+        ("INFO", "posbot.test", "tick {'a': 1}"),
+        ("ERROR", "posbot.test", "failed"),
+    ]
+    assert "ValueError: boom" in lines[1]["exc"]
+    assert out.getvalue().count("\n") == 2
+
+
+def test_level_and_size_rotation(tmp_path):
+    path = tmp_path / "app.log"
+    setup_logging(
+        "WARNING", log_file=str(path), max_bytes=200, backup_count=2, stream=io.StringIO()
+    )
+    log = logging.getLogger("posbot.test")
+    log.info("dropped")
+    for i in range(20):
+        log.warning("line %02d %s", i, "x" * 40)
+    stop_logging()
+
+    files = sorted(p.name for p in tmp_path.iterdir())
+    assert files == ["app.log", "app.log.1", "app.log.2"]
+    assert "dropped" not in "".join(p.read_text() for p in tmp_path.iterdir())
+    assert "line 19" in path.read_text()
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+import urllib.request
+
+from posbot import metrics
+from posbot.metrics import Counter, Gauge, Histogram, Registry
+from posbot.models import Position
+from posbot.state_store import BotState, StateStore
+from posbot.watcher import Watcher
+
+
+def test_disabled_metrics_record_nothing():
+    reg = Registry()
+    hist = Histogram("h_seconds", "h", registry=reg)
+    counter = Counter("c_total", "c", registry=reg)
+
+    with hist.time():
+        pass
+    hist.observe(1.0)
+    counter.inc()
+
+    assert hist.count == 0 and counter.value == 0
+    assert hist.time() is metrics._NULL_TIMER
+
+
+def test_histogram_counter_gauge_exposition():
+    reg = Registry()
+    reg.enabled = True
+    hist = Histogram("lat_seconds", "latency", buckets=(0.1, 1.0), registry=reg)
+    by_cmd = Histogram("cmd_seconds", "per command", ("command",), buckets=(1.0,), registry=reg)
+    counter = Counter("events_total", "events", ("direction",), registry=reg)
+    gauge = Gauge("depth", "queue depth", registry=reg)
+
+    for v in (0.05, 0.5, 5.0):
+        hist.observe(v)
+    by_cmd.labels("status").observe(0.2)
+    counter.labels("UP").inc()
+    counter.labels("UP").inc(2)
+    gauge.set_function(lambda: 7)
+
+    text = reg.render()
+    assert "# TYPE lat_seconds histogram" in text
+    assert 'lat_seconds_bucket{le="0.1"} 1' in text
+    assert 'lat_seconds_bucket{le="1"} 2' in text
+    assert 'lat_seconds_bucket{le="+Inf"} 3' in text
+    assert "lat_seconds_count 3" in text
+    assert 'cmd_seconds_bucket{command="status",le="1"} 1' in text
+    assert 'events_total{direction="UP"} 3' in text
+    assert "depth 7" in text
+
+
+def test_http_endpoint_serves_registry():
+    reg = Registry()
+    Counter("hits_total", "hits", registry=reg).inc()  # ignored: not enabled yet
+    server = metrics.start_http_server(0, registry=reg)
+    try:
+        url = f"http://127.0.0.1:{server.server_port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as resp:
+            body = resp.read().decode()
+            assert resp.headers["Content-Type"].startswith("text/plain")
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert reg.enabled and "hits_total 0" in body
+
+
+def test_watcher_tick_is_instrumented(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics.REGISTRY, "enabled", True)
+    crossings = metrics.CROSSINGS.labels("PROFIT_TO_LOSS")
+    saves, fired = metrics.STATE_SAVE_SECONDS.count, crossings.value
+    seq = iter([[+10.0], [-10.0]])
+
+    async def fetch() -> list[Position]:
+        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=p) for p in next(seq)]
+
+    async def notify(ev) -> None:
+        pass
+
+    w = Watcher(
+        state_store=StateStore(str(tmp_path / "state.json")),
+        state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+        fetch_positions=fetch,
+        notify=notify,
+        poll_interval_seconds=999,
+    )
+    asyncio.run(w._tick())
+    asyncio.run(w._tick())
+
+    assert metrics.FETCH_SECONDS.count >= 2
+    assert metrics.STATE_SAVE_SECONDS.count >= saves + 2
+    assert metrics.STATE_SAVE_BYTES.count >= 2
+    assert crossings.value == fired + 1
+    assert metrics.POSITIONS.value == 1
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import pickle
+from dataclasses import FrozenInstanceError, replace
+
+import pytest
+
+from posbot.models import Position
+from posbot.state_store import PositionState
+
+
+def test_position_key_is_cached_and_shared():
+    a = Position(symbol="btcusdt", side="long", unrealized_pnl=1.0)
+    b = Position(symbol="btcusdt", side="long", unrealized_pnl=2.0)
+    assert a.key == "BTCUSDT:LONG"
+    assert a.key is b.key
+    assert replace(a, account="sub1").key == "SUB1:BTCUSDT:LONG"
+    assert a == replace(b, unrealized_pnl=1.0) and hash(a) == hash(replace(b, unrealized_pnl=1.0))
+
+    restored = pickle.loads(pickle.dumps(a))
+    assert restored == a and restored.key == a.key
+
+
+def test_models_are_slotted():
+    pos = Position(symbol="X", side="LONG", unrealized_pnl=0.0)
+    assert not hasattr(pos, "__dict__")
+    with pytest.raises(FrozenInstanceError):
+        pos.symbol = "Y"  # type: ignore[misc]
+
+    ps = PositionState()
+    with pytest.raises(AttributeError):
+        ps.extra = 1  # type: ignore[attr-defined]
+    ps.dirty = False
+    ps.last_seen_ts = 5.0
+    assert not ps.dirty
+    ps.last_pnl = 1.0
+    assert ps.dirty
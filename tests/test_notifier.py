@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+from posbot.notifier import AlertDispatcher, DigestBuffer, SlotLimiter
+
+
+class FloodWait(Exception):
+    def __init__(self, retry_after: float):
+        super().__init__(f"retry after {retry_after}")
+        self.retry_after = retry_after
+
+
+class Forbidden(Exception):  # same name as telegram.error.Forbidden
+    pass
+
+
+def test_slot_limiter_spaces_reservations():
+    lim = SlotLimiter(1.0)
+    assert lim.reserve(10.0) == 0.0
+    assert lim.reserve(10.0) == 1.0
+    assert lim.reserve(10.5) == 1.5
+    lim.pause_until(20.0)
+    assert lim.reserve(12.0) == 8.0
+
+
+def test_submit_does_not_wait_for_delivery():
+    sent: list[tuple[int, str, float]] = []
+
+    async def send(chat_id, text):
+        await asyncio.sleep(0.05)
+        sent.append((chat_id, text, time.monotonic()))
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=4, per_chat_interval=0.0, global_rate=1000)
+        d.start()
+        started = time.monotonic()
+        for i in range(8):
+            await d.submit(i, f"msg {i}")
+        submit_time = time.monotonic() - started
+        await d.stop()
+        return d, submit_time
+
+    d, submit_time = asyncio.run(scenario())
+
+    assert submit_time < 0.01
+    assert len(sent) == 8
+    assert d.stats.sent == 8 and d.depth == 0
+
+
+def test_per_chat_rate_limit():
+    sent: list[float] = []
+
+    async def send(chat_id, text):
+        sent.append(time.monotonic())
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=3, per_chat_interval=0.05, global_rate=1000)
+        d.start()
+        for i in range(3):
+            await d.submit(1, f"msg {i}")
+        await d.stop()
+
+    asyncio.run(scenario())
+
+    gaps = [b - a for a, b in zip(sent, sent[1:], strict=False)]
+    assert len(sent) == 3
+    assert all(g >= 0.045 for g in gaps)
+
+
+def test_flood_wait_is_retried_after_retry_after():
+    calls: list[float] = []
+
+    async def send(chat_id, text):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise FloodWait(0.1)
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=1, per_chat_interval=0.0, global_rate=1000)
+        d.start()
+        await d.submit(1, "hello")
+        await d.stop()
+        return d
+
+    d = asyncio.run(scenario())
+
+    assert len(calls) == 2
+    assert calls[1] - calls[0] >= 0.09
+    assert d.stats.sent == 1 and d.stats.flood_waits == 1
+
+
+def test_gives_up_after_max_retries():
+    async def send(chat_id, text):
+        raise FloodWait(0.0)
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=1, max_retries=2, per_chat_interval=0.0, global_rate=1000)
+        d.start()
+        await d.submit(1, "hello")
+        await d.stop()
+        return d
+
+    d = asyncio.run(scenario())
+    assert d.stats.failed == 1 and d.stats.retries == 2
+
+
+def test_permanent_error_is_not_retried():
+    calls: list[int] = []
+
+    async def send(chat_id, text):
+        calls.append(chat_id)
+        raise Forbidden("bot was blocked by the user")
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=1, per_chat_interval=0.0, global_rate=1000)
+        d.start()
+        await d.submit(1, "hello")
+        await d.stop()
+        return d
+
+    d = asyncio.run(scenario())
+    assert calls == [1]
+    assert d.stats.failed == 1 and d.stats.retries == 0
+
+
+def test_flood_wait_holds_back_other_chats():
+    calls: list[tuple[int, float]] = []
+
+    async def send(chat_id, text):
+        calls.append((chat_id, time.monotonic()))
+        if len(calls) == 1:
+            raise FloodWait(0.1)
+
+    async def scenario():
+        d = AlertDispatcher(send, workers=2, per_chat_interval=0.0, global_rate=1000)
+        d.start()
+        await d.submit(1, "hello")
+        await asyncio.sleep(0.01)
+        await d.submit(2, "hello")
+        await d.stop()
+
+    asyncio.run(scenario())
+
+    assert sorted(c for c, _ in calls) == [1, 1, 2]
+    assert all(t - calls[0][1] >= 0.09 for _, t in calls[1:])
+
+
+def test_digest_buffer_batches_within_window():
+    batches: list[list[int]] = []
+
+    async def flush(items):
+        batches.append(items)
+
+    async def scenario():
+        buf = DigestBuffer(flush, window=0.05)
+        await buf.add([1, 2])
+        await buf.add([3])
+        await asyncio.sleep(0.1)
+        await buf.add([4])
+        await buf.flush()
+
+    asyncio.run(scenario())
+    assert batches == [[1, 2, 3], [4]]
+
+
+def test_digest_buffer_without_window_flushes_each_add():
+    batches: list[list[int]] = []
+
+    async def flush(items):
+        batches.append(items)
+
+    async def scenario():
+        buf = DigestBuffer(flush)
+        await buf.add([1, 2])
+        await buf.add([])
+        await buf.add([3])
+
+    asyncio.run(scenario())
+    assert batches == [[1, 2], [3]]
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from posbot.models import Position
+from posbot.pnl_engine import BitunixTickerSource, MarkPriceProvider, local_unrealized_pnl
+
+
+def _pos(symbol: str, side: str, qty: float | None = 2.0, entry: float | None = 100.0):
+    return Position(symbol=symbol, side=side, unrealized_pnl=5.0, qty=qty, entry_price=entry)
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class CountingProvider:
+    def __init__(self, positions: list[Position]):
+        self.positions = positions
+        self.calls = 0
+
+    def get_positions(self) -> list[Position]:
+        self.calls += 1
+        return self.positions
+
+
+class StaticTickers:
+    def __init__(self, prices: dict[str, float]):
+        self.prices = prices
+        self.calls = 0
+        self.fail = False
+
+    def get_mark_prices(self) -> dict[str, float]:
+        self.calls += 1
+        if self.fail:
+            raise OSError("ticker down")
+        return self.prices
+
+
+def test_local_unrealized_pnl_long_and_short():
+    assert local_unrealized_pnl(_pos("X", "LONG"), 103.0) == pytest.approx(6.0)
+    assert local_unrealized_pnl(_pos("X", "SHORT"), 103.0) == pytest.approx(-6.0)
+    assert local_unrealized_pnl(_pos("X", "SELL", qty=-2.0), 97.0) == pytest.approx(6.0)
+    assert local_unrealized_pnl(_pos("X", "LONG", entry=None), 97.0) is None
+
+
+def test_mark_price_provider_polls_positions_only_on_refresh():
+    clock = Clock()
+    inner = CountingProvider([_pos("BTCUSDT", "LONG"), _pos("ETHUSDT", "SHORT", qty=None)])
+    tickers = StaticTickers({"BTCUSDT": 99.0, "ETHUSDT": 1.0})
+    provider = MarkPriceProvider(inner, tickers, refresh_interval=60, clock=clock)
+
+    first = asyncio.run(provider.get_positions())
+    assert [p.unrealized_pnl for p in first] == [5.0, 5.0]  # exchange-reported
+
+    clock.now = 10
+    tickers.prices = {"BTCUSDT": 104.0, "ETHUSDT": 1.0}
+    second = asyncio.run(provider.get_positions())
+    assert second[0].unrealized_pnl == pytest.approx(8.0)
+    assert second[0].mark_price == 104.0
+    assert second[1].unrealized_pnl == 5.0  # no qty: cannot recompute
+    assert (inner.calls, tickers.calls) == (1, 1)
+
+    clock.now = 60
+    asyncio.run(provider.get_positions())
+    assert (inner.calls, tickers.calls) == (2, 1)
+    assert "ticker polls=1" in provider.status_lines()[-1]
+
+
+def test_mark_price_provider_falls_back_to_position_poll():
+    clock = Clock()
+    inner = CountingProvider([_pos("BTCUSDT", "LONG")])
+    tickers = StaticTickers({})
+    provider = MarkPriceProvider(inner, tickers, refresh_interval=60, clock=clock)
+
+    asyncio.run(provider.get_positions())
+    tickers.fail = True
+    clock.now = 1
+    out = asyncio.run(provider.get_positions())
+
+    assert out[0].unrealized_pnl == 5.0
+    assert inner.calls == 2 and provider.ticker_failures == 1
+
+
+def test_ticker_source_parses_and_caches():
+    body = json.dumps(
+        {
+            "code": 0,
+            "data": [
+                {"symbol": "BTCUSDT", "markPrice": "60000.5", "lastPrice": "60001"},
+                {"symbol": "ETHUSDT", "markPrice": "", "lastPrice": "3000"},
+            ],
+        }
+    ).encode()
+    hits = []
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            hits.append(self.path)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:
+            pass
+
+    server = HTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        source = BitunixTickerSource(f"http://127.0.0.1:{server.server_port}/", max_age=60)
+        assert source.get_mark_prices() == {"BTCUSDT": 60000.5, "ETHUSDT": 3000.0}
+        source.get_mark_prices()
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert hits == ["/api/v1/futures/market/tickers"]
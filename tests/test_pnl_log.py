@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+
+from posbot.pnl_log import RECORD, PnlLog, iter_segment, scan, segment_paths
+
+
+def test_records_only_changed_pnl_and_scans_back(tmp_path):
+    log = PnlLog(str(tmp_path))
+    log.record(1.0, "BTCUSDT:LONG", 1.5)
+    log.record(1.0, "ETHUSDT:SHORT", -2.0)
+    log.flush()
+    log.record(2.0, "BTCUSDT:LONG", 1.5)  # unchanged -> skipped
+    log.record(2.0, "ETHUSDT:SHORT", -3.0)
+    log.flush()
+    log.close()
+
+    assert list(scan(str(tmp_path))) == [
+        (1.0, "BTCUSDT:LONG", 1.5),
+        (1.0, "ETHUSDT:SHORT", -2.0),
+        (2.0, "ETHUSDT:SHORT", -3.0),
+    ]
+    assert list(scan(str(tmp_path), start=1.5)) == [(2.0, "ETHUSDT:SHORT", -3.0)]
+
+
+def test_rotates_segments_by_size(tmp_path):
+    log = PnlLog(str(tmp_path), segment_max_bytes=RECORD.size * 2)
+    for i in range(6):
+        log.record(float(i), "BTCUSDT:LONG", float(i))
+        log.flush()
+    log.close()
+
+    assert len(segment_paths(str(tmp_path))) == 3
+    assert [pnl for _, _, pnl in scan(str(tmp_path))] == [0.0, 1.0, 2.0, 3.0, 4.0, 5.0]
+
+
+def test_reopen_keeps_key_ids_and_ignores_torn_tail(tmp_path):
+    log = PnlLog(str(tmp_path))
+    log.record(1.0, "BTCUSDT:LONG", 1.0)
+    log.close()
+
+    seg = segment_paths(str(tmp_path))[0]
+    with open(seg, "ab") as f:
+        f.write(b"\x00" * (RECORD.size // 2))  # simulated crash mid-record
+    assert len(list(iter_segment(seg))) == 1
+
+    log = PnlLog(str(tmp_path))
+    log.record(2.0, "ETHUSDT:SHORT", 5.0)
+    log.record(2.0, "BTCUSDT:LONG", 2.0)
+    log.close()
+
+    assert len(segment_paths(str(tmp_path))) == 2
+    assert list(scan(str(tmp_path)))[1:] == [
+        (2.0, "ETHUSDT:SHORT", 5.0),
+        (2.0, "BTCUSDT:LONG", 2.0),
+    ]
+    with open(os.path.join(str(tmp_path), "keys.txt"), encoding="utf-8") as f:
+        assert f.read().split() == ["BTCUSDT:LONG", "ETHUSDT:SHORT"]
+
+
+def test_unchanged_pnl_is_rewritten_as_a_keyframe(tmp_path):
+    log = PnlLog(str(tmp_path), keyframe_seconds=10)
+    for ts in (0.0, 5.0, 10.0, 15.0, 20.0):
+        log.record(ts, "BTCUSDT:LONG", 1.0)
+    log.close()
+
+    assert [ts for ts, _, _ in scan(str(tmp_path))] == [0.0, 10.0, 20.0]
+
+
+def test_segments_sort_by_time_then_sequence(tmp_path):
+    # same millisecond: the reopened log's segment must come after the first one, and
+    # names from before the fixed-width sequence still sort in write order
+    names = [
+        "pnl-000000000001000.seg",
+        "pnl-000000000001000-2.seg",
+        "pnl-000000000001000-10.seg",
+        "pnl-000000000001000-0011.seg",
+        "pnl-000000000002000-0000.seg",
+    ]
+    for name in reversed(names):
+        (tmp_path / name).write_bytes(b"")
+
+    assert [os.path.basename(p) for p in segment_paths(str(tmp_path))] == names
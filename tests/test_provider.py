@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from posbot.models import Position
+from posbot.provider import (
+    CircuitBreaker,
+    CircuitBreakerProvider,
+    CircuitOpenError,
+    ProviderError,
+    ProviderTimeoutError,
+    RateLimitedError,
+    SdkProvider,
+    ThreadedProvider,
+    retry_after_hint,
+)
+
+
+class SlowProvider:
+    def __init__(self, delay: float):
+        self.delay = delay
+        self.thread_names: list[str] = []
+
+    def get_positions(self) -> list[Position]:
+        self.thread_names.append(threading.current_thread().name)
+        time.sleep(self.delay)
+        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=1.0)]
+
+
+def test_threaded_provider_runs_off_loop_and_records_stats():
+    inner = SlowProvider(delay=0.01)
+    provider = ThreadedProvider(inner, max_workers=1, timeout_seconds=5)
+
+    out = asyncio.run(provider.get_positions())
+    provider.shutdown()
+
+    assert out[0].symbol == "BTCUSDT"
+    assert inner.thread_names[0].startswith("provider")
+    assert provider.stats.calls == 1
+    assert provider.stats.last_call_time >= 0.01
+    assert provider.stats.in_flight == 0
+
+
+def test_threaded_provider_timeout_does_not_block_loop():
+    provider = ThreadedProvider(SlowProvider(delay=0.5), max_workers=1, timeout_seconds=0.05)
+    ticks: list[int] = []
+
+    async def heartbeat():
+        for i in range(3):
+            ticks.append(i)
+            await asyncio.sleep(0.01)
+
+    async def scenario():
+        hb = asyncio.create_task(heartbeat())
+        with pytest.raises(ProviderTimeoutError):
+            await provider.get_positions()
+        await hb
+
+    asyncio.run(scenario())
+    provider.shutdown()
+
+    assert ticks == [0, 1, 2]
+    assert provider.stats.timeouts == 1
+
+
+class FakeClient:
+    def __init__(self, responses: list):
+        self.responses = responses
+        self.calls: list[tuple] = []
+
+    def get_positions(self, margin_coin):
+        self.calls.append((margin_coin,))
+        return self.responses[min(len(self.calls) - 1, len(self.responses) - 1)]
+
+
+def _sdk(client) -> SdkProvider:
+    return SdkProvider(
+        module_name="unused",
+        factory_path="unused",
+        positions_call="get_positions",
+        api_key="k",
+        api_secret="s",
+        base_url="http://localhost",
+        margin_coin="USDT",
+        client=client,
+    )
+
+
+def _bitunix(*pnls: float) -> dict:
+    return {
+        "code": 0,
+        "data": [
+            {"symbol": f"S{i}USDT", "side": "LONG", "unrealizedPNL": str(p)}
+            for i, p in enumerate(pnls)
+        ],
+    }
+
+
+def test_sdk_provider_builds_client_on_first_use():
+    provider = SdkProvider(
+        module_name="surely_not_an_installed_sdk",
+        factory_path="surely_not_an_installed_sdk.Client",
+        positions_call="get_positions",
+        api_key="k",
+        api_secret="s",
+        base_url="http://localhost",
+        margin_coin="USDT",
+    )
+    with pytest.raises(ImportError):
+        provider.get_positions()
+
+
+def test_sdk_provider_caches_call_plan():
+    client = FakeClient([_bitunix(1.5, -2.0), _bitunix(3.0)])
+    provider = _sdk(client)
+
+    first = provider.get_positions()
+    plan = provider._plan
+    second = provider.get_positions()
+
+    assert [p.unrealized_pnl for p in first] == [1.5, -2.0]
+    assert [p.unrealized_pnl for p in second] == [3.0]
+    assert client.calls == [("USDT",), ("USDT",)]
+    assert plan is not None and plan.path == ("data",) and plan.pnl_field == "unrealizedPNL"
+    assert provider._plan is plan
+
+
+def test_sdk_provider_recompiles_when_shape_changes():
+    eth = {"symbol": "ETHUSDT", "side": "SHORT", "unrealizedProfit": 4}
+    client = FakeClient([_bitunix(1.0), {"result": {"positionList": [eth]}}, {"data": None}])
+    provider = _sdk(client)
+
+    provider.get_positions()
+    out = provider.get_positions()
+
+    assert [(p.symbol, p.side, p.unrealized_pnl) for p in out] == [("ETHUSDT", "SHORT", 4.0)]
+    assert provider._plan.path == ("result", "positionList")
+    assert provider._plan.pnl_field == "unrealizedProfit"
+    assert provider.get_positions() == []
+
+
+def test_sdk_provider_zero_pnl_falls_back_like_or_chain():
+    item = {"symbol": "X", "side": "LONG", "unrealizedPnl": 0, "unrealizedProfit": "2.5"}
+    provider = _sdk(FakeClient([{"data": [item]}]))
+
+    assert provider.get_positions()[0].unrealized_pnl == 2.5
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FlakyProvider:
+    def __init__(self) -> None:
+        self.calls = 0
+        self.fail_with: Exception | None = RuntimeError("exchange down")
+
+    def get_positions(self) -> list[Position]:
+        self.calls += 1
+        if self.fail_with is not None:
+            raise self.fail_with
+        return []
+
+
+def test_circuit_opens_after_threshold_and_backs_off_exponentially():
+    clock = FakeClock()
+    breaker = CircuitBreaker(
+        failure_threshold=3, base_backoff=5, max_backoff=12, jitter=0.0, clock=clock
+    )
+    inner = FlakyProvider()
+    provider = CircuitBreakerProvider(inner, breaker)
+
+    async def call() -> None:
+        await provider.get_positions()
+
+    for _ in range(3):
+        with pytest.raises(RuntimeError):
+            asyncio.run(call())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_until == pytest.approx(1005.0)
+
+    # open: fail fast without touching the exchange
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(call())
+    assert inner.calls == 3 and breaker.rejected == 1
+
+    # half-open probe fails -> doubled backoff
+    clock.now = 1005.0
+    with pytest.raises(RuntimeError):
+        asyncio.run(call())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_until == pytest.approx(1015.0)
+
+    # capped at max_backoff
+    clock.now = 1015.0
+    with pytest.raises(RuntimeError):
+        asyncio.run(call())
+    assert breaker.open_until == pytest.approx(1027.0)
+
+    # successful probe closes and resets the backoff
+    clock.now = 1027.0
+    inner.fail_with = None
+    assert asyncio.run(provider.get_positions()) == []
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.consecutive_failures == 0 and breaker.total_failures == 5
+    assert "circuit: closed" in provider.status_lines()[-1]
+
+
+def test_circuit_half_open_lets_one_probe_through():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=1, jitter=0.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 1
+    assert breaker.allow() is True
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow() is False
+
+
+def test_cancelled_half_open_probe_does_not_wedge_the_breaker():
+    class HangingProvider:
+        async def get_positions(self) -> list[Position]:
+            await asyncio.sleep(3600)
+            return []
+
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, base_backoff=1, jitter=0.0, clock=clock)
+    breaker.record_failure()
+    clock.now += 1
+    provider = CircuitBreakerProvider(HangingProvider(), breaker)
+
+    async def scenario() -> None:
+        probe = asyncio.create_task(provider.get_positions())
+        await asyncio.sleep(0.01)
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+
+    asyncio.run(scenario())
+    assert breaker.allow() is True  # the next call may probe again
+
+
+def test_rate_limit_opens_immediately_and_honours_retry_after():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=5, base_backoff=1, jitter=0.0, clock=clock)
+    breaker.record_failure(retry_after_hint(RateLimitedError("slow down", retry_after=30)))
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.open_until == pytest.approx(1030.0)
+    assert breaker.rate_limited == 1
+
+
+def test_jitter_stays_within_bounds():
+    for r in (0.0, 0.5, 1.0):
+        breaker = CircuitBreaker(
+            failure_threshold=1, base_backoff=10, jitter=0.2, clock=lambda: 0.0, rng=lambda r=r: r
+        )
+        breaker.record_failure()
+        assert 8.0 <= breaker.open_until <= 12.0
+
+
+def test_retry_after_hint_reads_http_429():
+    class Resp:
+        status_code = 429
+        headers = {"Retry-After": "7"}
+
+    class HttpError(Exception):
+        response = Resp()
+
+    assert retry_after_hint(HttpError()) == 7.0
+    assert retry_after_hint(RuntimeError("boom")) is None
+    assert retry_after_hint(RateLimitedError("x")) == 0.0
+
+
+def test_sdk_provider_raises_on_exchange_error_code():
+    provider = _sdk(FakeClient([{"code": 10006, "msg": "Request too frequently"}]))
+    with pytest.raises(RateLimitedError):
+        provider.get_positions()
+
+    provider = _sdk(FakeClient([{"code": 20001, "msg": "Signature error"}]))
+    with pytest.raises(ProviderError, match="20001"):
+        provider.get_positions()
+
+
+def test_sdk_provider_fills_qty_and_prices():
+    item = {
+        "symbol": "BTCUSDT",
+        "side": "SHORT",
+        "qty": "0.5",
+        "avgOpenPrice": "100",
+        "markPrice": "98",
+        "unrealizedPNL": "1",
+    }
+    provider = _sdk(FakeClient([{"code": 0, "data": [item]}, {"code": 0, "data": [item]}]))
+
+    first = provider.get_positions()[0]
+    second = provider.get_positions()[0]
+
+    assert (first.qty, first.entry_price, first.mark_price) == (0.5, 100.0, 98.0)
+    assert second == first
+    assert provider._plan.fields == ("qty", "avgOpenPrice", "markPrice")
+
+
+def test_sdk_provider_resolves_fields_missing_from_the_first_item():
+    bare = {"symbol": "BTCUSDT", "side": "LONG", "unrealizedPNL": "1"}
+    full = dict(bare, symbol="ETHUSDT", qty="2", entryPrice="10", markPrice="11")
+    provider = _sdk(FakeClient([{"code": 0, "data": [bare, full]}, {"code": 0, "data": [full]}]))
+
+    first, second = provider.get_positions()
+    (third,) = provider.get_positions()
+
+    assert (first.qty, first.entry_price, first.mark_price) == (None, None, None)
+    assert (second.qty, second.entry_price, second.mark_price) == (2.0, 10.0, 11.0)
+    assert third == second
+    assert provider._plan.fields == ("qty", "entryPrice", "markPrice")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from posbot.pnl_log import PnlLog
+from posbot.replay import build_ticks, main, read_samples, replay, sweep
+
+# BTC drifts from -3 into profit over t=1001..1003 through the dead zone, then swings at
+# t=1010, t=1011 and t=1200; ETH never leaves the dead zone
+HISTORY = [
+    (1000, "BTCUSDT:LONG", -3.0),
+    (1000, "ETHUSDT:SHORT", 0.1),
+    (1001, "BTCUSDT:LONG", -2.0),
+    (1002, "BTCUSDT:LONG", 0.5),
+    (1003, "BTCUSDT:LONG", 2.0),
+    (1003, "ETHUSDT:SHORT", -0.2),
+    (1004, "BTCUSDT:LONG", 2.5),
+    (1010, "BTCUSDT:LONG", -2.0),
+    (1011, "BTCUSDT:LONG", 2.0),
+    (1200, "BTCUSDT:LONG", -2.0),
+]
+
+
+def _write_csv(path) -> None:
+    lines = ["ts,symbol,side,pnl"]
+    for ts, key, pnl in HISTORY:
+        symbol, side = key.split(":")
+        lines.append(f"{ts},{symbol},{side},{pnl}")
+    path.write_text("\n".join(lines) + "\n")
+
+
+def test_readers_agree(tmp_path):
+    csv_path = tmp_path / "h.csv"
+    _write_csv(csv_path)
+    jsonl_path = tmp_path / "h.jsonl"
+    jsonl_path.write_text(
+        "\n".join(json.dumps({"ts": t, "key": k, "pnl": p}) for t, k, p in HISTORY) + "\n"
+    )
+    log = PnlLog(str(tmp_path / "log"))
+    for t, k, p in HISTORY:
+        log.record(float(t), k, p)
+    log.close()
+
+    expected = [(float(t), k, p) for t, k, p in HISTORY]
+    assert list(read_samples(str(csv_path))) == expected
+    assert list(read_samples(str(jsonl_path))) == expected
+    assert list(read_samples(str(tmp_path / "log"))) == expected
+
+    with pytest.raises(ValueError):
+        read_samples(str(tmp_path / "h.txt"))
+
+
+def test_build_ticks_groups_by_timestamp():
+    ticks = build_ticks(reversed(HISTORY))
+    assert [ts for ts, _ in ticks] == [1000, 1001, 1002, 1003, 1004, 1010, 1011, 1200]
+    assert sorted(p.key for p in ticks[0][1]) == ["BTCUSDT:LONG", "ETHUSDT:SHORT"]
+
+
+def test_replay_every_sample_counts_alerts_and_cooldown():
+    ticks = build_ticks(HISTORY)
+
+    # the drift fires at t=1003 even though no two consecutive samples span the band
+    free = replay(ticks, threshold=1.0, cooldown=0)
+    assert free.alerts == 4 and free.suppressed == 0
+    assert free.by_direction == {"LOSS_TO_PROFIT": 2, "PROFIT_TO_LOSS": 2}
+    assert free.latency_max == 0.0
+    assert (free.samples, free.ticks) == (len(HISTORY), 8)
+
+    # virtual clock: the 100s cooldown suppresses t=1010 and t=1011 but not t=1200
+    cooled = replay(ticks, threshold=1.0, cooldown=100)
+    assert (cooled.alerts, cooled.suppressed) == (2, 2)
+
+    assert replay(ticks, threshold=5.0, cooldown=0).alerts == 0
+
+
+def test_replay_with_poll_interval_measures_detection_latency():
+    ticks = build_ticks(HISTORY)
+
+    # polls at 1000, 1005, 1010, 1015, 1200: the slow drift is caught at 1005 (entered +1
+    # at 1003) and the t=1011 swing at 1015
+    res = replay(ticks, threshold=1.0, cooldown=0, poll_interval=5)
+
+    assert res.alerts == 4 and res.ticks == 5
+    assert res.latency_max == pytest.approx(4.0)
+    assert res.latency_mean == pytest.approx(6.0 / 4)
+
+
+def test_sweep_in_processes_matches_in_process(tmp_path):
+    path = tmp_path / "h.csv"
+    _write_csv(path)
+
+    local = sweep(str(path), [1.0, 5.0], [0, 100], workers=1)
+    pooled = sweep(str(path), [1.0, 5.0], [0, 100], workers=2)
+
+    key = [(r.threshold, r.cooldown, r.alerts, r.suppressed) for r in local]
+    assert key == [(r.threshold, r.cooldown, r.alerts, r.suppressed) for r in pooled]
+    assert key == [(1.0, 0, 4, 0), (1.0, 100, 2, 2), (5.0, 0, 0, 0), (5.0, 100, 0, 0)]
+
+
+def test_cli_prints_one_json_line_per_parameter_set(tmp_path, capsys):
+    path = tmp_path / "h.csv"
+    _write_csv(path)
+
+    argv = [str(path), "--threshold", "1,5", "--cooldown", "0", "--poll-interval", "0,5"]
+    assert main(argv + ["--workers", "1", "--json"]) == 0
+
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [(r["threshold"], r["poll_interval"], r["alerts"]) for r in rows] == [
+        (1.0, 0.0, 4),
+        (1.0, 5.0, 4),
+        (5.0, 0.0, 0),
+        (5.0, 5.0, 0),
+    ]
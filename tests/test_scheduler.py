@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import pytest
+
+from posbot.scheduler import AdaptivePolicy, FixedRateScheduler
+
+
+class Clock:
+    def __init__(self, now: float = 100.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_fixed_rate_does_not_drift_with_tick_duration():
+    clock = Clock()
+    sched = FixedRateScheduler(10, clock=clock)
+    sched.reset()
+
+    fire_times = []
+    for _ in range(5):
+        fire_times.append(clock.now)
+        clock.now += 3.0  # the tick itself takes 3s
+        clock.now += sched.next_delay()
+
+    assert fire_times == [100.0, 110.0, 120.0, 130.0, 140.0]
+    assert sched.missed == 0
+
+
+def test_missed_slots_are_skipped_not_replayed():
+    clock = Clock()
+    sched = FixedRateScheduler(10, clock=clock)
+    sched.reset()
+
+    clock.now += 35.0  # a slow tick overruns three slots
+    delay = sched.next_delay()
+
+    assert delay == pytest.approx(5.0)
+    assert sched.missed == 3
+
+
+def test_early_tick_keeps_the_regular_slot():
+    clock = Clock()
+    sched = FixedRateScheduler(10, clock=clock)
+    sched.reset()
+
+    clock.now += sched.next_delay() - 6.0  # woken by a push 4s into the period
+    assert sched.remaining() == pytest.approx(6.0)
+    clock.now += sched.remaining()
+    assert clock.now == pytest.approx(110.0)
+
+
+def test_interval_change_reanchors_on_last_slot():
+    clock = Clock()
+    sched = FixedRateScheduler(10, clock=clock)
+    sched.reset()
+    clock.now += 1.0
+    sched.set_interval(2)
+    assert sched.next_delay() == pytest.approx(1.0)
+
+
+def test_adaptive_policy():
+    policy = AdaptivePolicy(min_interval=2, max_interval=60, band=1.0)
+
+    assert policy.interval_for([], threshold=0.5) == 60
+    # armed on the loss side: 0.7 from firing at +0.5
+    assert policy.interval_for([-0.2, -300.0], threshold=0.5, armed=[-1, -1]) == 2
+    assert policy.interval_for([1.4], threshold=0.5) == pytest.approx(2 + 0.9 / 4 * 58)  # 1.9 away
+    assert policy.interval_for([-100.0, 50.0], threshold=0.5) == 60
+    mid = policy.interval_for([3.5], threshold=0.5)
+    assert 2 < mid < 60
+    # inside the zone and never out of it: arming comes first, then the whole band
+    assert policy.interval_for([0.2], threshold=0.5, armed=[0]) == pytest.approx(2 + 0.3 / 4 * 58)
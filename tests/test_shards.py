@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import signal
+
+from posbot.models import Position
+from posbot.shards import ShardRuntime, ShardSupervisor, assign_shards, shard_path
+from posbot.state_store import BotState, MemoryStateStore
+from posbot.watcher import Watcher
+
+
+def flipping_shard(shard, shards, publish) -> ShardRuntime:
+    """Worker factory: one position per shard whose PnL flips sign every poll."""
+    flip = [1.0]
+
+    def get_positions():
+        flip[0] = -flip[0]
+        pnl = 5 * flip[0]
+        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=pnl, account=f"s{shard}")]
+
+    async def notify(ev):
+        raise AssertionError("workers publish whole ticks")
+
+    watcher = Watcher(
+        state_store=MemoryStateStore(),
+        state=BotState(cooldown_seconds=0),
+        fetch_positions=get_positions,
+        notify=notify,
+        notify_batch=publish,
+        poll_interval_seconds=0.05,  # type: ignore[arg-type]
+    )
+    return ShardRuntime(
+        watcher=watcher,
+        get_positions=get_positions,
+        status_lines=lambda: [f"threshold={watcher.state.pnl_threshold:g}"],
+    )
+
+
+async def _until(cond, timeout: float = 10.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not cond():
+            await asyncio.sleep(0.02)
+
+
+def _supervisor(events: list, state: BotState) -> ShardSupervisor:
+    async def on_events(batch):
+        events.extend(batch)
+
+    return ShardSupervisor(
+        flipping_shard,
+        2,
+        on_events=on_events,
+        state=state,
+        heartbeat_interval=0.1,
+        heartbeat_timeout=5.0,
+        restart_min=0.05,
+    )
+
+
+def test_assignment_is_stable_and_state_paths_are_per_shard():
+    names = [f"sub{i}" for i in range(20)]
+    shards = assign_shards(names, 3)
+    assert sorted(sum(shards, [])) == sorted(names)
+    assert all(shards)  # crc32 spreads 20 names over all 3
+    # an account keeps its shard when others are added or removed
+    assert [n for n in assign_shards(names[:5], 3)[1]] == [n for n in shards[1] if n in names[:5]]
+    assert shard_path("./state.json", 1) == "./state.shard1.json"
+    assert shard_path("sqlite:///data/s.db", 0) == "sqlite:///data/s.shard0.db"
+
+
+def test_workers_publish_events_answer_positions_and_follow_settings():
+    async def scenario() -> None:
+        events: list = []
+        state = BotState(pnl_threshold=1.0)
+        sup = _supervisor(events, state)
+        sup.start()
+        try:
+            await _until(lambda: {e.account for e in events} == {"s0", "s1"})
+            assert sorted(p.account for p in await sup.get_positions()) == ["s0", "s1"]
+            await _until(lambda: state.last_poll_ts > 0)  # mirrored from heartbeats for /status
+            await _until(lambda: "tracked positions: 2" in sup.status_lines()[0])
+
+            state.pnl_threshold = 50.0  # e.g. /threshold 50 on the front-end
+            await _until(
+                lambda: all("threshold=50" in w.info.get("status", []) for w in sup._workers)
+            )
+            seen = len(events)
+            await asyncio.sleep(0.3)
+            assert len(events) == seen  # |PnL| = 5 never crosses +-50
+        finally:
+            await sup.stop()
+
+    asyncio.run(scenario())
+
+
+def test_crashed_worker_is_restarted():
+    async def scenario() -> None:
+        sup = _supervisor([], BotState())
+        sup.start()
+        try:
+            await _until(lambda: all(w.info for w in sup._workers))
+            victim = sup._workers[0]
+            old_pid = victim.process.pid
+            os.kill(old_pid, signal.SIGKILL)
+            await _until(
+                lambda: victim.restarts == 1
+                and victim.process is not None
+                and victim.process.pid != old_pid
+                and bool(victim.info)
+            )
+            assert sup._workers[1].restarts == 0
+        finally:
+            await sup.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from posbot.models import Position
+from posbot.snapshot import SnapshotCache
+
+
+class CountingProvider:
+    def __init__(self, delay: float = 0.05, fail: bool = False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def get_positions(self) -> list[Position]:
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("exchange down")
+        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=float(self.calls))]
+
+
+def test_concurrent_refreshes_share_one_request():
+    provider = CountingProvider()
+    cache = SnapshotCache(provider.get_positions)
+
+    async def scenario():
+        return await asyncio.gather(cache.refresh(), cache.get(), cache.refresh_snapshot())
+
+    a, b, c = asyncio.run(scenario())
+
+    assert provider.calls == 1
+    assert a == b.positions == c.positions
+    assert cache.shared_calls == 2
+
+
+def test_get_serves_fresh_snapshot_and_refetches_stale_one():
+    provider = CountingProvider(delay=0)
+    t = {"now": 1000.0}
+    cache = SnapshotCache(provider.get_positions, max_staleness=15, clock=lambda: t["now"])
+
+    async def scenario():
+        await cache.refresh()  # watcher tick
+        t["now"] += 10
+        fresh = await cache.get()
+        t["now"] += 10
+        stale = await cache.get()
+        return fresh, stale
+
+    fresh, stale = asyncio.run(scenario())
+
+    assert fresh.fetched_at == 1000.0
+    assert stale.fetched_at == 1020.0
+    assert provider.calls == 2
+
+
+def test_errors_reach_every_waiter_and_do_not_stick():
+    provider = CountingProvider(fail=True)
+    cache = SnapshotCache(provider.get_positions)
+
+    async def scenario():
+        results = await asyncio.gather(cache.refresh(), cache.refresh(), return_exceptions=True)
+        assert all(isinstance(r, RuntimeError) for r in results)
+        provider.fail = False
+        return await cache.refresh()
+
+    out = asyncio.run(scenario())
+    assert provider.calls == 2
+    assert out[0].unrealized_pnl == 2.0
+
+
+def test_cancelled_waiter_does_not_cancel_shared_fetch():
+    provider = CountingProvider(delay=0.05)
+    cache = SnapshotCache(provider.get_positions)
+
+    async def scenario():
+        first = asyncio.create_task(cache.refresh())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(cache.refresh())
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second
+
+    out = asyncio.run(scenario())
+    assert len(out) == 1 and provider.calls == 1
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import sqlite3
+
+from posbot.sqlite_store import SqliteStateStore
+from posbot.state_store import (
+    BotState,
+    LazyPositions,
+    PositionState,
+    StateStore,
+    open_state_store,
+)
+from posbot.subscriptions import Subscription
+
+
+def _rows(path) -> dict:
+    with sqlite3.connect(path) as conn:
+        return {
+            k: (pnl, alert, seen)
+            for k, pnl, alert, seen in conn.execute(
+                "SELECT key, last_pnl, last_alert_ts, last_seen_ts FROM positions"
+            )
+        }
+
+
+def test_round_trip_and_lazy_load(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SqliteStateStore(path)
+    state = store.load()
+    state.pnl_threshold = 3.0
+    state.positions["BTCUSDT:LONG"] = PositionState(last_pnl=1.0, last_seen_ts=5.0)
+    state.positions["ETHUSDT:SHORT"] = PositionState(last_pnl=-2.0)
+    store.save(state)
+    store.close()
+
+    store = SqliteStateStore(path)
+    loaded = store.load()
+    assert loaded.pnl_threshold == 3.0
+    assert isinstance(loaded.positions, LazyPositions)
+    assert list(loaded.positions.loaded_items()) == []
+
+    assert loaded.positions["BTCUSDT:LONG"].last_pnl == 1.0
+    assert loaded.positions.get("MISSING:LONG") is None
+    assert len(list(loaded.positions.loaded_items())) == 1
+    assert len(loaded.positions) == 2
+    assert not loaded.is_dirty()
+    store.close()
+
+
+def test_save_upserts_only_changed_positions(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SqliteStateStore(path)
+    state = store.load()
+    for i in range(5):
+        state.positions[f"S{i}:LONG"] = PositionState(last_pnl=float(i))
+    store.save(state)
+    assert store.last_write_rows == 5
+
+    state.positions["S3:LONG"].last_pnl = 30.0
+    state.positions["S1:LONG"].last_seen_ts = 99.0  # volatile only
+    store.save(state)
+    assert store.last_write_rows == 1
+    assert _rows(path)["S3:LONG"][0] == 30.0
+    assert _rows(path)["S1:LONG"][2] == 0.0
+
+    store.flush(state)
+    assert _rows(path)["S1:LONG"][2] == 99.0
+    store.close()
+
+
+def test_evicted_positions_are_deleted(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SqliteStateStore(path)
+    state = store.load()
+    for i in range(4):
+        state.positions[f"S{i}:LONG"] = PositionState(last_seen_ts=float(i))
+    store.save(state)
+
+    assert state.evict(10.0, ttl=8.5, max_positions=2) == ["S0:LONG", "S1:LONG"]
+    state.positions["S0:LONG"] = PositionState(last_pnl=5.0)  # seen again before the write
+    store.save(state)
+    assert sorted(_rows(path)) == ["S0:LONG", "S2:LONG", "S3:LONG"]
+    assert _rows(path)["S0:LONG"][0] == 5.0
+    store.close()
+
+
+def test_wal_mode(tmp_path):
+    store = SqliteStateStore(str(tmp_path / "state.db"))
+    mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    store.close()
+    assert mode == "wal"
+
+
+def test_migrates_legacy_json_once(tmp_path):
+    json_path = str(tmp_path / "state.json")
+    legacy = BotState(cooldown_seconds=42)
+    legacy.positions["BTCUSDT:LONG"] = PositionState(last_pnl=7.0, last_alert_ts=3.0)
+    StateStore(json_path).save(legacy)
+
+    db_path = str(tmp_path / "state.db")
+    store = SqliteStateStore(db_path, migrate_from=json_path)
+    state = store.load()
+    assert state.cooldown_seconds == 42
+    assert state.positions["BTCUSDT:LONG"].last_alert_ts == 3.0
+    state.cooldown_seconds = 1
+    store.save(state)
+    store.close()
+
+    # a non-empty database is never overwritten by the legacy file
+    store = SqliteStateStore(db_path, migrate_from=json_path)
+    assert store.load().cooldown_seconds == 1
+    store.close()
+
+
+def test_open_state_store_selects_backend(tmp_path):
+    sqlite_store = open_state_store(f"sqlite:///{tmp_path}/a.db")
+    assert isinstance(sqlite_store, SqliteStateStore)
+    sqlite_store.close()
+
+    assert isinstance(open_state_store(str(tmp_path / "b.sqlite")), SqliteStateStore)
+    assert isinstance(open_state_store(str(tmp_path / "state.json")), StateStore)
+    assert isinstance(
+        open_state_store(str(tmp_path / "c.json"), backend="sqlite"), SqliteStateStore
+    )
+
+
+def test_subscriptions_persist_and_are_written_only_when_changed(tmp_path):
+    path = str(tmp_path / "state.db")
+    store = SqliteStateStore(path)
+    state = store.load()
+    state.subscriptions.add(Subscription(1, "BTCUSDT", side="LONG"))
+    state.subscriptions.add(Subscription(2))
+    assert state.is_dirty()
+    store.save(state)
+    assert not state.is_dirty()
+
+    # rows written behind the store's back survive an unrelated save
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO subscriptions VALUES (3, 'ETHUSDT', '', '', '')")
+    state.pnl_threshold = 9.0
+    store.save(state)
+    store.close()
+
+    store = SqliteStateStore(path)
+    loaded = store.load()
+    assert [s.chat_id for s in loaded.subscriptions] == [1, 2, 3]
+    loaded.subscriptions.clear_chat(3)
+    store.save(loaded)
+    assert [s.chat_id for s in store.load().subscriptions] == [1, 2]
+    store.close()
+
+
+def test_armed_side_round_trips_and_old_databases_gain_the_column(tmp_path):
+    path = str(tmp_path / "state.db")
+    with sqlite3.connect(path) as conn:  # the schema before the armed column
+        conn.execute(
+            "CREATE TABLE positions (key TEXT PRIMARY KEY, last_pnl REAL NOT NULL, "
+            "last_alert_ts REAL NOT NULL, last_seen_ts REAL NOT NULL)"
+        )
+        conn.execute("INSERT INTO positions VALUES ('BTCUSDT:LONG', -0.2, 0, 0)")
+
+    store = SqliteStateStore(path)
+    state = store.load()
+    assert state.positions["BTCUSDT:LONG"].armed == 0
+    state.positions["BTCUSDT:LONG"].armed = -1
+    store.save(state)
+    store.close()
+
+    store = SqliteStateStore(path)
+    assert store.load().positions["BTCUSDT:LONG"].armed == -1
+    store.close()
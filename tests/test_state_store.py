@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import pytest
+
+from posbot.state_store import (
+    BaseStateStore,
+    BotState,
+    PositionState,
+    StateStore,
+    loaded_positions,
+)
+from posbot.subscriptions import Subscription
+
+
+def test_round_trip_is_compact_and_clean(tmp_path):
+    path = tmp_path / "state.json"
+    store = StateStore(str(path))
+    state = BotState(pnl_threshold=2.0)
+    state.positions["BTCUSDT:LONG"] = PositionState(last_pnl=1.5, last_seen_ts=10.0)
+    store.save(state)
+
+    text = path.read_text(encoding="utf-8")
+    assert "\n" not in text and ": " not in text
+
+    loaded = store.load()
+    assert loaded.pnl_threshold == 2.0
+    assert loaded.positions["BTCUSDT:LONG"].last_pnl == 1.5
+    assert not loaded.is_dirty()
+
+
+def test_load_builds_position_states_on_demand(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    state = BotState()
+    for i in range(3):
+        state.positions[f"S{i}USDT:LONG"] = PositionState(last_pnl=float(i))
+    store.save(state)
+
+    loaded = store.load()
+    assert loaded.positions["S1USDT:LONG"].last_pnl == 1.0
+    assert len(loaded_positions(loaded.positions)) == 1
+    assert "S9USDT:LONG" not in loaded.positions
+    assert loaded.positions == state.positions  # iteration loads the rest
+
+
+def test_subscriptions_round_trip_and_mark_dirty(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    state = store.load()
+    state.subscriptions.add(Subscription(42, "BTCUSDT", direction="PROFIT_TO_LOSS"))
+    assert state.is_dirty()
+    store.save(state)
+
+    loaded = store.load()
+    assert list(loaded.subscriptions) == [Subscription(42, "BTCUSDT", direction="PROFIT_TO_LOSS")]
+    assert not loaded.is_dirty()
+
+
+def test_unchanged_state_is_not_rewritten(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    state = BotState()
+    state.positions["BTCUSDT:LONG"] = PositionState(last_pnl=1.0)
+    store.save(state)
+    assert store.writes == 1
+
+    # same values and volatile timestamps only -> nothing to write
+    state.positions["BTCUSDT:LONG"].last_pnl = 1.0
+    state.positions["BTCUSDT:LONG"].last_seen_ts = 99.0
+    state.last_poll_ts = 99.0
+    store.save(state)
+    assert store.writes == 1
+
+    state.positions["BTCUSDT:LONG"].last_pnl = 2.0
+    store.save(state)
+    assert store.writes == 2
+
+    # volatile fields ride along with the next write
+    raw = json.loads((tmp_path / "state.json").read_text(encoding="utf-8"))
+    assert raw["last_poll_ts"] == 99.0
+
+
+def test_repeated_identical_error_does_not_rewrite(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"))
+    state = BotState()
+    store.touch_error(state, "TimeoutError: slow")
+    store.touch_error(state, "TimeoutError: slow")
+    assert store.writes == 1
+
+
+def test_write_behind_coalesces_saves(tmp_path):
+    path = tmp_path / "state.json"
+    store = StateStore(str(path), write_delay=0.05)
+    state = BotState()
+
+    async def scenario():
+        store.save(state)
+        state.pnl_threshold = 1.0
+        store.save(state)
+        state.cooldown_seconds = 5
+        store.save(state)
+        assert store.writes == 0
+        await asyncio.sleep(0.1)
+
+    asyncio.run(scenario())
+
+    assert store.writes == 1
+    raw = json.loads(path.read_text(encoding="utf-8"))
+    assert raw["pnl_threshold"] == 1.0 and raw["cooldown_seconds"] == 5
+
+
+def test_flush_writes_pending_changes(tmp_path):
+    store = StateStore(str(tmp_path / "state.json"), write_delay=60)
+    state = BotState()
+
+    async def scenario():
+        store.save(state)
+        state.last_poll_ts = 42.0
+        store.flush(state)
+
+    asyncio.run(scenario())
+
+    assert store.writes == 1
+    assert store.load().last_poll_ts == 42.0
+
+
+def test_changed_positions_are_tracked_as_they_change():
+    state = BotState()
+    for i in range(3):
+        state.positions[f"S{i}USDT:LONG"] = PositionState(last_pnl=float(i))
+    assert state.positions.changed == {"S0USDT:LONG", "S1USDT:LONG", "S2USDT:LONG"}
+    state.mark_clean()
+    assert not state.is_dirty()
+
+    state.positions["S1USDT:LONG"].last_pnl = 5.0
+    state.positions["S2USDT:LONG"].last_seen_ts = 9.0  # volatile only
+    assert state.positions.changed == {"S1USDT:LONG"}
+
+    state.drop_position("S1USDT:LONG")
+    assert not state.positions.changed and state.removed == {"S1USDT:LONG"}
+
+
+def test_base_store_is_abstract():
+    with pytest.raises(TypeError):
+        BaseStateStore()  # type: ignore[abstract]
@@ -0,0 +1,317 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from posbot import ws
+from posbot.models import Position
+from posbot.state_store import BotState, StateStore
+from posbot.streaming import StreamingProvider, login_message
+from posbot.watcher import Watcher
+
+
+class FakeExchange:
+    """Stand-in for the exchange's private WebSocket endpoint."""
+
+    def __init__(self) -> None:
+        self.received: list[dict] = []
+        self.connections = 0
+        self.subscribed = asyncio.Event()
+        self._writers: list[asyncio.StreamWriter] = []
+
+    async def start(self) -> str:
+        self.server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self.server.sockets[0].getsockname()[1]
+        return f"ws://127.0.0.1:{port}/private/"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        head = (await reader.readuntil(b"\r\n\r\n")).decode()
+        key = next(
+            line.split(":", 1)[1].strip()
+            for line in head.split("\r\n")
+            if line.lower().startswith("sec-websocket-key")
+        )
+        writer.write(
+            (
+                "HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+                f"Connection: Upgrade\r\nSec-WebSocket-Accept: {ws.accept_key(key)}\r\n\r\n"
+            ).encode()
+        )
+        self.connections += 1
+        self._writers.append(writer)
+        try:
+            while True:
+                _, opcode, payload = await ws.read_frame(reader)
+                if opcode == ws.OP_CLOSE:
+                    break
+                msg = json.loads(payload)
+                self.received.append(msg)
+                if msg.get("op") == "subscribe":
+                    self.subscribed.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            if writer in self._writers:
+                self._writers.remove(writer)
+            writer.close()
+
+    async def push(self, *items: dict) -> None:
+        frame = ws.encode_frame(
+            ws.OP_TEXT, json.dumps({"ch": "position", "data": list(items)}).encode(), mask=False
+        )
+        for w in self._writers:
+            w.write(frame)
+            await w.drain()
+
+    def drop_all(self) -> None:
+        self.subscribed.clear()
+        for w in list(self._writers):
+            w.close()
+
+    async def close(self) -> None:
+        self.drop_all()
+        self.server.close()
+        await self.server.wait_closed()
+
+
+class RestProvider:
+    def __init__(self, positions: list[Position]):
+        self.positions = positions
+        self.calls = 0
+
+    def get_positions(self) -> list[Position]:
+        self.calls += 1
+        return list(self.positions)
+
+
+def _item(pnl: float, event: str = "UPDATE", symbol: str = "BTCUSDT") -> dict:
+    return {"event": event, "symbol": symbol, "side": "LONG", "unrealizedPNL": str(pnl)}
+
+
+async def _until(cond, timeout: float = 2.0) -> None:
+    async with asyncio.timeout(timeout):
+        while not cond():
+            await asyncio.sleep(0.005)
+
+
+def test_frame_roundtrip_and_accept_key():
+    assert ws.accept_key("dGhlIHNhbXBsZSBub25jZQ==") == "s3pPLMBiTxaQ9kYGzzhZRbK+xOo="
+
+    async def roundtrip(payload: bytes) -> tuple:
+        reader = asyncio.StreamReader()
+        reader.feed_data(ws.encode_frame(ws.OP_TEXT, payload, mask=True))
+        return await ws.read_frame(reader)
+
+    for size in (0, 5, 200, 70_000):
+        payload = bytes(i % 251 for i in range(size))
+        assert asyncio.run(roundtrip(payload)) == (True, ws.OP_TEXT, payload)
+
+
+def test_login_message_is_deterministic_for_fixed_nonce():
+    a = login_message("key", "secret", nonce="n", ts=1)
+    b = login_message("key", "secret", nonce="n", ts=1)
+    assert a == b and a["op"] == "login"
+    assert len(a["args"][0]["sign"]) == 64
+
+
+def test_stream_applies_pushes_and_notifies():
+    async def scenario() -> None:
+        exchange = FakeExchange()
+        url = await exchange.start()
+        rest = RestProvider([Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=1.0)])
+        stream = StreamingProvider(url, rest=rest, api_key="k", api_secret="s")
+        woken = []
+        stream.add_listener(lambda: woken.append(1))
+        stream.start()
+        try:
+            await asyncio.wait_for(exchange.subscribed.wait(), 2)
+            await _until(lambda: stream.reconciles == 1)
+            assert [m["op"] for m in exchange.received] == ["login", "subscribe"]
+            assert [p.unrealized_pnl for p in await stream.get_positions()] == [1.0]
+
+            await exchange.push(_item(-3.5), _item(2.0, symbol="ETHUSDT"))
+            await _until(lambda: stream.updates == 1)
+            got = {p.symbol: p.unrealized_pnl for p in await stream.get_positions()}
+            assert got == {"BTCUSDT": -3.5, "ETHUSDT": 2.0}
+            assert woken and rest.calls == 1  # served from memory, no extra REST call
+
+            await exchange.push(_item(0.0, event="CLOSE", symbol="ETHUSDT"))
+            await _until(lambda: stream.updates == 2)
+            assert [p.symbol for p in await stream.get_positions()] == ["BTCUSDT"]
+        finally:
+            await stream.stop()
+            await exchange.close()
+
+    asyncio.run(scenario())
+
+
+def test_stream_reconnects_resubscribes_and_resyncs():
+    async def scenario() -> None:
+        exchange = FakeExchange()
+        url = await exchange.start()
+        rest = RestProvider([Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=1.0)])
+        stream = StreamingProvider(url, rest=rest, reconnect_min=0.01, reconnect_max=0.05)
+        stream.start()
+        try:
+            await asyncio.wait_for(exchange.subscribed.wait(), 2)
+            await _until(lambda: stream.reconciles == 1)
+
+            # exchange state moves on while we are disconnected
+            rest.positions = [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=-7.0)]
+            exchange.drop_all()
+            await _until(lambda: exchange.connections == 2 and stream.reconciles == 2)
+
+            assert stream.reconnects == 1
+            assert sum(m["op"] == "subscribe" for m in exchange.received) == 2
+            assert [p.unrealized_pnl for p in await stream.get_positions()] == [-7.0]
+        finally:
+            await stream.stop()
+            await exchange.close()
+
+    asyncio.run(scenario())
+
+
+def test_reconcile_keeps_pushes_that_race_the_rest_call():
+    async def never_connect(url: str) -> ws.WebSocket:
+        raise OSError("offline")
+
+    class RacingRest:
+        def __init__(self) -> None:
+            self.stream: StreamingProvider | None = None
+
+        async def get_positions(self) -> list[Position]:
+            # a push lands while the (stale) REST response is in flight
+            assert self.stream is not None
+            self.stream._handle(json.dumps({"ch": "position", "data": _item(9.0)}))
+            return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=1.0)]
+
+    rest = RacingRest()
+    stream = StreamingProvider("ws://unused", rest=rest, connect=never_connect)
+    rest.stream = stream
+
+    out = asyncio.run(stream.get_positions())
+    assert [p.unrealized_pnl for p in out] == [9.0]
+
+
+def test_push_wakes_watcher_without_waiting_for_poll(tmp_path):
+    async def scenario() -> list:
+        exchange = FakeExchange()
+        url = await exchange.start()
+        rest = RestProvider([Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=10.0)])
+        stream = StreamingProvider(url, rest=rest)
+        events = []
+
+        async def notify(ev):
+            events.append(ev)
+
+        watcher = Watcher(
+            state_store=StateStore(str(tmp_path / "state.json")),
+            state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+            fetch_positions=stream.get_positions,
+            notify=notify,
+            poll_interval_seconds=999,
+        )
+        stream.add_listener(watcher.wake)
+        stream.start()
+        await asyncio.wait_for(exchange.subscribed.wait(), 2)
+        await _until(lambda: stream.reconciles == 1)
+        watcher.start()
+        try:
+            await _until(lambda: watcher.state.last_poll_ts > 0)  # baseline tick
+            await exchange.push(_item(-10.0))
+            await _until(lambda: bool(events), timeout=1.0)
+            assert watcher.wakeups >= 1
+        finally:
+            await watcher.stop()
+            await stream.stop()
+            await exchange.close()
+        return events
+
+    events = asyncio.run(scenario())
+    assert [e.direction for e in events] == ["PROFIT_TO_LOSS"]
+
+
+def test_stream_outlives_unexpected_errors():
+    attempts = []
+
+    async def flaky_connect(url: str) -> ws.WebSocket:
+        attempts.append(url)
+        if len(attempts) == 1:
+            raise RuntimeError("unexpected")
+        return await ws.connect(url)
+
+    async def scenario() -> None:
+        exchange = FakeExchange()
+        url = await exchange.start()
+        rest = RestProvider([])
+        stream = StreamingProvider(
+            url, rest=rest, reconnect_min=0.01, reconnect_max=0.05, connect=flaky_connect
+        )
+        handle = stream._handle
+
+        def buggy_handle(text: str) -> None:
+            if stream.messages == 0:
+                stream.messages += 1
+                raise KeyError("bug")
+            handle(text)
+
+        stream._handle = buggy_handle  # type: ignore[method-assign]
+        stream.start()
+        try:
+            await asyncio.wait_for(exchange.subscribed.wait(), 2)
+            assert len(attempts) == 2
+
+            # a bug in message handling drops the connection, not the stream task
+            exchange.subscribed.clear()
+            await exchange.push(_item(1.0))
+            await asyncio.wait_for(exchange.subscribed.wait(), 2)
+            assert stream.reconnects == 1
+            await exchange.push(_item(2.0))
+            await _until(lambda: stream.updates == 1)
+        finally:
+            await stream.stop()
+            await exchange.close()
+
+    asyncio.run(scenario())
+
+
+def test_small_pushes_through_the_band_alert(tmp_path):
+    # every push wakes the watcher, so it samples each small step of the walk
+    async def scenario() -> list:
+        exchange = FakeExchange()
+        url = await exchange.start()
+        rest = RestProvider([Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=2.0)])
+        stream = StreamingProvider(url, rest=rest)
+        events = []
+
+        async def notify(ev):
+            events.append(ev)
+
+        watcher = Watcher(
+            state_store=StateStore(str(tmp_path / "state.json")),
+            state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+            fetch_positions=stream.get_positions,
+            notify=notify,
+            poll_interval_seconds=999,
+        )
+        stream.add_listener(watcher.wake)
+        stream.start()
+        await asyncio.wait_for(exchange.subscribed.wait(), 2)
+        await _until(lambda: stream.reconciles == 1)
+        watcher.start()
+        try:
+            await _until(lambda: watcher.state.last_poll_ts > 0)  # baseline tick
+            for pnl in (0.6, 0.1, -0.4, -0.9, -1.2):
+                await exchange.push(_item(pnl))
+                await _until(lambda p=pnl: watcher.state.positions["BTCUSDT:LONG"].last_pnl == p)
+            await _until(lambda: bool(events), timeout=1.0)
+        finally:
+            await watcher.stop()
+            await stream.stop()
+            await exchange.close()
+        return events
+
+    events = asyncio.run(scenario())
+    assert [(e.from_pnl, e.to_pnl, e.direction) for e in events] == [
+        (-0.9, -1.2, "PROFIT_TO_LOSS")
+    ]
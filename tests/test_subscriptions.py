@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import pytest
+
+from posbot.detection import LOSS_TO_PROFIT, PROFIT_TO_LOSS
+from posbot.models import CrossingEvent
+from posbot.subscriptions import (
+    MAX_PER_CHAT,
+    Subscription,
+    SubscriptionIndex,
+    alert_chats,
+    group_by_chat,
+)
+
+
+def _ev(symbol="BTCUSDT", side="LONG", direction=LOSS_TO_PROFIT, account="") -> CrossingEvent:
+    return CrossingEvent(
+        position_key=f"{symbol}:{side}",
+        symbol=symbol,
+        side=side,
+        from_pnl=-1.0,
+        to_pnl=1.0,
+        direction=direction,
+        account=account,
+    )
+
+
+def test_parse_accepts_fields_in_any_order():
+    sub = Subscription.parse(7, ["down", "acc=Sub1", "btcusdt", "short"])
+    assert sub == Subscription(7, "BTCUSDT", "SHORT", "SUB1", PROFIT_TO_LOSS)
+    assert Subscription.parse(7, []) == Subscription(7)
+    assert Subscription.parse(7, ["*", "up"]).describe() == "any symbol, loss→profit"
+    with pytest.raises(ValueError):
+        Subscription.parse(7, ["long", "short"])
+    with pytest.raises(ValueError):
+        Subscription.parse(7, ["BTC/USDT"])
+
+
+def test_parse_accepts_symbols_with_dashes_and_underscores():
+    assert Subscription.parse(7, ["btc-usdt"]).symbol == "BTC-USDT"
+    assert Subscription.parse(7, ["1000PEPE_USDT", "up"]).symbol == "1000PEPE_USDT"
+    with pytest.raises(ValueError):
+        Subscription.parse(7, ["BTC USDT"])
+
+
+def test_index_routes_each_matching_chat_once():
+    index = SubscriptionIndex()
+    assert index.add(Subscription(1, "BTCUSDT"))
+    assert index.add(Subscription(1, "BTCUSDT", side="LONG"))  # overlaps the first rule
+    assert not index.add(Subscription(1, "BTCUSDT"))
+    index.add(Subscription(2, "", direction=PROFIT_TO_LOSS))
+    index.add(Subscription(3, "ETHUSDT"))
+    index.add(Subscription(4, "BTCUSDT", account="SUB1"))
+
+    assert index.chats_for(_ev()) == [1]
+    assert index.chats_for(_ev(direction=PROFIT_TO_LOSS, account="sub1")) == [1, 4, 2]
+    assert index.chats_for(_ev("ethusdt")) == [3]
+
+    assert index.clear_chat(1) == 2
+    assert index.chats_for(_ev()) == [] and len(index) == 3 and index.chats == 3
+    assert index.remove(Subscription(3, "ETHUSDT")) and index.chats_for(_ev("ETHUSDT")) == []
+
+
+def test_fan_out_only_looks_at_the_events_symbol(monkeypatch):
+    index = SubscriptionIndex()
+    for chat in range(2000):
+        index.add(Subscription(chat, f"COIN{chat}USDT"))
+    index.add(Subscription(9999, "BTCUSDT", side="SHORT"))
+
+    checked = []
+    original = Subscription.matches
+
+    def counting(self, ev):
+        checked.append(self.chat_id)
+        return original(self, ev)
+
+    monkeypatch.setattr(Subscription, "matches", counting)
+    assert index.chats_for(_ev("COIN42USDT")) == [42]
+    assert index.chats_for(_ev("BTCUSDT")) == []
+    assert checked == [42, 9999]
+
+
+def test_per_chat_limit():
+    index = SubscriptionIndex()
+    for i in range(MAX_PER_CHAT):
+        index.add(Subscription(1, f"S{i}USDT"))
+    with pytest.raises(ValueError):
+        index.add(Subscription(1, "ONEMOREUSDT"))
+
+
+def test_admin_gets_everything_and_others_need_the_allowlist():
+    index = SubscriptionIndex([Subscription(1), Subscription(2), Subscription(3, "ETHUSDT")])
+    route = dict(admin_chat_id=1, allowed={1, 2, 3})
+    assert alert_chats(index, _ev(), **route) == [1, 2]
+    assert alert_chats(index, _ev(), admin_chat_id=1, allowed={1}) == [1]  # 2 was removed
+
+    batch = [_ev(), _ev("ETHUSDT")]
+    assert group_by_chat(index, batch, **route) == {1: batch, 2: batch, 3: [batch[1]]}
+
+
+def test_round_trip_skips_broken_entries():
+    index = SubscriptionIndex([Subscription(1, "BTCUSDT", "LONG", "SUB1", LOSS_TO_PROFIT)])
+    raw = index.to_list() + [{"symbol": "ETHUSDT"}, "junk"]
+    loaded = SubscriptionIndex.from_list(raw)
+    assert list(loaded) == list(index) and not loaded.dirty
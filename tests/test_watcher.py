@@ -2,8 +2,10 @@ from __future__ import annotations
 
 import asyncio
 
+from posbot.accounts import MultiAccountProvider
 from posbot.models import Position
-from posbot.state_store import BotState, StateStore
+from posbot.scheduler import AdaptivePolicy
+from posbot.state_store import BotState, MemoryStateStore, StateStore
 from posbot.watcher import Watcher
 
 
@@ -134,3 +136,290 @@ def test_cooldown_blocks_spam(tmp_path, monkeypatch):
     assert len(events) == 1
 
 
+def test_stop_cancels_inflight_async_fetch(tmp_path):
+    started = asyncio.Event()
+
+    async def fetch():
+        started.set()
+        await asyncio.sleep(60)
+        return []
+
+    async def notify(ev):
+        pass
+
+    state = BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0)
+    store = StateStore(str(tmp_path / "state.json"))
+
+    w = Watcher(
+        state_store=store,
+        state=state,
+        fetch_positions=fetch,
+        notify=notify,
+        poll_interval_seconds=999,
+    )
+
+    async def scenario():
+        w.start()
+        await started.wait()
+        await asyncio.wait_for(w.stop(), timeout=1)
+        return w._task
+
+    task = asyncio.run(scenario())
+    assert task is not None and task.cancelled()
+
+
+def test_notify_batch_gets_all_events_of_a_tick(tmp_path, monkeypatch):
+    provider = SeqProvider(
+        [
+            [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=+10.0) for i in range(3)],
+            [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=-10.0) for i in range(3)],
+            [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=+10.0) for i in range(3)],
+        ]
+    )
+    batches = []
+
+    async def notify(ev):
+        raise AssertionError("per-event notify must not be used in batch mode")
+
+    async def notify_batch(events):
+        batches.append(events)
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+
+    state = BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=600)
+    w = Watcher(
+        state_store=StateStore(str(tmp_path / "state.json")),
+        state=state,
+        fetch_positions=provider.get_positions,
+        notify=notify,
+        poll_interval_seconds=999,
+        notify_batch=notify_batch,
+    )
+
+    asyncio.run(w._tick())
+    t["now"] += 1
+    asyncio.run(w._tick())
+    t["now"] += 1
+    asyncio.run(w._tick())  # cooldown still applies per position
+
+    assert len(batches) == 1
+    assert [ev.symbol for ev in batches[0]] == ["S0USDT", "S1USDT", "S2USDT"]
+
+
+def test_reopened_position_is_a_new_baseline(tmp_path, monkeypatch):
+    btc = [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=+10.0)]
+    provider = SeqProvider(
+        [
+            btc,
+            [],  # closed
+            [],
+            [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=-10.0)],  # reopened
+            [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=+10.0)],
+        ]
+    )
+    events = []
+
+    async def notify(ev):
+        events.append(ev)
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+
+    w = Watcher(
+        state_store=StateStore(str(tmp_path / "state.json")),
+        state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+        fetch_positions=provider.get_positions,
+        notify=notify,
+        poll_interval_seconds=999,
+        reopen_after_polls=2,
+    )
+    for _ in range(5):
+        asyncio.run(w._tick())
+        t["now"] += 15
+
+    # the stale +10 from the closed position is not compared with the reopened -10
+    assert [e.direction for e in events] == ["LOSS_TO_PROFIT"]
+    assert w.reopened == 1
+
+
+def test_failed_account_positions_are_not_reopened(tmp_path, monkeypatch):
+    class FlakyProvider(SeqProvider):
+        def get_positions(self) -> list[Position]:
+            out = super().get_positions()
+            if out is None:
+                raise ConnectionError("account unavailable")
+            return out
+
+    btc = [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=+10.0)]
+    flaky = FlakyProvider(
+        [btc, None, None, [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=-10.0)]]
+    )
+    steady = SeqProvider([[Position(symbol="ETHUSDT", side="LONG", unrealized_pnl=+10.0)]])
+    events = []
+
+    async def notify(ev):
+        events.append(ev)
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+
+    w = Watcher(
+        state_store=MemoryStateStore(),
+        state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+        fetch_positions=MultiAccountProvider({"A": flaky, "B": steady}).get_positions,
+        notify=notify,
+        poll_interval_seconds=999,
+        reopen_after_polls=2,
+    )
+    for _ in range(4):
+        asyncio.run(w._tick())
+        t["now"] += 15
+
+    # A's position was missing because A could not be fetched, not because it closed
+    assert [(e.account, e.direction) for e in events] == [("A", "PROFIT_TO_LOSS")]
+    assert w.reopened == 0
+
+
+def test_fine_grained_samples_through_the_band_alert(tmp_path, monkeypatch):
+    pnls = [-1.0, -0.4, 0.2, 0.6, 1.0, 0.3, -0.3, -0.7]
+    provider = SeqProvider(
+        [[Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=p)] for p in pnls]
+    )
+    events = []
+
+    async def notify(ev):
+        events.append(ev)
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+    store = StateStore(str(tmp_path / "state.json"))
+    store.flush(BotState(watch_enabled=True, pnl_threshold=0.5, cooldown_seconds=0))
+
+    def watcher() -> Watcher:
+        # a fresh watcher (and state) half-way: the armed side must survive a restart
+        return Watcher(
+            state_store=store,
+            state=store.load(),
+            fetch_positions=provider.get_positions,
+            notify=notify,
+            poll_interval_seconds=999,
+        )
+
+    w = watcher()
+    for i in range(len(pnls)):
+        if i == 2:
+            store.flush(w.state)
+            w = watcher()
+        asyncio.run(w._tick())
+        t["now"] += 1
+
+    assert [(e.to_pnl, e.direction) for e in events] == [
+        (0.6, "LOSS_TO_PROFIT"),
+        (-0.7, "PROFIT_TO_LOSS"),
+    ]
+
+
+def test_adaptive_polling_near_the_band_does_not_lose_the_alert():
+    # PnL drifts up 0.05/s; near the band the policy polls every second, so consecutive
+    # samples are 0.05 apart, far less than the 1.0 wide band they have to cross
+    policy = AdaptivePolicy(min_interval=1, max_interval=30, band=0.5)
+    t = {"now": 0.0}
+    intervals = []
+    events = []
+
+    async def fetch():
+        return [Position(symbol="BTCUSDT", side="LONG", unrealized_pnl=-3.0 + 0.05 * t["now"])]
+
+    async def notify(ev):
+        events.append(ev)
+
+    w = Watcher(
+        state_store=MemoryStateStore(),
+        state=BotState(watch_enabled=True, pnl_threshold=0.5, cooldown_seconds=0),
+        fetch_positions=fetch,
+        notify=notify,
+        poll_interval_seconds=30,
+        adaptive=policy,
+        clock=lambda: t["now"],
+    )
+    while t["now"] < 120 and not events:
+        asyncio.run(w._tick())
+        interval = policy.interval_for(w._last_pnls, w.state.pnl_threshold, w._last_armed)
+        intervals.append(interval)
+        t["now"] += interval
+
+    assert [e.direction for e in events] == ["LOSS_TO_PROFIT"]
+    assert 0.5 <= events[0].to_pnl < 0.5 + 0.05 * 1.001
+    assert intervals[-2] == 1  # it was polling at the fastest rate when it crossed
+
+
+def test_stale_positions_are_evicted_by_ttl_and_cap(tmp_path, monkeypatch):
+    provider = SeqProvider(
+        [
+            [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=1.0) for i in range(5)],
+            [Position(symbol="S9USDT", side="LONG", unrealized_pnl=1.0)],
+        ]
+    )
+
+    async def notify(ev):
+        pass
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+
+    store = StateStore(str(tmp_path / "state.json"))
+    w = Watcher(
+        state_store=store,
+        state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+        fetch_positions=provider.get_positions,
+        notify=notify,
+        poll_interval_seconds=999,
+        position_ttl=3600,
+        max_positions=3,
+    )
+    asyncio.run(w._tick())
+    assert len(w.state.positions) == 5  # all open: the cap only drops closed positions
+
+    t["now"] += 1
+    asyncio.run(w._tick())
+    assert list(w.state.positions) == ["S3USDT:LONG", "S4USDT:LONG", "S9USDT:LONG"]  # capped
+
+    t["now"] += 3601
+    asyncio.run(w._tick())
+    assert list(w.state.positions) == ["S9USDT:LONG"]
+    assert list(store.load().positions) == ["S9USDT:LONG"]
+
+
+def test_open_positions_beyond_the_cap_keep_their_state(tmp_path, monkeypatch, caplog):
+    provider = SeqProvider(
+        [
+            [Position(symbol=f"S{i}USDT", side="LONG", unrealized_pnl=pnl) for i in range(3)]
+            for pnl in (2.0, 2.0, -2.0, -2.0)
+        ]
+    )
+    events = []
+
+    async def notify(ev):
+        events.append(ev)
+
+    t = {"now": 1_700_000_000.0}
+    monkeypatch.setattr("posbot.watcher.time.time", lambda: t["now"])
+
+    w = Watcher(
+        state_store=MemoryStateStore(),
+        state=BotState(watch_enabled=True, pnl_threshold=1.0, cooldown_seconds=0),
+        fetch_positions=provider.get_positions,
+        notify=notify,
+        poll_interval_seconds=999,
+        max_positions=2,
+    )
+    for _ in range(4):
+        asyncio.run(w._tick())
+        t["now"] += 15
+
+    assert len(events) == 3
+    assert w.evicted == 0
+    assert len(w.state.positions) == 3
+    warnings = [r for r in caplog.records if "MAX_TRACKED_POSITIONS" in r.getMessage()]
+    assert len(warnings) == 1  # once, not on every tick
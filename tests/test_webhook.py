@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+from posbot.webhook import WebhookServer
+
+SECRET = "s3cret-token_1"
+
+
+async def _post(
+    port: int,
+    body: bytes,
+    *,
+    secret: str = SECRET,
+    path: str = "/telegram",
+    requests: int = 1,
+) -> list[int]:
+    """POST `body` `requests` times over one keep-alive connection; returns the statuses."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    statuses = []
+    for _ in range(requests):
+        writer.write(
+            (
+                f"POST {path} HTTP/1.1\r\nHost: localhost\r\n"
+                f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {secret}\r\n\r\n"
+            ).encode()
+            + body
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b""):
+            pass
+        statuses.append(int(status_line.split()[1]))
+    writer.close()
+    return statuses
+
+
+def test_verifies_secret_and_handles_updates_concurrently():
+    async def scenario():
+        started = []
+        release = asyncio.Event()
+
+        async def handle(update):
+            started.append(update["update_id"])
+            await release.wait()  # a slow command must not block the next update
+
+        server = WebhookServer(handle, secret_token=SECRET, port=0, path="/telegram")
+        await server.start()
+        update = json.dumps({"update_id": 1}).encode()
+
+        assert await _post(server.port, update, secret="wrong") == [403]
+        assert await _post(server.port, update, path="/other") == [404]
+        assert await _post(server.port, b"not json") == [400]
+        assert started == []
+
+        # one connection, three updates, none of them finished yet
+        statuses = await _post(server.port, update, requests=3)
+        await asyncio.sleep(0.05)
+        assert statuses == [200, 200, 200] and started == [1, 1, 1]
+        assert server.received == 3 and server.rejected == 1
+
+        release.set()
+        await server.stop()
+        assert "in flight 0" in server.status_lines()[0]
+
+    asyncio.run(scenario())
+
+
+def test_backpressure_and_handler_errors():
+    async def scenario():
+        block = asyncio.Event()
+
+        async def handle(update):
+            if update.get("fail"):
+                raise RuntimeError("boom")
+            await block.wait()
+
+        server = WebhookServer(handle, secret_token=SECRET, port=0, max_pending=2)
+        await server.start()
+        statuses = await _post(server.port, b'{"update_id": 5}', requests=3)
+        assert statuses == [200, 200, 503]  # Telegram redelivers the third one later
+
+        block.set()
+        await asyncio.sleep(0.05)
+        assert await _post(server.port, b'{"update_id": 6, "fail": true}') == [200]
+        await asyncio.sleep(0.05)
+        assert server.failed == 1
+        await server.stop()
+
+    asyncio.run(scenario())